@@ -0,0 +1,156 @@
+"""
+Track all the sequences of a MOT-style dataset in one process.
+
+YOLOv5 and the ReID model are loaded once and shared by a pool of worker
+threads, each tracking one sequence at a time with `track.run`. The results
+are written in the MOT format to `<output>/<sequence>.txt`, the layout
+TrackEval expects, followed by a timing summary. Nothing is cloned or
+downloaded: the dataset and the weights must already be on disk.
+
+A sequence is a directory of frames, or a directory with an `img1`
+directory of frames as in MOT16/MOT17/MOT20.
+
+    $ python MOT16_eval/eval.py --data MOT16_eval/TrackEval/data/MOT16/train --yolo-weights weights/crowdhuman_yolov5m.pt \\
+        --classes 0 --imgsz 1280 --workers 4
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[1]  # yolov5 strongsort root directory
+WEIGHTS = ROOT / 'weights'
+for path in (ROOT, ROOT / 'yolov5', ROOT / 'strong_sort'):
+    if str(path) not in sys.path:
+        sys.path.append(str(path))
+
+import track
+from yolov5.utils.dataloaders import IMG_FORMATS
+from yolov5.utils.general import LOGGER, check_img_size, print_args
+from yolov5.utils.torch_utils import select_device
+from strong_sort.deep.shared_extractor import SharedExtractor
+from pipeline.startup import load_models
+
+
+def find_sequences(data, names=None):
+    """Map the name of every sequence under `data` to its directory of frames."""
+    data = Path(data)
+    if not data.is_dir():
+        raise FileNotFoundError(f'{data} does not exist, download the dataset there first (this runner never downloads)')
+    sequences = {}
+    for d in sorted(p for p in data.iterdir() if p.is_dir()):
+        frames = next((f for f in (d / 'img1', d / d.name) if f.is_dir()), d)  # MOT layout, or renamed by eval.sh
+        if names and d.name not in names:
+            continue
+        if any(f.suffix[1:].lower() in IMG_FORMATS for f in frames.iterdir()):
+            sequences[d.name] = frames
+    missing = set(names or ()) - set(sequences)
+    if missing:
+        raise FileNotFoundError(f'Sequences {sorted(missing)} not found in {data}')
+    if not sequences:
+        raise FileNotFoundError(f'No sequence found in {data}')
+    return sequences
+
+
+def run(
+        data=ROOT / 'MOT16_eval/TrackEval/data/MOT16/train',  # directory of sequences
+        sequences=None,  # names of the sequences to track, None for all
+        output=ROOT / 'MOT16_eval/TrackEval/data/trackers/mot_challenge/MOT16-train/ch_yolov5m_strong_sort/data',
+        yolo_weights=WEIGHTS / 'yolov5m.pt',  # model.pt path
+        strong_sort_weights=WEIGHTS / 'osnet_x0_25_msmt17.pt',  # ReID model path
+        config_strongsort=ROOT / 'strong_sort/configs/strong_sort.yaml',
+        imgsz=(640, 640),  # inference size (height, width)
+        conf_thres=0.25,  # confidence threshold
+        iou_thres=0.45,  # NMS IOU threshold
+        classes=None,  # filter by class: --classes 0, or --classes 0 2 3
+        device='',  # cuda device, i.e. 0 or 0,1,2,3 or cpu
+        half=False,  # use FP16 half-precision inference
+        dnn=False,  # use OpenCV DNN for ONNX inference
+        workers=4,  # sequences tracked at the same time
+        model_cache=None,  # directory of TorchScript traces of the models, loaded instead of the weights (built on the first run)
+):
+    sequences = find_sequences(data, sequences)
+    output = Path(output)
+    output.mkdir(parents=True, exist_ok=True)
+    if isinstance(yolo_weights, (list, tuple)):
+        yolo_weights = yolo_weights[0] if len(yolo_weights) == 1 else list(yolo_weights)
+    for w in (yolo_weights if isinstance(yolo_weights, list) else [yolo_weights]) + [strong_sort_weights]:
+        if not Path(w).is_file():  # the loaders would try to download them
+            raise FileNotFoundError(f'{w} does not exist, put the weights there first (this runner never downloads)')
+
+    # Load the models once, concurrently
+    t0 = time.perf_counter()
+    device = select_device(device)
+    model, reid = load_models(yolo_weights, strong_sort_weights, device, imgsz, half, dnn, cache=model_cache)
+    imgsz = check_img_size(imgsz, s=model.stride)
+    # one ReID model, the crops of the sequences tracked at the same time share a forward pass
+    extractor = SharedExtractor(reid, parties=workers)
+    t_load = time.perf_counter() - t0
+    LOGGER.info(f'Models loaded in {t_load:.1f}s, tracking {len(sequences)} sequences with {workers} workers')
+
+    tmp = Path(tempfile.mkdtemp(prefix='mot_eval_'))
+
+    def evaluate(name):
+        frames = sequences[name]
+        t = time.perf_counter()
+        track.run(source=frames, yolo_weights=Path(yolo_weights) if not isinstance(yolo_weights, list) else yolo_weights,
+                  strong_sort_weights=Path(strong_sort_weights), config_strongsort=config_strongsort, imgsz=imgsz,
+                  conf_thres=conf_thres, iou_thres=iou_thres, classes=classes, half=half, show_vid=False, save_txt=True,
+                  project=tmp, name=name, exist_ok=True, model=model, extractor=extractor)
+        t = time.perf_counter() - t
+        result = tmp / name / 'tracks' / f'{frames.name}.txt'  # named after the directory of the frames
+        if result.exists():
+            shutil.move(str(result), output / f'{name}.txt')
+        else:  # no track in the whole sequence
+            (output / f'{name}.txt').touch()
+        return name, sum(1 for f in frames.iterdir() if f.suffix[1:].lower() in IMG_FORMATS), t
+
+    t0 = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='mot-eval') as pool:
+            timings = list(pool.map(evaluate, sequences))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    t_total = time.perf_counter() - t0
+
+    LOGGER.info(f'{"sequence":>12} {"frames":>7} {"time (s)":>9} {"FPS":>7}')
+    for name, n, t in timings:
+        LOGGER.info(f'{name:>12} {n:>7} {t:>9.1f} {n / t:>7.1f}')
+    frames = sum(n for _, n, _ in timings)
+    LOGGER.info(f'{"total":>12} {frames:>7} {t_total:>9.1f} {frames / t_total:>7.1f}   (models loaded once in {t_load:.1f}s)')
+    LOGGER.info(f'Results saved to {output}')
+    return timings
+
+
+def parse_opt():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data', type=str, default=ROOT / 'MOT16_eval/TrackEval/data/MOT16/train', help='directory of sequences')
+    parser.add_argument('--sequences', nargs='+', type=str, default=None, help='sequences to track, default all')
+    parser.add_argument('--output', type=str, default=ROOT / 'MOT16_eval/TrackEval/data/trackers/mot_challenge/MOT16-train/ch_yolov5m_strong_sort/data',
+                        help='directory of the <sequence>.txt results')
+    parser.add_argument('--yolo-weights', nargs='+', type=str, default=WEIGHTS / 'yolov5m.pt', help='model.pt path(s)')
+    parser.add_argument('--strong-sort-weights', type=str, default=WEIGHTS / 'osnet_x0_25_msmt17.pt')
+    parser.add_argument('--config-strongsort', type=str, default='strong_sort/configs/strong_sort.yaml')
+    parser.add_argument('--imgsz', '--img', '--img-size', nargs='+', type=int, default=[640], help='inference size h,w')
+    parser.add_argument('--conf-thres', type=float, default=0.25, help='confidence threshold')
+    parser.add_argument('--iou-thres', type=float, default=0.45, help='NMS IoU threshold')
+    parser.add_argument('--classes', nargs='+', type=int, help='filter by class: --classes 0, or --classes 0 2 3')
+    parser.add_argument('--device', default='', help='cuda device, i.e. 0 or 0,1,2,3 or cpu')
+    parser.add_argument('--half', action='store_true', help='use FP16 half-precision inference')
+    parser.add_argument('--dnn', action='store_true', help='use OpenCV DNN for ONNX inference')
+    parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1), help='sequences tracked at the same time')
+    parser.add_argument('--model-cache', type=str, default=None, help='load the models from TorchScript traces in this directory, traced on the first run')
+    opt = parser.parse_args()
+    opt.imgsz *= 2 if len(opt.imgsz) == 1 else 1  # expand
+    print_args(vars(opt))
+    return opt
+
+
+if __name__ == "__main__":
+    opt = parse_opt()
+    run(**vars(opt))
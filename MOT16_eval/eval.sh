@@ -67,42 +67,14 @@ fi
 # create folder to place tracking results for this method
 mkdir -p ./MOT16_eval/TrackEval/data/trackers/mot_challenge/MOT16-train/ch_yolov5m_deep_sort/data/
 
-# inference on 4 MOT16 video sequences at the same time
-# suits a 4GB GRAM GPU, feel free to increase if you have more memory
-N=4
-
-# generate tracking results for each sequence
-for i in MOT16-02 MOT16-04 MOT16-05 MOT16-09 MOT16-10 MOT16-11 MOT16-13 
-do
-	(
-		# change name to inference source so that each thread write to its own .txt file
-		if [ ! -d ./MOT16_eval/TrackEval/data/MOT16/train/$i/$i ]
-		then
-			mv ./MOT16_eval/TrackEval/data/MOT16/train/$i/img1/ ./MOT16_eval/TrackEval/data/MOT16/train/$i/$i
-		fi
-		# run inference on sequence frames
-		python3 track.py --source ./MOT16_eval/TrackEval/data/MOT16/train/$i/$i --save-txt --yolo-weights yolov5/weights/crowdhuman_yolov5m.pt --classes 0 --exist-ok --imgsz 1280
-	    # move generated results to evaluation repo
-	) &
-	# https://unix.stackexchange.com/questions/103920/parallelize-a-bash-for-loop
-	# allow to execute up to $N jobs in parallel
-    if [[ $(jobs -r -p | wc -l) -ge $N ]]
-	then
-        # now there are $N jobs already running, so wait here for any job
-        # to be finished so there is a place to start next one.
-        wait -n
-    fi
-done
-
-# no more jobs to be started but wait for pending jobs
-# (all need to be finished)
-wait
+# generate tracking results for each sequence in one process: the models are loaded once
+# and shared by 4 worker threads, suits a 4GB GRAM GPU, feel free to increase if you have more memory
+python3 MOT16_eval/eval.py --data ./MOT16_eval/TrackEval/data/MOT16/train \
+ --sequences MOT16-02 MOT16-04 MOT16-05 MOT16-09 MOT16-10 MOT16-11 MOT16-13 \
+ --output ./MOT16_eval/TrackEval/data/trackers/mot_challenge/MOT16-train/ch_yolov5m_deep_sort/data/ \
+ --yolo-weights yolov5/weights/crowdhuman_yolov5m.pt --classes 0 --imgsz 1280 --workers 4
 echo "Inference on all MOT16 sequences DONE"
 
-echo "Moving data from experiment folder to MOT16"
-mv ./runs/track/exp/* \
-   ./MOT16_eval/TrackEval/data/trackers/mot_challenge/MOT16-train/ch_yolov5m_deep_sort/data/
-
 # run the evaluation
 python ./MOT16_eval/TrackEval/scripts/run_mot_challenge.py --BENCHMARK MOT16 \
  --TRACKERS_TO_EVAL ch_yolov5m_deep_sort --SPLIT_TO_EVAL train --METRICS CLEAR Identity \
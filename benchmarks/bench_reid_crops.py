@@ -0,0 +1,102 @@
+"""
+Compare the batched ROI-align crop path of the ReID features with the per-crop torchreid path.
+
+Boxes of random sizes are drawn on a frame (the first frame of --source, or
+a smooth random frame) and their embeddings are computed both ways: the
+list of crops handed to the torchreid `FeatureExtractor` (or the
+`ONNXExtractor` of an `.onnx` model) and `ROIExtractor`. For every object
+count the time per frame of both paths and the cosine drift `1 - cos(a, b)`
+between their embeddings are printed; a drift of a few 1E-3 is the
+difference between the PIL and the ROI-align resampling.
+
+    $ python benchmarks/bench_reid_crops.py --weights strong_sort/deep/checkpoint/osnet_x0_25_msmt17.pth --objects 1 10 40 100
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+import torch
+
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[1]
+for path in (ROOT, ROOT / 'strong_sort'):
+    if str(path) not in sys.path:
+        sys.path.append(str(path))
+
+from strong_sort.strong_sort import StrongSORT
+
+
+def load_frame(source, height, width, rng):
+    if source:
+        cap = cv2.VideoCapture(str(source))
+        ret, frame = cap.read()
+        cap.release()
+        if not ret:
+            raise FileNotFoundError(f'Cannot read a frame from {source}')
+        return frame
+    low = rng.integers(0, 256, (height // 16, width // 16, 3)).astype(np.uint8)
+    return cv2.resize(low, (width, height), interpolation=cv2.INTER_CUBIC)
+
+
+def random_boxes(n, height, width, rng):
+    """`n` center xywh boxes of 20 to 400 pixels, within the frame."""
+    wh = rng.uniform(20, 400, (n, 2))
+    xy = rng.uniform(wh / 2, (width, height) - wh / 2)
+    return np.concatenate((xy, wh), axis=1)
+
+
+def cosine_drift(a, b):
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return 1 - (a * b).sum(1)
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - t0)
+    return out, np.median(times)
+
+
+def run(weights=ROOT / 'strong_sort/deep/checkpoint/osnet_x0_25_msmt17.pth', source=None, objects=(1, 10, 40, 100),
+        repeat=10, height=1080, width=1920, device='cpu', threads=1, seed=0):
+    rng = np.random.default_rng(seed)
+    torch.set_num_threads(threads)
+    strongsort = StrongSORT(Path(weights), device, roi_align=True)
+    if strongsort.roi_extractor is None:
+        raise ValueError(f'{weights} does not load a torchreid or ONNX model')
+    frame = load_frame(source, height, width, rng)
+    strongsort.height, strongsort.width = frame.shape[:2]
+    print(f'{"objects":>8} {"crops (ms)":>11} {"roi (ms)":>9} {"speedup":>8} {"drift mean":>11} {"drift max":>10}')
+    for n in objects:
+        xyxy = [strongsort._xywh_to_xyxy(box) for box in random_boxes(n, *frame.shape[:2], rng)]
+        with torch.no_grad():
+            ref, t_ref = timed(lambda: strongsort.extractor([frame[y1:y2, x1:x2] for x1, y1, x2, y2 in xyxy]), repeat)
+        out, t_roi = timed(lambda: strongsort.roi_extractor(frame, xyxy), repeat)
+        drift = cosine_drift(ref.cpu().numpy(), out.cpu().numpy())
+        print(f'{n:>8} {t_ref * 1E3:>11.2f} {t_roi * 1E3:>9.2f} {t_ref / t_roi:>8.2f} {drift.mean():>11.2e} {drift.max():>10.2e}')
+
+
+def parse_opt():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--weights', type=str, default=ROOT / 'strong_sort/deep/checkpoint/osnet_x0_25_msmt17.pth',
+                        help='torchreid .pth or exported .onnx model')
+    parser.add_argument('--source', type=str, default=None, help='image or video whose first frame is cropped')
+    parser.add_argument('--objects', nargs='+', type=int, default=[1, 10, 40, 100], help='boxes per frame')
+    parser.add_argument('--repeat', type=int, default=10, help='timed runs per object count, the median is reported')
+    parser.add_argument('--height', type=int, default=1080, help='height of the random frame')
+    parser.add_argument('--width', type=int, default=1920, help='width of the random frame')
+    parser.add_argument('--device', default='cpu', help='cpu or cuda device')
+    parser.add_argument('--threads', type=int, default=1, help='torch intra-op threads')
+    parser.add_argument('--seed', type=int, default=0)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    opt = parse_opt()
+    run(**vars(opt))
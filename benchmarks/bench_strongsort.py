@@ -0,0 +1,270 @@
+"""
+Micro-benchmark of the StrongSORT core, without model weights, GPU or video.
+
+A synthetic scene of objects moving at constant speed is detected on every
+frame with small box jitter; every object carries a random unit-norm
+embedding, perturbed on every frame, which a stub extractor hands to
+`StrongSORT` in place of the torchreid `FeatureExtractor`. Once the tracks
+are confirmed, each component is timed on the same tracker state:
+
+    kalman_predict     KalmanFilter.predict of every track
+    kalman_update      KalmanFilter.update of every track
+    gating_distance    KalmanFilter.gating_distance of every track to all detections
+    iou_cost           iou_matching.iou_cost
+    min_cost_matching  linear_assignment.min_cost_matching on the IoU cost
+    nn_distance        NearestNeighborDistanceMetric.distance
+    tracker_update     Tracker.predict + Tracker.update
+    strongsort_update  StrongSORT.update with the stub extractor
+
+The mean, p50 and p95 time per frame of every component and object count are
+printed and, with --json, written to a file together with the commit, so
+runs can be compared across commits.
+
+The lazy association (LAZY_REID) is checked against the eager one on the same
+scene: both trackers are run for the timed frames, the eager one with the
+features of all the detections, the lazy one extracting them on demand with
+--lazy-refresh as LAZY_REFRESH. The ID switches of every object (the track id
+its detection is associated to changes) and the fraction of the detections
+whose features were extracted are printed for both.
+
+    $ python benchmarks/bench_strongsort.py --objects 10 100 1000 --json runs/bench/strongsort.json
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[1]
+for path in (ROOT, ROOT / 'strong_sort', ROOT / 'strong_sort/deep/reid'):
+    if str(path) not in sys.path:
+        sys.path.append(str(path))
+
+from strong_sort.sort import iou_matching, linear_assignment
+from strong_sort.sort.detection import Detection
+from strong_sort.sort.nn_matching import NearestNeighborDistanceMetric
+from strong_sort.sort.tracker import Tracker
+from strong_sort.strong_sort import StrongSORT
+
+
+class Scene(object):
+    """Objects moving at constant speed in a frame, with one embedding each."""
+
+    def __init__(self, n, height, width, dim, noise, rng):
+        self.height, self.width = height, width
+        self.noise = noise
+        self.rng = rng
+        self.wh = rng.uniform((40, 30), (200, 150), (n, 2))
+        self.xy = rng.uniform(self.wh / 2, (width, height) - self.wh / 2)
+        self.v = rng.normal(0, 2, (n, 2))
+        self.embeddings = unit(rng.normal(size=(n, dim)))
+
+    def step(self):
+        """Advance one frame and detect the objects."""
+        self.xy += self.v
+        bounce = (self.xy < self.wh / 2) | (self.xy > (self.width, self.height) - self.wh / 2)
+        self.v[bounce] *= -1
+        return self.observe()
+
+    def observe(self):
+        """Detect the objects in the current frame; returns the center xywh boxes, confidences, classes and features."""
+        xywh = np.concatenate((self.xy + self.rng.normal(0, 1, self.xy.shape), self.wh), axis=1)
+        confs = self.rng.uniform(0.5, 1., len(xywh))
+        features = unit(self.embeddings + self.rng.normal(0, self.noise, self.embeddings.shape))
+        return xywh, confs, np.full(len(xywh), 2.), features.astype(np.float32)
+
+
+class StubExtractor(object):
+    """Stands in for the torchreid `FeatureExtractor`: returns the features fed by the scene."""
+
+    def __init__(self):
+        self.features = None
+
+    def __call__(self, crops):
+        return torch.from_numpy(self.features[:len(crops)])
+
+
+class RecordingTracker(Tracker):
+    """`Tracker` that records the track id each detection was associated to in the last `update`."""
+
+    def _match(self, detections, extract=None):
+        matches, unmatched_tracks, unmatched_detections = super()._match(detections, extract)
+        self.assigned = {d: self.tracks[k].track_id for k, d in matches}
+        self.assigned.update({d: self._next_id + i for i, d in enumerate(unmatched_detections)})  # new tracks
+        return matches, unmatched_tracks, unmatched_detections
+
+
+def unit(x):
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def tlwh(xywh):
+    out = xywh.copy()
+    out[:, :2] -= out[:, 2:] / 2
+    return out
+
+
+def detections(xywh, confs, features):
+    return [Detection(box, conf, torch.from_numpy(f)) for box, conf, f in zip(tlwh(xywh), confs, features)]
+
+
+def timed(fn, frames, setup=None):
+    """Times per call of `fn(*setup())`, in seconds."""
+    times = []
+    for _ in range(frames):
+        args = setup() if setup is not None else ()
+        t0 = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - t0)
+    return np.array(times)
+
+
+def bench(n, frames, warmup, height, width, dim, noise, budget, max_dist, max_iou_distance, rng):
+    scene = Scene(n, height, width, dim, noise, rng)
+    metric = NearestNeighborDistanceMetric('cosine', max_dist, budget)
+    tracker = Tracker(metric, max_iou_distance=max_iou_distance, max_age=30, n_init=3)
+    extractor = StubExtractor()
+    strongsort = StrongSORT(None, 'cpu', max_dist=max_dist, max_iou_distance=max_iou_distance, nn_budget=budget,
+                            extractor=extractor)
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+
+    def track():
+        xywh, confs, classes, features = scene.step()
+        tracker.predict()
+        tracker.update(detections(xywh, confs, features), torch.from_numpy(classes), torch.from_numpy(confs))
+        extractor.features = features
+        strongsort.update(torch.from_numpy(xywh), torch.from_numpy(confs), torch.from_numpy(classes), frame)
+
+    for _ in range(warmup):  # confirm the tracks
+        track()
+
+    def frame_detections():  # the components are timed on the current frame, the tracker state is left unchanged
+        xywh, confs, _, features = scene.observe()
+        return detections(xywh, confs, features), features
+
+    kf, tracks = tracker.kf, tracker.tracks
+    results = dict(
+        kalman_predict=timed(lambda: [kf.predict(t.mean, t.covariance) for t in tracks], frames),
+        kalman_update=timed(lambda dets: [kf.update(t.mean, t.covariance, d.to_xyah(), d.confidence)
+                                          for t, d in zip(tracks, dets)],
+                            frames, lambda: frame_detections()[:1]),
+        gating_distance=timed(lambda msrs: [kf.gating_distance(t.mean, t.covariance, msrs) for t in tracks],
+                              frames, lambda: (np.asarray([d.to_xyah() for d in frame_detections()[0]]),)),
+        iou_cost=timed(lambda dets: iou_matching.iou_cost(tracks, dets), frames, lambda: frame_detections()[:1]),
+        min_cost_matching=timed(lambda dets: linear_assignment.min_cost_matching(
+            iou_matching.iou_cost, max_iou_distance, tracks, dets), frames, lambda: frame_detections()[:1]),
+        nn_distance=timed(lambda features: metric.distance(features, [t.track_id for t in tracks if t.is_confirmed()]),
+                          frames, lambda: frame_detections()[1:]),
+    )
+    steps = [scene.step() for _ in range(frames)]
+
+    def tracker_step(xywh, confs, classes, features):
+        tracker.predict()
+        tracker.update(detections(xywh, confs, features), torch.from_numpy(classes), torch.from_numpy(confs))
+
+    def strongsort_step(xywh, confs, classes, features):
+        extractor.features = features
+        strongsort.update(torch.from_numpy(xywh), torch.from_numpy(confs), torch.from_numpy(classes), frame)
+
+    it = iter(steps)
+    results['tracker_update'] = timed(tracker_step, frames, lambda: next(it))
+    it = iter(steps)
+    results['strongsort_update'] = timed(strongsort_step, frames, lambda: next(it))
+    return {k: dict(mean_ms=t.mean() * 1E3, p50_ms=np.percentile(t, 50) * 1E3, p95_ms=np.percentile(t, 95) * 1E3)
+            for k, t in results.items()}, len(tracker.tracks)
+
+
+def id_switches(n, frames, height, width, dim, noise, budget, max_dist, max_iou_distance, lazy_refresh, rng):
+    """ID switches and extracted fraction of the detections of eager and lazy association on the same scene."""
+    scene = Scene(n, height, width, dim, noise, rng)
+    trackers = dict(eager=RecordingTracker(NearestNeighborDistanceMetric('cosine', max_dist, budget),
+                                           max_iou_distance=max_iou_distance, max_age=30, n_init=3),
+                    lazy=RecordingTracker(NearestNeighborDistanceMetric('cosine', max_dist, budget),
+                                          max_iou_distance=max_iou_distance, max_age=30, n_init=3,
+                                          lazy_refresh=lazy_refresh))
+    switches, extracted, last = dict.fromkeys(trackers, 0), dict(eager=n * frames, lazy=0), {k: {} for k in trackers}
+    for _ in range(frames):
+        xywh, confs, classes, features = scene.step()
+
+        def extract(indices):
+            extracted['lazy'] += len(indices)
+            return features[indices]
+
+        for name, tracker in trackers.items():
+            tracker.predict()
+            if name == 'eager':
+                tracker.update(detections(xywh, confs, features), torch.from_numpy(classes), torch.from_numpy(confs))
+            else:
+                tracker.update([Detection(box, conf, None) for box, conf in zip(tlwh(xywh), confs)],
+                               torch.from_numpy(classes), torch.from_numpy(confs), extract)
+            for obj, track_id in tracker.assigned.items():  # the scene detects object k as detection k
+                switches[name] += last[name].get(obj, track_id) != track_id
+                last[name][obj] = track_id
+    return {k: dict(id_switches=int(switches[k]), reid_rate=extracted[k] / (n * frames)) for k in trackers}
+
+
+def commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(objects=(10, 50, 100, 500, 1000), frames=50, warmup=5, height=1080, width=1920, dim=512, noise=0.1,
+        budget=100, max_dist=0.2, max_iou_distance=0.7, lazy_refresh=30, seed=0, json_path=None):
+    rng = np.random.default_rng(seed)
+    torch.set_num_threads(1)
+    out = dict(commit=commit(), time=time.strftime('%Y-%m-%dT%H:%M:%S'), python=platform.python_version(),
+               torch=torch.__version__, numpy=np.__version__,
+               config=dict(frames=frames, warmup=warmup, height=height, width=width, dim=dim, noise=noise,
+                           budget=budget, max_dist=max_dist, max_iou_distance=max_iou_distance,
+                           lazy_refresh=lazy_refresh, seed=seed),
+               results={}, association={})
+    print(f'{"objects":>8} {"tracks":>7} {"component":>18} {"mean (ms)":>10} {"p50 (ms)":>10} {"p95 (ms)":>10}')
+    for n in objects:
+        res, nr_tracks = bench(n, frames, warmup, height, width, dim, noise, budget, max_dist, max_iou_distance, rng)
+        out['results'][str(n)] = res
+        for name, r in res.items():
+            print(f'{n:>8} {nr_tracks:>7} {name:>18} {r["mean_ms"]:>10.3f} {r["p50_ms"]:>10.3f} {r["p95_ms"]:>10.3f}')
+    print(f'\n{"objects":>8} {"association":>12} {"ID switches":>12} {"ReID rate":>10}')
+    for n in objects:
+        res = id_switches(n, frames, height, width, dim, noise, budget, max_dist, max_iou_distance, lazy_refresh, rng)
+        out['association'][str(n)] = res
+        for name, r in res.items():
+            print(f'{n:>8} {name:>12} {r["id_switches"]:>12} {r["reid_rate"]:>10.3f}')
+    if json_path:
+        json_path = Path(json_path)
+        json_path.parent.mkdir(parents=True, exist_ok=True)
+        json_path.write_text(json.dumps(out, indent=1))
+        print(f'Results saved to {json_path}')
+    return out
+
+
+def parse_opt():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--objects', nargs='+', type=int, default=[10, 50, 100, 500, 1000], help='object counts to benchmark')
+    parser.add_argument('--frames', type=int, default=50, help='timed frames per component and object count')
+    parser.add_argument('--warmup', type=int, default=5, help='frames tracked before timing, to confirm the tracks')
+    parser.add_argument('--height', type=int, default=1080, help='frame height')
+    parser.add_argument('--width', type=int, default=1920, help='frame width')
+    parser.add_argument('--dim', type=int, default=512, help='embedding size')
+    parser.add_argument('--noise', type=float, default=0.1, help='per-frame embedding noise')
+    parser.add_argument('--budget', type=int, default=100, help='NN_BUDGET, samples kept per track')
+    parser.add_argument('--max-dist', type=float, default=0.2, help='MAX_DIST, appearance gating threshold')
+    parser.add_argument('--max-iou-distance', type=float, default=0.7, help='MAX_IOU_DISTANCE')
+    parser.add_argument('--lazy-refresh', type=int, default=30, help='LAZY_REFRESH of the lazy association')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', dest='json_path', default=None, help='write the results to this JSON file')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    opt = parse_opt()
+    run(**vars(opt))
@@ -0,0 +1,71 @@
+"""
+Micro-benchmark of the per-frame zone lookup of parking_violation.py.
+
+Random quadrilateral zones are scattered over the frame and a fixed number of
+random tracks is tested against them, reporting the mean time of one
+`ZoneSet.assign` call (one check frame) for every zone count.
+
+    $ python benchmarks/bench_zones.py --zones 1 10 100 1000 --tracks 50
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))
+
+from violation.zones import Zone, ZoneSet
+
+
+def random_zones(n, height, width, size, rng):
+    centers = rng.uniform((0, 0), (width, height), (n, 2))
+    offsets = np.array([[-1, -1], [1, -1], [1, 1], [-1, 1]]) * size / 2
+    return [Zone(k, c + offsets + rng.uniform(-size / 4, size / 4, (4, 2)), 5., (height, width))
+            for k, c in enumerate(centers)]
+
+
+def random_tracks(n, height, width, rng):
+    x1 = rng.uniform(0, width - 200, n)
+    y1 = rng.uniform(0, height - 150, n)
+    w, h = rng.uniform(40, 400, n), rng.uniform(40, 300, n)
+    return np.stack([x1, y1, np.minimum(x1 + w, width - 1), np.minimum(y1 + h, height - 1)], axis=1)
+
+
+def run(zones=(1, 10, 100, 1000), tracks=50, height=1080, width=1920, zone_size=120, cell_size=64, frames=200, seed=0):
+    rng = np.random.default_rng(seed)
+    print(f'{"zones":>7} {"build (ms)":>12} {"per frame (us)":>16} {"pairs":>7}')
+    for n in zones:
+        t0 = time.perf_counter()
+        zone_set = ZoneSet(random_zones(n, height, width, zone_size, rng), (height, width), cell_size)
+        t_build = time.perf_counter() - t0
+        boxes = [random_tracks(tracks, height, width, rng) for _ in range(frames)]
+        zone_set.assign(boxes[0])  # warmup
+        t0 = time.perf_counter()
+        pairs = 0
+        for b in boxes:
+            pairs += (zone_set.assign(b) >= 0).sum()
+        t_frame = (time.perf_counter() - t0) / frames
+        print(f'{n:>7} {t_build * 1E3:>12.1f} {t_frame * 1E6:>16.1f} {pairs / frames:>7.1f}')
+
+
+def parse_opt():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--zones', nargs='+', type=int, default=[1, 10, 100, 1000], help='zone counts to benchmark')
+    parser.add_argument('--tracks', type=int, default=50, help='tracks per frame')
+    parser.add_argument('--height', type=int, default=1080, help='frame height')
+    parser.add_argument('--width', type=int, default=1920, help='frame width')
+    parser.add_argument('--zone-size', type=int, default=120, help='approximate zone side (pixels)')
+    parser.add_argument('--cell-size', type=int, default=64, help='grid index cell side (pixels)')
+    parser.add_argument('--frames', type=int, default=200, help='timed frames per zone count')
+    parser.add_argument('--seed', type=int, default=0)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    opt = parse_opt()
+    run(**vars(opt))
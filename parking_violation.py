@@ -9,15 +9,12 @@ os.environ["VECLIB_MAXIMUM_THREADS"] = "1"
 os.environ["NUMEXPR_NUM_THREADS"] = "1"
 
 import sys
+import time
+STARTUP = time.perf_counter() # 启动耗时统计包含模块导入时间
 import numpy as np
 from pathlib import Path
 import torch
 import torch.backends.cudnn as cudnn
-from skimage.draw import line
-from datetime import datetime
-import time
-import xlwt
-from PIL import Image
 FILE = Path(__file__).resolve()
 ROOT = FILE.parents[0]  # yolov5 strongsort root directory
 WEIGHTS = ROOT / 'weights'
@@ -33,12 +30,28 @@ ROOT = Path(os.path.relpath(ROOT, Path.cwd()))  # relative
 import logging
 from yolov5.models.common import DetectMultiBackend
 from yolov5.utils.dataloaders import VID_FORMATS, LoadImages, LoadStreams
+from yolov5.utils.augmentations import letterbox
 from yolov5.utils.general import (LOGGER, check_img_size, non_max_suppression, scale_coords, check_requirements, cv2,
                                   check_imshow, xyxy2xywh, increment_path, strip_optimizer, colorstr, print_args, check_file)
 from yolov5.utils.torch_utils import select_device, time_sync
-from yolov5.utils.plots import Annotator, colors, save_one_box
+from yolov5.utils.plots import colors, save_one_box
 from strong_sort.utils.parser import get_config
 from strong_sort.strong_sort import StrongSORT
+from strong_sort.deep.shared_extractor import SharedExtractor
+from violation.zones import load_zones
+from violation.clock import StreamClock
+from violation.detector import ViolationDetector
+from violation.evidence import EvidenceWriter
+from violation.render import ViolationRenderer
+from pipeline.scheduler import StreamScheduler
+from pipeline.stages import Pipeline, Stage
+from pipeline.batching import BatchAssembler, LatencyMeter
+from pipeline.stride import DetectionStride
+from pipeline.tiling import ZoneTiler
+from pipeline.gating import MotionGate
+from pipeline.frames import CopyCounter, FramePool, LoadPooledVideo
+from pipeline.metrics import Metrics
+from pipeline.startup import ModelCache, StartupTimer, fixed_batch, load_models
 
 # remove duplicated stream handler to avoid duplicated logging
 logging.getLogger().removeHandler(logging.getLogger().handlers[0])
@@ -49,6 +62,7 @@ def run(
         yolo_weights=WEIGHTS / 'yolov5m.pt',  # model.pt path(s),
         strong_sort_weights=WEIGHTS / 'osnet_x0_25_msmt17.pth',  # model.pt path,
         config_strongsort=ROOT / 'strong_sort/configs/strong_sort.yaml',
+        config_zones=ROOT / 'strong_sort/configs/zones.yaml',  # no-parking zones
         imgsz=(640, 640),  # inference size (height, width)
         conf_thres=0.25,  # confidence threshold
         iou_thres=0.45,  # NMS IOU threshold
@@ -74,6 +88,27 @@ def run(
         hide_class=False,  # hide IDs
         half=False,  # use FP16 half-precision inference
         dnn=False,  # use OpenCV DNN for ONNX inference
+        max_track_states=1024,  # maximum number of tracks with violation state per source
+        evidence_queue=64,  # maximum number of pending violation records
+        evidence_policy='block',  # full evidence queue: block, drop-newest or drop-oldest
+        fps_budget=0,  # frames per second shared by all live streams, 0 to process every frame
+        min_stream_fps=1.,  # frame rate guaranteed to every live stream under --fps-budget
+        pipeline=False,  # run decoding, detection and tracking on worker threads
+        queue_size=4,  # capacity of the queues between pipeline stages
+        queue_policy='block',  # full queue on live sources: block or drop-oldest
+        batch_size=0,  # frames per detector forward, 0 for one frame per source
+        batch_wait=0.01,  # maximum time in seconds a frame waits for its batch to fill (with --pipeline)
+        det_stride=1,  # run the detector every det_stride frames, coast the tracks in between
+        adaptive_stride=False,  # adapt the stride to the motion in the scene, up to det_stride
+        tiled=False,  # detect on full resolution tiles covering the zones only
+        tile_margin=128,  # pixels around the zones covered by the tiles, and minimum tile overlap
+        motion_gate=False,  # skip the detector while nothing changes around the zones
+        gate_threshold=15,  # grey level difference of a changed pixel for --motion-gate
+        gate_refresh=2.,  # seconds after which the motion gate is forced open
+        frame_pool=False,  # decode video files into a ring of preallocated frame buffers
+        metrics=None,  # file the stage latencies, queue depths and drops are exported to (*.json or Prometheus text)
+        metrics_interval=10.,  # seconds between metrics exports
+        model_cache=None,  # directory of TorchScript traces of the models, loaded instead of the weights (built on the first run)
 ):
 
     source = str(source)
@@ -96,52 +131,56 @@ def run(
     (save_dir / 'tracks' if save_txt else save_dir).mkdir(parents=True, exist_ok=True)  # make dir
 
     # Load model
+    startup = StartupTimer(STARTUP) # 各启动步骤耗时，处理第一帧后输出
+    startup.mark('imports')
     device = select_device(device)
-    model = DetectMultiBackend(yolo_weights, device=device, dnn=dnn, data=None, fp16=half) # 加载yolov5模型
+    # 并行加载yolov5模型与ReID模型，指定model_cache时从TorchScript缓存加载（首次运行时生成）
+    streams = len(Path(source).read_text().rsplit()) if webcam and Path(source).is_file() else 1 # LoadStreams打开的视频源数
+    # 缓存的TorchScript按每次推理的帧数生成（分块检测的图块数在读取视频后才确定，见下方）
+    model, reid = load_models(yolo_weights, strong_sort_weights, device, imgsz, half, dnn, cache=model_cache, timer=startup,
+                              batch=batch_size or streams)
+    startup.mark('models')
     stride, names, pt = model.stride, model.names, model.pt # 步长(32)、类别名字（00：‘persion', 01'bicycle', 02:'car')、pytorch(true)
     imgsz = check_img_size(imgsz, s=stride)  # check image size （如果不能被32整除要处理成能被32整除）
 
     # Dataloader
+    copies = CopyCounter() # 统计帧数据的复制量，只有需要修改画面的阶段（绘制、证据截图）才复制
     if webcam:
         show_vid = check_imshow()
         cudnn.benchmark = True  # set True to speed up constant image size inference
         dataset = LoadStreams(source, img_size=imgsz, stride=stride, auto=pt)
         nr_sources = len(dataset)
+    elif frame_pool and is_file: # 视频直接解码到预分配的帧缓冲区，后续各阶段只读取其只读视图
+        pool_size = 3 * (batch_size or 1) + (3 * queue_size + 2 if pipeline else 0) + 4  # 各队列中的帧数上限
+        dataset = LoadPooledVideo(source, pool_size, counter=copies)
+        nr_sources = 1
     else:
+        if frame_pool:
+            LOGGER.warning('--frame-pool only applies to video files')
         dataset = LoadImages(source, img_size=imgsz, stride=stride, auto=pt)
         nr_sources = 1
     vid_path, vid_writer, txt_path = [None] * nr_sources, [None] * nr_sources, [None] * nr_sources
-    
-    # 打开excel工作薄
-    workbook = xlwt.Workbook()
-    sheet = workbook.add_sheet("Sheet1")
-
-    # 选择格式
-    style = xlwt.easyxf('font: bold 1')
-    row_num = 0
-
-    FPS =  getattr(dataset, 'fps') # 获取检测视频帧率
-    parking_co = [] # 违停区域坐标系
-    frame_dic= {} # 与违停区域相交的目标日志
-    cache_dic = {} # 违停区域内静止目标日志
-    viol_dic = {} # 违停日志
-    blanked = np.zeros((getattr(dataset, 'frame_height'), getattr(dataset, 'frame_width'), 3), dtype=np.uint8)  # 新建一个与视频尺寸相同的空白区域
-    pts = np.array(([687, 648], [610, 738], [322, 666], [432, 638])) # 感兴趣区域四个顶点坐标
-
-    mask = cv2.fillPoly(blanked, np.int32([pts]), (0, 0, 255)) # 对空白区域进行内部填充 BGR 
-   
-    # 取出填充像素坐标
-    
-    x_cord = np.where(mask == 255)[1] 
-    y_cord = np.where(mask == 255)[0]
-
-    for q in range(0, len(x_cord)):
-        parking_co.append((x_cord[q], y_cord[q])) # 加入到停车区域坐标系中
+    startup.mark('source')
+
+    # 违停证据（excel记录、车辆截图、日志）由后台线程写入，不阻塞检测循环
+    evidence = EvidenceWriter(save_dir, maxsize=evidence_queue, policy=evidence_policy, logger=LOGGER)
+
+    FPS =  getattr(dataset, 'fps') # 获取检测视频帧率（可为小数，如29.97）
+    clocks = [StreamClock(FPS, live=webcam) for _ in range(nr_sources)] # 按视频时间（PTS或frame_idx/fps）计时，与处理速度无关
+    frame_shape = (getattr(dataset, 'frame_height'), getattr(dataset, 'frame_width'), 3)  # 视频尺寸
+    zones = load_zones(config_zones, frame_shape) # 从配置文件读取各违停区域（编号、顶点坐标、停留时间阈值）
+    # 违停区域图层预先生成，违停提示仅在变化时重绘（每个视频源各自缓存）
+    renderers = [ViolationRenderer(zones, frame_shape, line_width=2) for _ in range(nr_sources)]
+    # 每个视频源一个违停检测器，目标状态（上一次检测框、静止起始时间、是否违停）随追踪目标删除而释放
+    detectors = [ViolationDetector(zones, capacity=max_track_states) for _ in range(nr_sources)]
+
     # initialize StrongSORT
     cfg = get_config()
     cfg.merge_from_file(opt.config_strongsort)
 
     # Create as many strong sort instances as there are video sources 加载StrongSort模型
+    # 所有视频源共享一个ReID模型，流水线模式下各追踪线程同一轮的裁剪合并为一次前向推理
+    extractor = SharedExtractor(reid, parties=nr_sources if pipeline else 1)
     strongsort_list = []
     for i in range(nr_sources):
         strongsort_list.append(
@@ -155,201 +194,331 @@ def run(
                 nn_budget=cfg.STRONGSORT.NN_BUDGET,
                 mc_lambda=cfg.STRONGSORT.MC_LAMBDA,
                 ema_alpha=cfg.STRONGSORT.EMA_ALPHA,
-
+                roi_align=cfg.STRONGSORT.ROI_ALIGN,
+                reuse_refresh=cfg.STRONGSORT.REUSE_REFRESH,
+                reuse_iou=cfg.STRONGSORT.REUSE_IOU,
+                reuse_speed=cfg.STRONGSORT.REUSE_SPEED,
+                lazy_reid=cfg.STRONGSORT.LAZY_REID,
+                lazy_refresh=cfg.STRONGSORT.LAZY_REFRESH,
+                extractor=extractor,
             )
         )
     outputs = [None] * nr_sources
+    startup.mark('StrongSORT')
+
+    # 多路实时视频按活跃程度分配全局帧率预算，每路保证最低帧率
+    scheduler = StreamScheduler(nr_sources, fps_budget, min_fps=min_stream_fps) if webcam and fps_budget > 0 else None
+    activity = np.zeros(nr_sources) # 各视频源的活跃程度（违停区域内目标数与其他目标数加权）
+    report_at = time.monotonic() + 10
+    # 各视频源每个阶段的耗时分布（p50/p95/p99）、队列长度与丢帧数，定期导出供本地采集
+    stats = Metrics(metrics, interval=metrics_interval)
 
     # Run tracking
     # 使用Yolov5进行追踪
-    model.warmup(imgsz=(1 if pt else nr_sources, 3, *imgsz))  # warmup
+    batch_size = batch_size or (nr_sources if webcam else 1) # 每次推理的帧数，默认每个视频源一帧
+    # 分块检测：只在覆盖违停区域（外扩tile_margin像素）的最少图块上以原始分辨率运行Yolov5
+    tiler = ZoneTiler(zones, frame_shape, tile_size=imgsz, margin=tile_margin, overlap=tile_margin) if tiled else None
+    if tiler is not None and not len(tiler):
+        LOGGER.warning('No zone inside the frame, detecting on the full frame')
+        tiler = None
+    per_frame = len(tiler) if tiler is not None else 1 # 每帧的推理图像数
+    if tiler is not None:
+        LOGGER.info(f'{per_frame} tiles of {imgsz[1]}x{imgsz[0]} cover {tiler.coverage:.0%} of the frame')
+    fixed = fixed_batch(model, batch_size * per_frame) # 固定批大小的导出模型需补齐批次，None表示可接受任意批大小
+    if model_cache and fixed not in (None, batch_size * per_frame): # 缓存按整帧推理生成，分块检测时按图块数重新生成
+        weights = yolo_weights[0] if isinstance(yolo_weights, list) else yolo_weights
+        model = ModelCache(model_cache).detector(weights, device, imgsz, half, dnn, batch=batch_size * per_frame)
+        fixed = fixed_batch(model, batch_size * per_frame)
+    model.warmup(imgsz=(batch_size * per_frame, 3, *imgsz))  # warmup
+    startup.mark('warmup')
     dt, seen = [0.0, 0.0, 0.0, 0.0], 0
     curr_frames, prev_frames = [None] * nr_sources, [None] * nr_sources
-    for frame_idx, (path, im, im0s, vid_cap, s) in enumerate(dataset): # im 为图像数据，如果输入是视频则shape(Batch, color, height, weight)
-        t1 = time_sync()
-        im = torch.from_numpy(im).to(device)
-        im = im.half() if half else im.float()  # uint8 to fp16/32
-        im /= 255.0  # 0 - 255 to 0.0 - 1.0
-        if len(im.shape) == 3:
-            im = im[None]  # expand for batch dim
-        t2 = time_sync()
-        dt[0] += t2 - t1
-
-        # Inference
-        visualize = increment_path(save_dir / Path(path[0]).stem, mkdir=True) if visualize else False
-        pred = model(im, augment=augment, visualize=visualize) # （属于每个类别的概率)
-        t3 = time_sync()
-        dt[1] += t3 - t2
-
-        # Apply NMS (非极大值抑制)
-        pred = non_max_suppression(pred, conf_thres, iou_thres, classes, agnostic_nms, max_det=max_det)
-        dt[2] += time_sync() - t3
-
-        # Process detections
-        for i, det in enumerate(pred):  # detections per image
-            seen += 1
-            if webcam:  # nr_sources >= 1
-                p, im0, _ = path[i], im0s[i].copy(), dataset.count
-                p = Path(p)  # to Path
-                s += f'{i}: '
-                txt_file_name = p.name
-                save_path = str(save_dir / p.name)  # im.jpg, vid.mp4, ...
+    # 每个视频源按检测步长运行Yolov5，其余帧按卡尔曼预测推进轨迹；自适应模式下目标运动或新目标出现时缩短步长
+    strides = [DetectionStride(det_stride, adaptive=adaptive_stride) for _ in range(nr_sources)]
+    # 运动门控：违停区域周围的缩小灰度图与背景无差异时不运行检测，每gate_refresh秒强制检测一次
+    gates = [MotionGate(zones, frame_shape, threshold=gate_threshold, refresh=max(int(gate_refresh * FPS), 1))
+             for _ in range(nr_sources)] if motion_gate else None
+
+    def plan(i, im0): # 本帧的处理方式：detect 运行检测，coast 按卡尔曼预测推进（检测步长），hold 沿用上一帧结果（画面无变化）
+        if not strides[i].step():
+            return 'coast'
+        if gates is not None and not gates[i](im0):
+            return 'hold'
+        return 'detect'
+
+    def read(): # 解码：选择本轮处理的视频源，按视频源拆分，并在解码时读取各帧的视频时间
+        for frame_idx, (t_decode, (path, im, im0s, vid_cap, s)) in enumerate(Metrics.timed(dataset)): # im 为图像数据，如果输入是视频则shape(Batch, color, height, weight)
+            t_capture = time.monotonic()
+            if not webcam:
+                stats.observe('decode', 0, t_decode)
+                im0s = FramePool.view(im0s) # 后续阶段共享同一帧，不可修改
+                im = None if tiler is not None else im # 图块在检测阶段裁剪
+                yield 0, frame_idx, Path(path), im, im0s, vid_cap, s, clocks[0](frame_idx, vid_cap), t_capture
+                continue
+            streams = range(nr_sources) # 本轮处理的视频源
+            if scheduler is not None:
+                streams = scheduler.select()
+                if not len(streams): # 所有视频源均未轮到
+                    time.sleep(scheduler.wait_time())
+                    continue
+            for i in streams:
+                stats.observe('decode', i, t_decode)
+                im_i = None if tiler is not None else im[i]
+                yield i, frame_idx, Path(path[i]), im_i, FramePool.view(im0s[i]), vid_cap, s + f'{i}: ', \
+                    clocks[i](frame_idx, vid_cap), t_capture
+
+    def inputs(frame): # 推理输入：违停区域周围的图块，或letterbox后的整帧（帧缓冲区只解码，仅对需要检测的帧做letterbox）
+        if tiler is not None:
+            return tiler.crop(frame[4])
+        if frame[3] is not None:
+            return frame[3]
+        return np.ascontiguousarray(letterbox(frame[4], imgsz, stride=stride, auto=pt)[0].transpose((2, 0, 1))[::-1])
+
+    def detect(batch): # 检测：决定各帧的处理方式，预处理、一次批量推理与非极大值抑制，再按视频源拆分；跳过检测的帧不参与推理
+        # 检测步长与运动门控在检测阶段（而非解码时）决定：非流水线模式下与追踪阶段的步长反馈在同一线程按帧顺序执行
+        batch = [(*frame, plan(frame[0], frame[4])) for frame in batch]
+        run = [frame for frame in batch if frame[-1] == 'detect']
+        pred, t_yolo = [], 0.
+        if len(run):
+            t1 = time_sync()
+            if len(run) == 1: # 单帧无需拼接复制
+                im = inputs(run[0]) if tiler is not None else inputs(run[0])[None]
             else:
-                p, im0, _ = path, im0s.copy(), getattr(dataset, 'frame', 0)
-                p = Path(p)  # to Path
-                # video file
-                if source.endswith(VID_FORMATS):
-                    txt_file_name = p.stem
-                    save_path = str(save_dir / p.name)  # im.jpg, vid.mp4, ...
-                # folder with imgs
-                else:
-                    txt_file_name = p.parent.name  # get folder name containing current img
-                    save_path = str(save_dir / p.parent.name)  # im.jpg, vid.mp4, ...
-            curr_frames[i] = im0
-
-            txt_path = str(save_dir / 'tracks' / txt_file_name)  # im.txt
-            s += '%gx%g ' % im.shape[2:]  # print string
-            imc = im0.copy() if save_crop else im0  # for save_crop
-            image = Image.fromarray(imc)
-            annotator = Annotator(im0, line_width=2, pil=not ascii, mask=mask)
-            if cfg.STRONGSORT.ECC:  # camera motion compensation
-                strongsort_list[i].tracker.camera_update(prev_frames[i], curr_frames[i])
-
-            if det is not None and len(det):
-                # Rescale boxes from img_size to im0 size
-                det[:, :4] = scale_coords(im.shape[2:], det[:, :4], im0.shape).round()
-
-                # Print results
-                for c in det[:, -1].unique():
-                    n = (det[:, -1] == c).sum()  # detections per class
-                    s += f"{n} {names[int(c)]}{'s' * (n > 1)}, "  # add to string
-
-                xywhs = xyxy2xywh(det[:, 0:4]) #中心宽高
-                confs = det[:, 4] # 置信度
-                clss = det[:, 5] # 类别
-
-                # pass detections to strongsort
-                t4 = time_sync()
-                outputs[i] = strongsort_list[i].update(xywhs.cpu(), confs.cpu(), clss.cpu(), im0)
-                t5 = time_sync()
-                dt[3] += t5 - t4
-
-                # 画出框线并且判断是否有车辆进入违停区域
-                if len(outputs[i]) > 0: 
-                    for j, (output, conf) in enumerate(zip(outputs[i], confs)): # 处理每帧图像中的每个检测目标
-    
-                        bboxes = output[0:4] # 左上角点和右下角点（xyxy)
-                        id = output[4] # 追踪ID
-                        cls = output[5] # 类别 coco数据集（0：‘persion', 1'bicycle', 2:'car'）
-
-                        if frame_idx %  FPS == 0: # 每秒检测一次
-                            if len(frame_dic)>10^7: # 防止溢出
-                                frame_dic={}
-                            for out in outputs[i]:
-                                bbox = out[0:4]
-                                frame_idx_s, cls_s, id_s = str(frame_idx), names[int(out[5])], str(int(out[4]))
-                                # 获取左右框线：
-                                #bbox_left_line_co = list(zip(*line(*(int(bboxes[0]),int(bboxes[1])), *(int(bboxes[0]),int(bboxes[3]))))) # 左框线
-                                #bbox_right_line_co = list(zip(*line(*(int(bboxes[2]),int(bboxes[1])), *(int(bboxes[2]),int(bboxes[3]))))) # 右框线
-                                # 获取下框线：
-                                bbox_bottom_line_co = list(zip(*line(*(int(bbox[0])+25,int(bbox[3])), *(int(bbox[2])-25,int(bbox[3]))))) 
-                                #violate_start = time.time()
-                                if len(intersection(bbox_bottom_line_co, parking_co))>0:
-                                #if intersection(bbox_bottom_line_co, parking_co):
-                                    cur_frame_key = frame_idx_s + cls_s + id_s
-                                    pre_frame_key = str(int(frame_idx-FPS)) +cls_s + id_s 
-                                    frame_dic[cur_frame_key] = bbox
-
-                                    previous_bbox_co = frame_dic.get(pre_frame_key, []) # 获取当前目标前一秒检测框,若无返回空列表
-                                    if len(previous_bbox_co): 
-                                        if immobile(bbox, previous_bbox_co) == True: # 若目标静止
-                                            if not cache_dic.get(cls_s+id_s, 0): # 如果静止目标没在cache_dic中
-
-                                                t_start = datetime.now() # 设定计时器
-                                                cache_dic[cls_s+id_s] = str(t_start)
-                                            # 若目标在cache_dic但不在viol_dic中
-                                            if cache_dic.get(cls_s+id_s, 0) and not viol_dic.get(cls_s+id_s, 0):
-
-                                                t_start_cm = cache_dic[cls_s+id_s][0:19] # 舍掉毫秒
-                                                t_spending = (datetime.now() - datetime.strptime(t_start_cm,
-                                                                                                '%Y-%m-%d %H:%M:%S')).total_seconds()
-
-                                                print(f'{cls_s}{id_s} 于{t_start_cm} 停留 {t_spending:.2f} 秒')
-                                                if t_spending > 5: # 若停留时间大于...秒，违停车辆写入EXCEL以及viol_dic,并且截图
-                                                    sheet.write(row_num, 0, str(t_start_cm), style)
-                                                    # sheet.write(row_num, 1, str(round(t_spending, 2)), style)
-                                                    sheet.write(row_num, 1, cls_s + id_s, style)
-                                                    row_num += 1
-                                                    workbook.save(Path(save_dir / 'details.xls'))
-
-                                                    viol_dic[cls_s+id_s] = t_spending
-                                                    # print(t_start_cm, t_spending, datetime.now())
-                                                    cropped = image.crop((int(bbox[0]), int(bbox[1]), int(bbox[2]), int(bbox[3]))) 
-                                                    cropped.save(Path(save_dir / f'{cls_s}{id_s}.jpg'))
-
-                            #violate_end = time.time()
-                            #violate_time = violate_end - violate_start
-                            #print(f'违停检测用时: {violate_time}')
-                        if save_txt:
-                            # to MOT format
-                            bbox_left = output[0]
-                            bbox_top = output[1]
-                            bbox_w = output[2] - output[0]
-                            bbox_h = output[3] - output[1]
-                            # Write MOT compliant results to file
-                            with open(txt_path + '.txt', 'a') as f:
-                                f.write(('%g ' * 10 + '\n') % (frame_idx + 1, id, bbox_left,  # MOT format
-                                                               bbox_top, bbox_w, bbox_h, -1, -1, -1, i))
-
-                        if save_vid or save_crop or show_vid:  # Add bbox to image
-                            c = int(cls)  # integer class
-                            id = int(id)  # integer id
-                            label = None if hide_labels else (f'{id} {names[c]}' if hide_conf else \
-                                (f'{id} {conf:.2f}' if hide_class else f'{id} {names[c]} {conf:.2f}'))
-                            annotator.box_label(bboxes, label, color=colors(c, True))
-                            if len(viol_dic):
-                                text = ''
-                                for key, time in viol_dic.items():
-                                    text += key + 'illegal parking for more than' + f'{time:.2f}' + 's!' 
-                                annotator.add_alarm(xy=(15,19), label=text)
-                            #cv2.fillPoly(imc, np.int32([pts]), (0,0,255)) # 添加上违停区域
-                            if save_crop:
-                                txt_file_name = txt_file_name if (isinstance(path, list) and len(path) > 1) else ''
-                                save_one_box(bboxes, imc, file=save_dir / 'crops' / txt_file_name / names[c] / f'{id}' / f'{p.stem}.jpg', BGR=True)
-
-                LOGGER.info(f'{s}Done. YOLO:({t3 - t2:.3f}s), StrongSORT:({t5 - t4:.3f}s)')
-
+                im = np.concatenate([inputs(frame) for frame in run]) if tiler is not None else np.stack([inputs(frame) for frame in run])
+                copies.add(im.nbytes)
+            if fixed is not None and len(im) < fixed:  # models exported for a fixed batch size
+                im = np.concatenate((im, np.zeros((fixed - len(im), *im.shape[1:]), dtype=im.dtype)))
+            im = torch.from_numpy(im).to(device)
+            im = im.half() if half else im.float()  # uint8 to fp16/32
+            im /= 255.0  # 0 - 255 to 0.0 - 1.0
+            t2 = time_sync()
+            dt[0] += t2 - t1
+
+            # Inference
+            visualize_path = increment_path(save_dir / run[0][2].stem, mkdir=True) if visualize else False
+            pred = model(im, augment=augment, visualize=visualize_path) # （属于每个类别的概率)
+            t3 = time_sync()
+            dt[1] += t3 - t2
+            t_yolo = t3 - t2
+
+            # Apply NMS (非极大值抑制)
+            pred = non_max_suppression(pred, conf_thres, iou_thres, classes, agnostic_nms, max_det=max_det)
+            t4 = time_sync()
+            dt[2] += t4 - t3
+            for frame in run: # 批量推理的耗时计入批次中的每一帧
+                stats.observe('preprocess', frame[0], t2 - t1)
+                stats.observe('inference', frame[0], t3 - t2)
+                stats.observe('nms', frame[0], t4 - t3)
+
+        frames, pred = [], iter(pred)
+        for i, frame_idx, p, _, im0, vid_cap, s, t, t_capture, step in batch:
+            det = None # 跳过检测的帧
+            if step == 'detect' and tiler is not None: # 各图块的检测框映射回原图，合并图块接缝处的重复框
+                det = tiler.merge([next(pred) for _ in range(per_frame)])
+                s += f'{per_frame}x' + '%gx%g ' % im.shape[2:]  # print string
+            elif step == 'detect':
+                det = next(pred)  # detections per image
+                s += '%gx%g ' % im.shape[2:]  # print string
+                if len(det):
+                    # Rescale boxes from img_size to im0 size
+                    det[:, :4] = scale_coords(im.shape[2:], det[:, :4], im0.shape).round()
+            frames.append((frame_idx, i, p, im0, step, det, vid_cap, s, t, t_yolo, t_capture))
+        return frames
+
+    def track(item): # 追踪、违停判断与绘制，每个视频源的帧按顺序处理
+        frame_idx, i, p, im0, step, det, vid_cap, s, t, t_yolo, t_capture = item
+        if webcam:  # nr_sources >= 1
+            txt_file_name = p.name
+            save_path = str(save_dir / p.name)  # im.jpg, vid.mp4, ...
+        else:
+            # video file
+            if source.endswith(VID_FORMATS):
+                txt_file_name = p.stem
+                save_path = str(save_dir / p.name)  # im.jpg, vid.mp4, ...
+            # folder with imgs
             else:
-                strongsort_list[i].increment_ages()
-                LOGGER.info('No detections')
-
-            # Stream results
-            im0 = annotator.result()
-            if show_vid:
-                cv2.imshow(str(p), im0)
-                cv2.waitKey(1)  # 1 millisecond
-
-            # Save results (image with detections)
-            if save_vid:
-                if vid_path[i] != save_path:  # new video
-                    vid_path[i] = save_path
-                    if isinstance(vid_writer[i], cv2.VideoWriter):
-                        vid_writer[i].release()  # release previous video writer
-                    if vid_cap:  # video
-                        fps = vid_cap.get(cv2.CAP_PROP_FPS)
-                        w = int(vid_cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-                        h = int(vid_cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-                    else:  # stream
-                        fps, w, h = 30, im0.shape[1], im0.shape[0]
-                    save_path = str(Path(save_path).with_suffix('.mp4'))  # force *.mp4 suffix on results videos
-                    vid_writer[i] = cv2.VideoWriter(save_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (w, h))
-                vid_writer[i].write(im0)
-
-            prev_frames[i] = curr_frames[i]
+                txt_file_name = p.parent.name  # get folder name containing current img
+                save_path = str(save_dir / p.parent.name)  # im.jpg, vid.mp4, ...
+        curr_frames[i] = im0
+
+        txt_path = str(save_dir / 'tracks' / txt_file_name)  # im.txt
+        if cfg.STRONGSORT.ECC and step != 'hold':  # camera motion compensation
+            strongsort_list[i].tracker.camera_update(prev_frames[i], curr_frames[i])
+
+        t_track = 0.
+        if step == 'hold': # 违停区域周围画面无变化：沿用上一帧的追踪结果，轨迹保持不变
+            strongsort_list[i].hold()
+            outputs[i] = outputs[i] if outputs[i] is not None else []
+            LOGGER.info(f'{s}Static, reusing {len(outputs[i])} tracks')
+        elif step == 'coast': # 本帧跳过检测：按卡尔曼预测推进轨迹，输出预测框
+            outputs[i] = strongsort_list[i].coast(im0)
+            LOGGER.info(f'{s}Coasting {len(outputs[i])} tracks')
+        elif len(det):
+            # Print results
+            for c in det[:, -1].unique():
+                n = (det[:, -1] == c).sum()  # detections per class
+                s += f"{n} {names[int(c)]}{'s' * (n > 1)}, "  # add to string
+
+            xywhs = xyxy2xywh(det[:, 0:4]) #中心宽高
+            confs = det[:, 4] # 置信度
+            clss = det[:, 5] # 类别
+
+            # pass detections to strongsort
+            t4 = time_sync()
+            outputs[i] = strongsort_list[i].update(xywhs.cpu(), confs.cpu(), clss.cpu(), im0)
+            t5 = time_sync()
+            t_track = t5 - t4
+            for stage, seconds in strongsort_list[i].timings.items(): # reid、kalman、association
+                stats.observe(stage, i, seconds)
+            detectors[i].release(strongsort_list[i].tracker.deleted_tracks) # 释放已删除目标的状态
+            strides[i].update(strongsort_list[i].tracker.speeds(), strongsort_list[i].tracker.unmatched_detections)
+            LOGGER.info(f'{s}Done. YOLO:({t_yolo:.3f}s), StrongSORT:({t_track:.3f}s)')
+        else:
+            strongsort_list[i].increment_ages()
+            outputs[i] = []
+            detectors[i].release(strongsort_list[i].tracker.deleted_tracks)
+            strides[i].update([], 0)
+            LOGGER.info('No detections')
+
+        # 判断是否有车辆在违停区域内静止超过阈值（每帧调用一次，按视频时间每秒检测一次；无目标的帧同样推进检测时钟，与replay.py一致）
+        with stats.time('violation', i):
+            events = detectors[i].update(outputs[i], t)
+            for v_id, v_cls, v_start, v_dwell in detectors[i].dwelling:
+                print(f'{names[v_cls]}{v_id} 于{clocks[i].strftime(v_start)} 停留 {v_dwell:.2f} 秒')
+            for e in events: # 违停记录与截图交给后台线程写入
+                x1, y1, x2, y2 = e.box.astype(int)
+                evidence.submit((clocks[i].strftime(e.start), f'{names[e.class_id]}{e.track_id}', e.zone_id),
+                                name=f'{names[e.class_id]}{e.track_id}', crop=copies.copy(im0[y1:y2, x1:x2])) # 后台写入前帧缓冲区可能被复用
+        a = detectors[i].activity if len(outputs[i]) else 0.
+
+        # 画出框线
+        for j, output in enumerate(outputs[i]): # 处理每帧图像中的每个检测目标
+
+            bboxes = output[0:4] # 左上角点和右下角点（xyxy)
+            id = output[4] # 追踪ID
+            cls = output[5] # 类别 coco数据集（0：‘persion', 1'bicycle', 2:'car'）
+
+            if save_txt:
+                # to MOT format
+                bbox_left = output[0]
+                bbox_top = output[1]
+                bbox_w = output[2] - output[0]
+                bbox_h = output[3] - output[1]
+                # Write MOT compliant results to file, the class goes to the 8th column for replay.py
+                with open(txt_path + '.txt', 'a') as f:
+                    f.write(('%g ' * 10 + '\n') % (frame_idx + 1, id, bbox_left,  # MOT format
+                                                   bbox_top, bbox_w, bbox_h, -1, cls, -1, i))
+
+            if save_crop:
+                c = int(cls)  # integer class
+                id = int(id)  # integer id
+                txt_file_name = txt_file_name if nr_sources > 1 else ''
+                save_one_box(bboxes, im0, file=save_dir / 'crops' / txt_file_name / names[c] / f'{id}' / f'{p.stem}.jpg', BGR=True)
+
+        if show_vid or save_vid:  # 仅在需要显示或保存视频时复制一帧并绘制：违停区域、目标框与违停提示
+            t_render = time.perf_counter()
+            im0 = copies.copy(im0)
+            tracks = outputs[i] if len(outputs[i]) else np.zeros((0, 7))
+            labels = None if hide_labels else [f'{int(o[4])} {names[int(o[5])]}' if hide_conf else \
+                (f'{int(o[4])} {o[6]:.2f}' if hide_class else f'{int(o[4])} {names[int(o[5])]} {o[6]:.2f}') for o in tracks]
+            alarms = [f'{names[v_cls]}{v_id} illegal parking for more than {v_dwell:.2f}s!'
+                      for v_id, v_cls, v_dwell in detectors[i].violations()]
+            renderers[i].draw(im0, tracks, labels, [colors(int(c), True) for c in tracks[:, 5]], alarms)
+            stats.observe('render', i, time.perf_counter() - t_render)
+
+        if isinstance(dataset, LoadPooledVideo) and prev_frames[i] is not None: # 上一帧只用于本帧的相机运动补偿，之后归还帧缓冲区
+            dataset.pool.release(prev_frames[i]) # 输出的画面为绘制用的副本，证据截图已复制
+        prev_frames[i] = curr_frames[i]
+        return i, p, im0, save_path, vid_cap, t_track, a, t_capture
+
+    # 各视频源的帧组成批次进行一次推理，检测结果再分发给各视频源的StrongSORT
+    # 解码、检测、追踪可在各自线程中并行（--pipeline），每个视频源由同一个追踪线程按顺序处理；显示与保存在主线程
+    same_shape = tiler is not None or isinstance(dataset, LoadPooledVideo) # 图块尺寸一致；同一视频的帧尺寸一致
+    assembler = BatchAssembler(batch_size, max_wait=batch_wait, unique=webcam,
+                               group=None if same_shape else lambda frame: frame[3].shape,
+                               threaded=pipeline) # 非流水线模式在主线程读取视频源，不提前解码
+    latency = LatencyMeter(nr_sources) # 各视频源从解码到输出的延迟与总吞吐量
+    pipe = Pipeline(assembler(read()), [Stage('detect', detect, split=True),
+                                        Stage('track', track, workers=nr_sources, key=lambda item: item[1])],
+                    maxsize=queue_size, policy=queue_policy if webcam else 'block', threaded=pipeline)
+    for i, p, im0, save_path, vid_cap, t_track, a, t_capture in pipe:
+        seen += 1
+        activity[i] = a
+        dt[3] += t_track
+        t_write = time.perf_counter()
+        if seen == 1:
+            startup.mark('first frame')
+            LOGGER.info(startup.summary()) # 启动总耗时及导入、模型加载、视频源、预热、第一帧各步骤耗时
+
+        # Stream results
+        if show_vid:
+            cv2.imshow(str(p), im0)
+            cv2.waitKey(1)  # 1 millisecond
+
+        # Save results (image with detections)
+        if save_vid:
+            if vid_path[i] != save_path:  # new video
+                vid_path[i] = save_path
+                if isinstance(vid_writer[i], cv2.VideoWriter):
+                    vid_writer[i].release()  # release previous video writer
+                if vid_cap:  # video
+                    fps = vid_cap.get(cv2.CAP_PROP_FPS)
+                    w = int(vid_cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+                    h = int(vid_cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+                else:  # stream
+                    fps, w, h = 30, im0.shape[1], im0.shape[0]
+                save_path = str(Path(save_path).with_suffix('.mp4'))  # force *.mp4 suffix on results videos
+                vid_writer[i] = cv2.VideoWriter(save_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (w, h))
+            vid_writer[i].write(im0)
+        if show_vid or save_vid:
+            stats.observe('write', i, time.perf_counter() - t_write)
+        latency.update(i, t_capture)
+        stats.observe('latency', i, time.monotonic() - t_capture) # 从解码到输出的端到端延迟
+        for stage, depth in pipe.depths().items():
+            stats.gauge('queue_depth', depth, stage=stage)
+        stats.gauge('dropped_frames', pipe.dropped)
+        stats.gauge('dropped_records', evidence.dropped)
+        stats.gauge('reid_reuse_rate', strongsort_list[i].reuse_rate, stream=i) # 复用轨迹特征、未运行ReID的检测比例
+        stats.gauge('reid_rate', strongsort_list[i].reid_rate, stream=i) # 运行了ReID的检测比例
+        stats.gauge('track_states', len(detectors[i].state), stream=i) # 保存违停状态的目标数
+        stats.gauge('track_state_evictions', detectors[i].state.evictions, stream=i) # 状态表已满而被淘汰的目标数，持续增长说明max_track_states过小
+        stats.gauge('track_state_skips', detectors[i].state.skips, stream=i) # 一帧内的目标数超过状态表容量而未检查的次数
+        stats.maybe_export()
+
+        if scheduler is not None:
+            scheduler.update(i, activity[i])
+            if time.monotonic() >= report_at: # 每10秒输出各视频源实际帧率
+                LOGGER.info('Effective FPS: ' + ', '.join(f'{i}: {fps:.1f}' for i, fps in enumerate(scheduler.effective_fps())))
+                report_at = time.monotonic() + 10
+    if pipe.dropped:
+        LOGGER.warning(f'{pipe.dropped} frames dropped by the {pipe.policy} queue policy')
+
+    evidence.close() # 写完所有违停证据
+    if evidence.dropped:
+        LOGGER.warning(f'{evidence.dropped} violation records dropped by the {evidence.policy} policy')
+    stats.gauge('dropped_records', evidence.dropped)
+    for i in range(nr_sources):
+        stats.gauge('track_state_evictions', detectors[i].state.evictions, stream=i)
+        stats.gauge('track_state_skips', detectors[i].state.skips, stream=i)
+    stats.export()
 
     # Print results
     t = tuple(x / seen * 1E3 for x in dt)  # speeds per image
     LOGGER.info(f'Speed: %.1fms pre-process, %.1fms inference, %.1fms NMS, %.1fms strong sort update per image at shape {(1, 3, *imgsz)}' % t)
+    LOGGER.info(f'Batch size {batch_size} (mean {assembler.mean_batch_size:.1f}): {latency.summary()}')
+    LOGGER.info(f'Stage latency {stats.summary()}' + (f', exported to {metrics}' if metrics else ''))
+    if det_stride > 1:
+        LOGGER.info('Detection stride kept ' + ', '.join(f'source {i}: {st.ratio:.0%}' for i, st in enumerate(strides)) + ' of the frames')
+    if gates is not None:
+        LOGGER.info('Motion gate skipped ' + ', '.join(f'source {i}: {g.ratio:.0%}' for i, g in enumerate(gates)) + ' of the frames it checked')
+    LOGGER.info(f'Frame copies: {copies.per_frame(seen) / 1E6:.2f}MB per frame' +
+                (f', {dataset.pool.waits} waits for a free frame buffer' if isinstance(dataset, LoadPooledVideo) else ''))
+    if cfg.STRONGSORT.REUSE_REFRESH or cfg.STRONGSORT.LAZY_REID:
+        LOGGER.info('ReID model ran on ' + ', '.join(f'source {i}: {ss.reid_rate:.0%} ({ss.reuse_rate:.0%} reused)' for i, ss in enumerate(strongsort_list)) + ' of the detections')
+    if isinstance(extractor, SharedExtractor) and extractor.forwards:
+        LOGGER.info(f'ReID forward passes: {extractor.forwards}, {extractor.calls_per_forward:.1f} tracker calls per pass')
+    LOGGER.info('Track states: ' + ', '.join(f'source {i}: {len(st)} held, {st.releases} released, {st.evictions} evicted, {st.skips} skipped'
+                                             for i, st in enumerate(d.state for d in detectors)))
     if save_txt or save_vid:
         s = f"\n{len(list(save_dir.glob('tracks/*.txt')))} tracks saved to {save_dir / 'tracks'}" if save_txt else ''
         LOGGER.info(f"Results saved to {colorstr('bold', save_dir)}{s}")
@@ -362,6 +531,7 @@ def parse_opt():
     parser.add_argument('--yolo-weights', nargs='+', type=str, default=WEIGHTS / 'yolov5m.pt', help='model.pt path(s)')
     parser.add_argument('--strong-sort-weights', type=str, default=WEIGHTS / 'osnet_x0_25_msmt17.pth')
     parser.add_argument('--config-strongsort', type=str, default='strong_sort/configs/strong_sort.yaml')
+    parser.add_argument('--config-zones', type=str, default='strong_sort/configs/zones.yaml', help='no-parking zones (YAML/JSON)')
     parser.add_argument('--source', type=str, default='dataset/me/video.mp4', help='file/dir/URL/glob, 0 for webcam')  
     parser.add_argument('--imgsz', '--img', '--img-size', nargs='+', type=int, default=[640], help='inference size h,w')
     parser.add_argument('--conf-thres', type=float, default=0.5, help='confidence threshold')
@@ -389,6 +559,27 @@ def parse_opt():
     parser.add_argument('--hide-class', default=False, action='store_true', help='hide IDs')
     parser.add_argument('--half', action='store_true', help='use FP16 half-precision inference')
     parser.add_argument('--dnn', action='store_true', help='use OpenCV DNN for ONNX inference')
+    parser.add_argument('--max-track-states', type=int, default=1024, help='maximum number of tracks with violation state per source')
+    parser.add_argument('--evidence-queue', type=int, default=64, help='maximum number of pending violation records')
+    parser.add_argument('--evidence-policy', default='block', choices=EvidenceWriter.POLICIES, help='what to do when the evidence queue is full')
+    parser.add_argument('--fps-budget', type=float, default=0, help='frames per second shared by all live streams, 0 to process every frame')
+    parser.add_argument('--min-stream-fps', type=float, default=1., help='frame rate guaranteed to every live stream under --fps-budget')
+    parser.add_argument('--pipeline', action='store_true', help='run decoding, detection and tracking on worker threads')
+    parser.add_argument('--queue-size', type=int, default=4, help='capacity of the queues between pipeline stages')
+    parser.add_argument('--queue-policy', default='block', choices=Pipeline.POLICIES, help='full queue on live sources')
+    parser.add_argument('--batch-size', type=int, default=0, help='frames per detector forward, 0 for one frame per source')
+    parser.add_argument('--batch-wait', type=float, default=0.01, help='maximum time in seconds a frame waits for its batch, with --pipeline')
+    parser.add_argument('--det-stride', type=int, default=1, help='run the detector every N frames, coast the tracks in between')
+    parser.add_argument('--adaptive-stride', action='store_true', help='adapt the stride to the motion in the scene, up to --det-stride')
+    parser.add_argument('--tiled', action='store_true', help='detect on full resolution tiles covering the zones only')
+    parser.add_argument('--tile-margin', type=int, default=128, help='pixels around the zones covered by the tiles')
+    parser.add_argument('--motion-gate', action='store_true', help='skip the detector while nothing changes around the zones')
+    parser.add_argument('--gate-threshold', type=int, default=15, help='grey level difference of a changed pixel')
+    parser.add_argument('--gate-refresh', type=float, default=2., help='seconds after which the motion gate is forced open')
+    parser.add_argument('--frame-pool', action='store_true', help='decode video files into a ring of preallocated frame buffers')
+    parser.add_argument('--metrics', type=str, default=None, help='export stage latencies, queue depths and drops to this *.json or Prometheus text file')
+    parser.add_argument('--metrics-interval', type=float, default=10., help='seconds between metrics exports')
+    parser.add_argument('--model-cache', type=str, default=None, help='load the models from TorchScript traces in this directory, traced on the first run')
     opt = parser.parse_args()
     opt.imgsz *= 2 if len(opt.imgsz) == 1 else 1  # expand
     print_args(vars(opt))
@@ -396,24 +587,11 @@ def parse_opt():
 
 
 def main(opt):
-    check_requirements(requirements=ROOT / 'requirements.txt', exclude=('tensorboard', 'thop'))
+    weights = opt.yolo_weights if isinstance(opt.yolo_weights, list) else [opt.yolo_weights]
+    if not all(Path(w).is_file() for w in [*weights, opt.strong_sort_weights]): # 权重均在本地时跳过依赖检查（联网）
+        check_requirements(requirements=ROOT / 'requirements.txt', exclude=('tensorboard', 'thop'))
     run(**vars(opt))
 
-# 判断是否相交
-def intersection(Line, parking_co):
-
-    bottom_cross = list(set(Line) & set(parking_co))
-    return bottom_cross
-    #return set(parking_co).isdisjoint(set(Line))
-
-# 检测目标是否静止
-def immobile(bbox, previous_bbox):
-    total = abs(bbox[0] - previous_bbox[0]) + abs(bbox[1] - previous_bbox[1]) + \
-        abs(bbox[2] - previous_bbox[2]) + abs(bbox[3] - previous_bbox[3])
-    if total <= 50: # Yolo边框存在波动
-        return True
-    else:
-        return False
 
 if __name__ == "__main__":
     opt = parse_opt()
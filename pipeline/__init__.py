@@ -0,0 +1,7 @@
+from .scheduler import StreamScheduler
+from .stages import Pipeline, Stage
+from .batching import BatchAssembler, LatencyMeter
+from .metrics import Metrics
+
+
+__all__ = ['StreamScheduler', 'Pipeline', 'Stage', 'BatchAssembler', 'LatencyMeter', 'Metrics']
@@ -0,0 +1,171 @@
+import queue
+import threading
+import time
+
+import numpy as np
+
+
+_END = object()  # end of stream marker
+
+
+class BatchAssembler(object):
+    """
+    Groups frames of several streams into batches for one detector forward.
+
+    With `threaded=True` frames are read from the source on a helper thread
+    and a batch is emitted as soon as it holds `batch_size` frames, or
+    `max_wait` seconds after its first frame arrived, whichever comes first.
+    Otherwise the source is read lazily on the calling thread, which never
+    runs ahead of the batch being assembled, and `max_wait` does not apply.
+    With `unique=True` (live cameras) a batch holds at most one frame of every
+    stream and a second frame of a stream closes the pending batch, so frames
+    never wait for a stream that has already delivered; otherwise (video
+    files) consecutive frames of a stream may share a batch. Frames of a
+    stream always keep their order.
+
+    Parameters
+    ----------
+    batch_size : int
+        Maximum number of frames per batch.
+    max_wait : float
+        Maximum time in seconds a frame waits for the batch to fill.
+    unique : bool
+        Put at most one frame of every stream in a batch.
+    key : Callable
+        Maps a frame to its stream index.
+    group : Optional[Callable]
+        Frames with different groups (e.g. input shapes) never share a batch.
+    threaded : bool
+        Read the source on a helper thread.
+
+    Attributes
+    ----------
+    batches : int
+        Number of batches emitted.
+    frames : int
+        Number of frames emitted.
+
+    """
+
+    def __init__(self, batch_size=1, max_wait=0.01, unique=False, key=None, group=None, threaded=True):
+        self.batch_size = max(int(batch_size), 1)
+        self.max_wait = max_wait
+        self.unique = unique
+        self.key = key or (lambda frame: frame[0])
+        self.group = group
+        self.threaded = threaded
+        self.batches = 0
+        self.frames = 0
+
+    @property
+    def mean_batch_size(self):
+        return self.frames / self.batches if self.batches else 0.
+
+    def __call__(self, frames):
+        """Iterate over the batches (lists of frames) of the `frames` iterable."""
+        if not self.threaded:
+            return self._serial(frames)
+        return self._threaded(frames)
+
+    def _closes(self, pending, frame):
+        """Whether `frame` cannot join the pending batch."""
+        return bool(pending) and (self.group is not None and self.group(frame) != self.group(pending[0]) or
+                                  self.unique and any(self.key(f) == self.key(frame) for f in pending))
+
+    def _serial(self, frames):
+        pending = []
+        for frame in frames:
+            if self._closes(pending, frame):
+                yield self._emit(pending)
+                pending = []
+            pending.append(frame)
+            if len(pending) >= self.batch_size:
+                yield self._emit(pending)
+                pending = []
+        if pending:
+            yield self._emit(pending)
+
+    def _threaded(self, frames):
+        q = queue.Queue(maxsize=2 * self.batch_size)
+        error = []
+
+        def read():
+            try:
+                for frame in frames:
+                    q.put(frame)
+            except Exception as e:
+                error.append(e)
+            q.put(_END)
+
+        threading.Thread(target=read, name='batch-assembler', daemon=True).start()
+        pending, deadline = [], None
+        while True:
+            try:
+                frame = q.get(timeout=None if deadline is None else max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                yield self._emit(pending)
+                pending, deadline = [], None
+                continue
+            if frame is _END:
+                break
+            if self._closes(pending, frame):
+                yield self._emit(pending)
+                pending, deadline = [], None
+            pending.append(frame)
+            if deadline is None:
+                deadline = time.monotonic() + self.max_wait
+            if len(pending) >= self.batch_size:
+                yield self._emit(pending)
+                pending, deadline = [], None
+        if pending:
+            yield self._emit(pending)
+        if error:
+            raise error[0]
+
+    def _emit(self, batch):
+        self.batches += 1
+        self.frames += len(batch)
+        return batch
+
+
+class LatencyMeter(object):
+    """
+    Per-stream latency and aggregate throughput of processed frames.
+
+    Parameters
+    ----------
+    nr_sources : int
+        Number of streams.
+
+    """
+
+    def __init__(self, nr_sources):
+        self.count = np.zeros(nr_sources, dtype=np.int64)
+        self.total = np.zeros(nr_sources)
+        self.max = np.zeros(nr_sources)
+        self._start = None
+        self._last = None
+
+    def update(self, i, t_capture, now=None):
+        """Record a frame of stream `i` captured at `t_capture` (time.monotonic()) and finished `now`."""
+        now = time.monotonic() if now is None else now
+        if self._start is None:
+            self._start = t_capture
+        latency = now - t_capture
+        self.count[i] += 1
+        self.total[i] += latency
+        self.max[i] = max(self.max[i], latency)
+        self._last = now
+
+    @property
+    def throughput(self):
+        """Frames per second over all streams."""
+        if self._last is None or self._last <= self._start:
+            return 0.
+        return self.count.sum() / (self._last - self._start)
+
+    def summary(self):
+        """Format the mean and max latency of every stream and the throughput."""
+        mean = self.total / np.maximum(self.count, 1)
+        streams = ', '.join(f'{i}: {m * 1E3:.1f}/{x * 1E3:.1f}ms' for i, (m, x) in enumerate(zip(mean, self.max)))
+        return f'latency (mean/max) {streams}; throughput {self.throughput:.1f} frames/s'
@@ -0,0 +1,210 @@
+import threading
+import time
+from multiprocessing import shared_memory
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+
+class CopyCounter(object):
+    """
+    Counts the bytes of frame data copied by the pipeline.
+
+    Stages that must mutate a frame (drawing, evidence crops) copy it with
+    `copy()` instead of `ndarray.copy()`, so the cost shows up in the report.
+
+    Attributes
+    ----------
+    bytes : int
+        Total number of bytes copied.
+
+    """
+
+    def __init__(self):
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def add(self, nbytes):
+        with self._lock:
+            self.bytes += int(nbytes)
+
+    def copy(self, a):
+        """Get a writable copy of `a`."""
+        self.add(a.nbytes)
+        return a.copy()
+
+    def per_frame(self, frames):
+        return self.bytes / frames if frames else 0.
+
+
+class FramePool(object):
+    """
+    A ring of preallocated frame buffers.
+
+    Decoders write into the buffer borrowed with `acquire()` and hand out
+    read-only views of it. The stage done with a frame returns the buffer
+    with `release()`; it is not decoded into again before, and is reused
+    once released even if views of it are still around. With `shared=True`
+    the buffers live in one
+    `multiprocessing.shared_memory` block (see `name`) that other processes
+    can map.
+
+    Parameters
+    ----------
+    shape : tuple
+        Shape of a frame, e.g. `(height, width, 3)`.
+    size : int
+        Number of buffers; must exceed the number of frames in flight.
+    dtype : numpy.dtype
+        Element type.
+    shared : bool
+        Allocate the buffers in shared memory.
+
+    Attributes
+    ----------
+    waits : int
+        Number of times `acquire()` had to wait for a free buffer.
+
+    """
+
+    def __init__(self, shape, size, dtype=np.uint8, shared=False):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.size = size
+        self.waits = 0
+        nbytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        self._shm = shared_memory.SharedMemory(create=True, size=nbytes * size) if shared else None
+        if shared:
+            self._slots = [np.ndarray(self.shape, self.dtype, buffer=self._shm.buf, offset=k * nbytes)
+                           for k in range(size)]
+        else:
+            self._slots = [np.empty(self.shape, self.dtype) for _ in range(size)]
+        self._index = {slot.ctypes.data: k for k, slot in enumerate(self._slots)}  # buffer address -> slot
+        self._borrows = [0] * size
+        self._next = 0
+        self._cond = threading.Condition()
+
+    @property
+    def name(self):
+        """Name of the shared memory block, None if the pool is private."""
+        return self._shm.name if self._shm is not None else None
+
+    def in_use(self, k):
+        return self._borrows[k] > 0
+
+    def acquire(self, timeout=None):
+        """Borrow the next free buffer, in ring order, waiting until one is released."""
+        start = time.monotonic()
+        waited = False
+        with self._cond:
+            while True:
+                for n in range(self.size):
+                    k = (self._next + n) % self.size
+                    if not self.in_use(k):
+                        self._borrows[k] += 1
+                        self._next = (k + 1) % self.size
+                        self.waits += waited
+                        return self._slots[k]
+                remaining = None if timeout is None else start + timeout - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f'No free frame buffer among {self.size}, increase the pool size')
+                waited = True
+                self._cond.wait(remaining)
+
+    def release(self, a):
+        """Return the buffer `a` is (a view of) to the pool; other arrays are ignored."""
+        with self._cond:
+            k = self._index.get(a.ctypes.data)
+            if k is not None and self._borrows[k]:
+                self._borrows[k] -= 1
+                self._cond.notify()
+
+    @staticmethod
+    def view(a):
+        """Get a read-only view of a buffer."""
+        v = a.view()
+        v.flags.writeable = False
+        return v
+
+    def close(self):
+        """Release the pool; buffers still viewed downstream stay valid until their views are gone."""
+        with self._cond:
+            self._slots, self._index = [], {}
+        if self._shm is not None:
+            self._shm.unlink()
+            try:
+                self._shm.close()
+            except BufferError:  # views still exported, the mapping is released with the last one
+                pass
+            self._shm = None
+
+
+class LoadPooledVideo(object):
+    """
+    Video file loader that decodes into a `FramePool`.
+
+    It yields the same `(path, im, im0, vid_cap, s)` tuples as yolov5's
+    `LoadImages` for a video, but `im0` is a read-only view of a pooled
+    buffer that `cv2.VideoCapture.read` decodes into, instead of a freshly
+    allocated frame. Without a `transform`, `im` is None and the caller
+    builds the detector input only for the frames it infers. The caller
+    returns every `im0` with `pool.release(im0)` once no stage reads it any
+    more; the decoder waits for a released buffer when all are borrowed.
+
+    Parameters
+    ----------
+    path : str
+        The video file.
+    pool_size : int
+        Number of frame buffers.
+    transform : Optional[Callable]
+        Maps a BGR frame to the detector input `im` (e.g. letterbox,
+        HWC to CHW, BGR to RGB).
+    shared : bool
+        Allocate the buffers in shared memory.
+    counter : Optional[CopyCounter]
+        Counts the frames the decoder could not write in place.
+    timeout : float
+        Seconds to wait for a free buffer before giving up, a pool smaller
+        than the number of frames in flight would wait forever.
+
+    """
+
+    def __init__(self, path, pool_size, transform=None, shared=False, counter=None, timeout=30.):
+        self.path = str(Path(path).resolve())
+        self.transform = transform
+        self.counter = counter
+        self.timeout = timeout
+        self.cap = cv2.VideoCapture(self.path)
+        if not self.cap.isOpened():
+            raise FileNotFoundError(f'Cannot open {self.path}')
+        self.frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.frame_width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.frame_height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.frame = 0
+        self.pool = FramePool((self.frame_height, self.frame_width, 3), pool_size, shared=shared)
+
+    def __len__(self):
+        return 1  # number of files
+
+    def __iter__(self):
+        while True:
+            buf = self.pool.acquire(self.timeout)
+            ret, im0 = self.cap.read(buf)
+            if not ret:
+                self.pool.release(buf)
+                break
+            if im0 is not buf:  # decoded into a new array
+                if im0.shape != buf.shape:
+                    raise ValueError(f'Frame {self.frame} of {self.path} has shape {im0.shape}, expected {buf.shape}')
+                buf[:] = im0
+                if self.counter is not None:
+                    self.counter.add(im0.nbytes)
+            self.frame += 1
+            im0 = self.pool.view(buf)
+            s = f'video 1/1 ({self.frame}/{self.frames}) {self.path}: '
+            yield self.path, self.transform(im0) if self.transform is not None else None, im0, self.cap, s
+        self.cap.release()
+        self.pool.close()
@@ -0,0 +1,99 @@
+import cv2
+import numpy as np
+
+
+class MotionGate(object):
+    """
+    Skips the detector while nothing moves around the zones.
+
+    The region around the zones is cut from each frame, downscaled to
+    `width` pixels and converted to grayscale. It is compared with a running
+    background (an exponential average of the previous frames); the gate
+    opens when more than `min_fraction` of the pixels near the zones differ by
+    more than `threshold` grey levels. It is also forced open after `refresh`
+    consecutive closed frames, so the tracker and the dwell timers never go
+    stale.
+
+    Parameters
+    ----------
+    zones : violation.zones.ZoneSet
+        The zones to watch.
+    frame_shape : tuple
+        `(height, width, ...)` of the frames.
+    margin : int
+        Pixels watched around the zones, in frame coordinates.
+    width : int
+        Width of the downscaled region.
+    threshold : int
+        Grey level difference of a changed pixel.
+    min_fraction : float
+        Fraction of changed pixels that opens the gate.
+    alpha : float
+        Learning rate of the background.
+    refresh : int
+        Maximum number of consecutive closed frames.
+
+    Attributes
+    ----------
+    frames : int
+        Number of frames seen.
+    gated : int
+        Number of frames the gate was closed on.
+
+    """
+
+    def __init__(self, zones, frame_shape, margin=32, width=320, threshold=15, min_fraction=0.002, alpha=0.05,
+                 refresh=50):
+        self.threshold = threshold
+        self.min_fraction = min_fraction
+        self.alpha = alpha
+        self.refresh = refresh
+        self.frames = 0
+        self.gated = 0
+        self._bg = None
+        self._since = 0
+
+        h, w = frame_shape[:2]
+        layer = np.zeros((h, w), dtype=np.uint8)
+        zones.paint(layer, 1)
+        ys, xs = np.nonzero(layer)
+        if not len(ys):  # no zone inside the frame, the gate stays open
+            self._rect = None
+            return
+        x0, y0 = max(xs.min() - margin, 0), max(ys.min() - margin, 0)
+        x1, y1 = min(xs.max() + 1 + margin, w), min(ys.max() + 1 + margin, h)
+        self._rect = (x0, y0, x1, y1)
+        scale = min(width / (x1 - x0), 1.)
+        self._size = (max(int(round((x1 - x0) * scale)), 1), max(int(round((y1 - y0) * scale)), 1))
+        mask = cv2.resize(layer[y0:y1, x0:x1], self._size, interpolation=cv2.INTER_NEAREST)
+        r = max(int(round(margin * scale)), 0)
+        if r:
+            mask = cv2.dilate(mask, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2 * r + 1, 2 * r + 1)))
+        self._mask = mask.astype(bool)
+        self._min_changed = max(int(self.min_fraction * self._mask.sum()), 1)
+
+    def __call__(self, im0):
+        """Returns True if the detector must run on the BGR frame `im0`."""
+        self.frames += 1
+        if self._rect is None:
+            return True
+        x0, y0, x1, y1 = self._rect
+        gray = cv2.cvtColor(cv2.resize(im0[y0:y1, x0:x1], self._size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+        gray = cv2.GaussianBlur(gray, (5, 5), 0)
+        if self._bg is None:
+            self._bg = gray.astype(np.float32)
+            return True
+        diff = cv2.absdiff(gray, cv2.convertScaleAbs(self._bg))
+        changed = np.count_nonzero((diff > self.threshold) & self._mask) >= self._min_changed
+        cv2.accumulateWeighted(gray, self._bg, self.alpha)
+        if changed or self._since >= self.refresh:
+            self._since = 0
+            return True
+        self._since += 1
+        self.gated += 1
+        return False
+
+    @property
+    def ratio(self):
+        """Fraction of the frames the gate was closed on."""
+        return self.gated / self.frames if self.frames else 0.
@@ -0,0 +1,206 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+class LatencyHistogram(object):
+    """
+    Histogram of durations with logarithmic buckets.
+
+    The bucket edges grow by `2 ** (1 / 4)` from `lo` to `hi`, so a quantile
+    interpolated within its bucket is off by a few percent at most, whatever
+    the scale, and recording a sample costs a binary search.
+
+    Parameters
+    ----------
+    lo : float
+        Upper edge of the first bucket, in seconds.
+    hi : float
+        Lower edge of the overflow bucket, in seconds.
+
+    """
+
+    def __init__(self, lo=1E-4, hi=100.):
+        n = int(np.ceil(np.log2(hi / lo) * 4)) + 1
+        self.edges = lo * 2 ** (np.arange(n) / 4)
+        self.counts = np.zeros(n + 1, dtype=np.int64)
+        self.count = 0
+        self.sum = 0.
+        self.max = 0.
+
+    def add(self, seconds):
+        self.counts[np.searchsorted(self.edges, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else 0.
+
+    def quantile(self, q):
+        """Get the `q` quantile (0 to 1), interpolated within its bucket."""
+        if not self.count:
+            return 0.
+        rank = q * self.count
+        cum = np.cumsum(self.counts)
+        k = int(np.searchsorted(cum, rank))
+        lo = self.edges[k - 1] if k > 0 else 0.
+        hi = self.edges[k] if k < len(self.edges) else self.max
+        before = cum[k - 1] if k > 0 else 0
+        frac = (rank - before) / self.counts[k] if self.counts[k] else 1.
+        return float(min(lo + frac * (hi - lo), self.max))
+
+
+class Metrics(object):
+    """
+    Per-stream, per-stage latencies and pipeline gauges, exported to a file.
+
+    Stages report how long they took on a frame of a stream with `observe()`
+    (or the `time()` context manager) and the pipeline state (queue depths,
+    dropped frames) is set with `gauge()`. `maybe_export()`, called from the
+    frame loop, rewrites the export file every `interval` seconds: JSON if
+    its suffix is `.json`, otherwise the Prometheus text format (one summary
+    per stage with the p50, p95 and p99 quantiles, labelled by stream), for
+    a local scraper or node exporter textfile collector. The file is replaced
+    atomically, so a reader never sees a partial export.
+
+    Parameters
+    ----------
+    path : Optional[str]
+        The export file, None to keep the metrics in memory only.
+    interval : float
+        Seconds between exports.
+    prefix : str
+        Prefix of the Prometheus metric names.
+
+    """
+
+    QUANTILES = (0.5, 0.95, 0.99)
+
+    def __init__(self, path=None, interval=10., prefix='parking'):
+        self.path = Path(path) if path else None
+        self.interval = interval
+        self.prefix = prefix
+        self.histograms = {}  # (stage, stream) -> LatencyHistogram
+        self.gauges = {}  # (name, labels) -> value
+        self._lock = threading.Lock()
+        self._export_at = time.monotonic() + interval
+
+    def observe(self, stage, stream, seconds):
+        """Record that `stage` took `seconds` on a frame of `stream`."""
+        with self._lock:
+            h = self.histograms.get((stage, stream))
+            if h is None:
+                h = self.histograms[stage, stream] = LatencyHistogram()
+            h.add(seconds)
+
+    def time(self, stage, stream):
+        """Context manager that observes the duration of its block."""
+        return _Timer(self, stage, stream)
+
+    @staticmethod
+    def timed(iterable):
+        """Iterate over `(seconds, item)` pairs, `seconds` being the time it took to get `item` (e.g. decoding)."""
+        it = iter(iterable)
+        while True:
+            t0 = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            yield time.perf_counter() - t0, item
+
+    def gauge(self, name, value, **labels):
+        """Set the current value of a gauge, e.g. `gauge('queue_depth', 3, stage='track')`."""
+        with self._lock:
+            self.gauges[name, tuple(sorted(labels.items()))] = value
+
+    def stages(self):
+        """Get the stages in the order they were first observed."""
+        return list(dict.fromkeys(stage for stage, _ in self.histograms))
+
+    def merged(self, stage):
+        """Get the histogram of `stage` over all streams."""
+        with self._lock:
+            hs = [h for (st, _), h in self.histograms.items() if st == stage]
+        out = LatencyHistogram()
+        for h in hs:
+            out.counts += h.counts
+            out.count += h.count
+            out.sum += h.sum
+            out.max = max(out.max, h.max)
+        return out
+
+    def summary(self):
+        """Format the p50/p95/p99 of every stage over all streams, in milliseconds."""
+        parts = []
+        for stage in self.stages():
+            h = self.merged(stage)
+            parts.append(f'{stage} ' + '/'.join(f'{h.quantile(q) * 1E3:.1f}' for q in self.QUANTILES))
+        return 'p50/p95/p99 (ms): ' + ', '.join(parts)
+
+    def to_json(self):
+        with self._lock:
+            stages = {}
+            for (stage, stream), h in self.histograms.items():
+                stages.setdefault(stage, {})[str(stream)] = dict(
+                    count=h.count, mean=h.mean, max=h.max,
+                    **{f'p{int(q * 100)}': h.quantile(q) for q in self.QUANTILES})
+            gauges = [dict(name=name, value=value, labels=dict(labels)) for (name, labels), value in self.gauges.items()]
+        return json.dumps(dict(time=time.time(), unit='seconds', stages=stages, gauges=gauges), indent=1)
+
+    def to_prometheus(self):
+        name = f'{self.prefix}_stage_seconds'
+        lines = [f'# HELP {name} Processing time of a frame by a pipeline stage.', f'# TYPE {name} summary']
+        with self._lock:
+            for (stage, stream), h in sorted(self.histograms.items(), key=lambda kv: (kv[0][0], str(kv[0][1]))):
+                labels = f'stage="{stage}",stream="{stream}"'
+                lines += [f'{name}{{{labels},quantile="{q}"}} {h.quantile(q):.6g}' for q in self.QUANTILES]
+                lines += [f'{name}_sum{{{labels}}} {h.sum:.6g}', f'{name}_count{{{labels}}} {h.count}']
+            typed = set()
+            for (gauge, labels), value in sorted(self.gauges.items()):
+                if gauge not in typed:
+                    lines.append(f'# TYPE {self.prefix}_{gauge} gauge')
+                    typed.add(gauge)
+                labels = ','.join(f'{k}="{v}"' for k, v in labels)
+                lines.append(f'{self.prefix}_{gauge}{{{labels}}} {value:.6g}' if labels else
+                             f'{self.prefix}_{gauge} {value:.6g}')
+        return '\n'.join(lines) + '\n'
+
+    def export(self, path=None):
+        """Write the metrics to `path` (default: the export file)."""
+        path = Path(path) if path else self.path
+        if path is None:
+            return
+        text = self.to_json() if path.suffix == '.json' else self.to_prometheus()
+        tmp = path.with_name(path.name + '.tmp')
+        tmp.write_text(text)
+        os.replace(tmp, path)
+
+    def maybe_export(self, now=None):
+        """Export if `interval` seconds passed since the last export."""
+        now = time.monotonic() if now is None else now
+        if self.path is None or now < self._export_at:
+            return
+        self._export_at = now + self.interval
+        self.export()
+
+
+class _Timer(object):
+
+    def __init__(self, metrics, stage, stream):
+        self.metrics = metrics
+        self.stage = stage
+        self.stream = stream
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.stage, self.stream, time.perf_counter() - self.start)
@@ -0,0 +1,99 @@
+import threading
+import time
+
+import numpy as np
+
+
+class StreamScheduler(object):
+    """
+    Shares a global frame rate budget between several streams.
+
+    Every stream is guaranteed `min_fps`; the remaining budget is split in
+    proportion to the stream priorities, which follow the activity reported
+    for each stream (e.g. vehicles inside a zone, moving tracks). Each stream
+    owns a token bucket filled at its share of the budget and a frame of the
+    stream is processed only when a token is available. The streams are
+    selected and their activity reported from possibly different threads
+    (the source and the sink of a threaded pipeline).
+
+    Parameters
+    ----------
+    nr_sources : int
+        Number of streams.
+    budget_fps : float
+        Total number of frames per second processed over all streams.
+    min_fps : float
+        Frame rate guaranteed to every stream; `budget_fps` must cover it for
+        all the streams.
+    burst : float
+        Maximum number of tokens a stream can accumulate.
+    smoothing : float
+        Weight of the previous priority when a new activity is reported.
+
+    Attributes
+    ----------
+    priorities : ndarray
+        Current priority per stream.
+    rates : ndarray
+        Current frame rate share per stream.
+
+    """
+
+    def __init__(self, nr_sources, budget_fps, min_fps=1., burst=1., smoothing=0.8):
+        if budget_fps < nr_sources * min_fps:
+            raise ValueError(f'FPS budget {budget_fps:g} is below the {nr_sources} x {min_fps:g} FPS guaranteed to the streams; '
+                             f'raise the budget or lower the minimum stream FPS')
+        self.nr_sources = nr_sources
+        self.budget_fps = float(budget_fps)
+        self.min_fps = float(min_fps)
+        self.burst = float(burst)
+        self.smoothing = smoothing
+        self.priorities = np.ones(nr_sources)
+        self.tokens = np.full(nr_sources, self.burst)
+        self.rates = np.zeros(nr_sources)
+        self._lock = threading.Lock()
+        self._update_rates()
+        self._last = None
+        self._processed = np.zeros(nr_sources, dtype=np.int64)
+        self._window_start = None
+
+    def update(self, i, activity):
+        """Report the activity of stream `i` after processing one of its frames."""
+        with self._lock:
+            self.priorities[i] = self.smoothing * self.priorities[i] + (1 - self.smoothing) * (1. + activity)
+            self._update_rates()
+
+    def select(self, now=None):
+        """Get the indices of the streams to process in this round."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if self._last is not None:
+                self.tokens = np.minimum(self.tokens + self.rates * (now - self._last), self.burst)
+            else:
+                self._window_start = now
+            self._last = now
+            selected = np.flatnonzero(self.tokens >= 1.)
+            self.tokens[selected] -= 1.
+            self._processed[selected] += 1
+        return selected
+
+    def wait_time(self):
+        """Seconds until the next stream has a token."""
+        with self._lock:
+            missing = np.maximum(1. - self.tokens, 0.)
+            return float(np.min(missing / np.maximum(self.rates, 1E-9)))
+
+    def effective_fps(self, now=None, reset=True):
+        """Get the processed frame rate per stream since the last reset."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            elapsed = now - self._window_start if self._window_start is not None else 0.
+            fps = self._processed / elapsed if elapsed > 0 else np.zeros(self.nr_sources)
+            if reset:
+                self._processed[:] = 0
+                self._window_start = now
+        return fps
+
+    def _update_rates(self):
+        spare = self.budget_fps - self.nr_sources * self.min_fps  # >= 0, checked at construction
+        self.rates[:] = self.min_fps + spare * self.priorities / self.priorities.sum()
@@ -0,0 +1,235 @@
+import queue
+import threading
+
+
+_END = object()  # end of stream marker
+
+
+class Stage(object):
+    """
+    One step of a `Pipeline`.
+
+    Parameters
+    ----------
+    name : str
+        Name of the stage, used for the worker threads.
+    fn : Callable
+        Called with every item; returns the item for the next stage or None
+        to drop it.
+    workers : int
+        Number of worker threads. Items with the same key always go to the
+        same worker, so the order of the items of a key is preserved.
+    key : Optional[Callable]
+        Maps an item to an integer key (e.g. the stream index). Required if
+        `workers > 1`.
+    split : bool
+        If True, `fn` returns a sequence of items that are passed on one by
+        one (e.g. one item per stream of a batch).
+
+    """
+
+    def __init__(self, name, fn, workers=1, key=None, split=False):
+        if workers > 1 and key is None:
+            raise ValueError(f'Stage {name} has {workers} workers but no key')
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.key = key
+        self.split = split
+
+    def __call__(self, item):
+        out = self.fn(item)
+        if out is None:
+            return []
+        return out if self.split else [out]
+
+
+class _Queue(queue.Queue):
+    """A bounded queue that either blocks or discards its oldest item when full."""
+
+    def __init__(self, maxsize, policy, stop):
+        super().__init__(maxsize=maxsize)
+        self.policy = policy
+        self.dropped = 0
+        self._stop = stop
+
+    def push(self, item):
+        if self.policy == 'drop-oldest' and item is not _END:
+            while True:
+                try:
+                    return self.put_nowait(item)
+                except queue.Full:
+                    try:
+                        self.get_nowait()
+                        self.dropped += 1
+                    except queue.Empty:
+                        pass
+        while not self._stop.is_set():
+            try:
+                return super().put(item, timeout=0.1)
+            except queue.Full:
+                pass
+
+    def pop(self):
+        while not self._stop.is_set():
+            try:
+                return super().get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return _END
+
+
+class Pipeline(object):
+    """
+    Runs a sequence of stages over the items of a source.
+
+    Every stage runs on its own worker thread(s) and consecutive stages are
+    connected by bounded queues, so decoding, inference and tracking of
+    successive frames overlap. The source is iterated on its own thread and
+    the results of the last stage are yielded on the calling thread, which
+    acts as the output sink (`cv2.imshow` must stay on the main thread).
+    With `threaded=False` the stages are simply called one after the other
+    on the calling thread.
+
+    Items of one key reach every stage in source order: each stage worker
+    consumes its queue in order and keyed stages route a key to a single
+    worker. Exceptions raised by a stage stop the pipeline and are re-raised
+    by the iterator.
+
+    Parameters
+    ----------
+    source : Iterable
+        Produces the input items.
+    stages : List[Stage]
+        The processing steps.
+    maxsize : int
+        Capacity of every queue.
+    policy : str
+        What the source does when the first queue is full: 'block' waits,
+        'drop-oldest' discards the oldest pending item (for live sources,
+        where the latest frame matters most). Queues between stages always
+        block, so no work is discarded once it has started.
+    threaded : bool
+        Run the stages on worker threads.
+
+    Attributes
+    ----------
+    dropped : int
+        Number of source items discarded by the 'drop-oldest' policy.
+
+    """
+
+    POLICIES = ('block', 'drop-oldest')
+
+    def __init__(self, source, stages, maxsize=4, policy='block', threaded=True):
+        if policy not in self.POLICIES:
+            raise ValueError(f'Invalid queue policy {policy}; must be one of {self.POLICIES}')
+        self.source = source
+        self.stages = stages
+        self.maxsize = maxsize
+        self.policy = policy
+        self.threaded = threaded
+        self._stop = threading.Event()
+        self._error = None
+        self._threads = []
+        self._queues = []
+
+    @property
+    def dropped(self):
+        return sum(q.dropped for q in self._queues[0]) if self._queues else 0
+
+    def depths(self):
+        """Get the number of pending items in front of every stage and of the sink."""
+        return {name: sum(q.qsize() for q in qs)
+                for name, qs in zip([s.name for s in self.stages] + ['sink'], self._queues)}
+
+    def __iter__(self):
+        if not self.threaded:
+            return self._serial()
+        return self._threaded()
+
+    def close(self):
+        """Stop all workers, discarding pending items."""
+        self._stop.set()
+        for t in self._threads:
+            t.join()
+        self._threads = []
+
+    def _serial(self):
+        for item in self.source:
+            items = [item]
+            for stage in self.stages:
+                items = [out for item in items for out in stage(item)]
+            yield from items
+
+    def _threaded(self):
+        self._stop.clear()
+        self._queues = [[_Queue(self.maxsize, self.policy if n == 0 else 'block', self._stop)
+                         for _ in range(stage.workers)] for n, stage in enumerate(self.stages)]
+        sink = _Queue(self.maxsize, 'block', self._stop)
+        self._queues.append([sink])
+
+        self._start('source', self._feed)
+        for n, stage in enumerate(self.stages):
+            pending = [stage.workers]  # workers still running, the last one forwards the end marker
+            for w in range(stage.workers):
+                self._start(f'{stage.name}-{w}', self._work, n, w, pending, threading.Lock())
+        try:
+            while True:
+                item = sink.pop()
+                if item is _END:
+                    break
+                yield item
+        finally:
+            self.close()
+        if self._error is not None:
+            raise self._error
+
+    def _start(self, name, target, *args):
+        t = threading.Thread(target=target, args=args, name=name, daemon=True)
+        t.start()
+        self._threads.append(t)
+
+    def _route(self, n, item):
+        """Put `item` in front of stage `n`."""
+        qs = self._queues[n]
+        if len(qs) == 1:
+            qs[0].push(item)
+        else:
+            qs[self.stages[n].key(item) % len(qs)].push(item)
+
+    def _fail(self, e):
+        if self._error is None:
+            self._error = e
+        self._stop.set()
+
+    def _feed(self):
+        try:
+            for item in self.source:
+                if self._stop.is_set():
+                    return
+                self._route(0, item)
+        except Exception as e:
+            self._fail(e)
+            return
+        for q in self._queues[0]:
+            q.push(_END)
+
+    def _work(self, n, w, pending, lock):
+        stage, q = self.stages[n], self._queues[n][w]
+        try:
+            while True:
+                item = q.pop()
+                if item is _END:
+                    break
+                for out in stage(item):
+                    self._route(n + 1, out)
+        except Exception as e:
+            self._fail(e)
+            return
+        with lock:
+            pending[0] -= 1
+            if pending[0]:
+                return
+        for q in self._queues[n + 1]:
+            q.push(_END)
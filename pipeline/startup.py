@@ -0,0 +1,205 @@
+import json
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import torch
+
+from yolov5.models.common import DetectMultiBackend
+from yolov5.utils.general import LOGGER, check_img_size
+from strong_sort.strong_sort import StrongSORT
+
+
+class StartupTimer(object):
+    """
+    Durations of the startup steps, reported as one breakdown line.
+
+    The steps of the main thread are closed with `mark()`, each lasting from
+    the previous mark; steps on other threads are timed with `time()` and
+    overlap the mark they run within (the detector and the ReID model load in
+    parallel during 'models'). The total runs from `start` to `summary()`.
+
+    Parameters
+    ----------
+    start : Optional[float]
+        `time.perf_counter()` at which the startup began, default now.
+
+    """
+
+    def __init__(self, start=None):
+        self.start = time.perf_counter() if start is None else start
+        self.steps = {}
+        self._last = self.start
+        self._lock = threading.Lock()
+
+    def add(self, step, seconds):
+        with self._lock:
+            self.steps[step] = self.steps.get(step, 0.) + seconds
+
+    def mark(self, step):
+        """Close `step`, which lasted since the previous mark."""
+        now = time.perf_counter()
+        self.add(step, now - self._last)
+        self._last = now
+
+    def time(self, step):
+        """Context manager that adds the duration of its block to `step`."""
+        return _Step(self, step)
+
+    def summary(self):
+        total = time.perf_counter() - self.start
+        return f'Startup {total:.2f}s: ' + ', '.join(f'{step} {seconds:.2f}s' for step, seconds in self.steps.items())
+
+
+class _Step(object):
+
+    def __init__(self, timer, step):
+        self.timer = timer
+        self.step = step
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.add(self.step, time.perf_counter() - self.start)
+
+
+class ModelCache(object):
+    """
+    Directory of TorchScript traces of the detector and ReID models.
+
+    The first run loads the models from their weights as usual and traces
+    them into the cache; later runs load the traces, which skips building the
+    models (and importing torchreid). A trace is specific to its weights, input
+    shape (including the batch size), device type and precision, which name
+    its file, and is rebuilt when its weights are newer. Only PyTorch weights
+    are traced; other formats are loaded as they are.
+
+    The detector trace has a fixed input size, so frames are letterboxed to
+    exactly `imgsz` (the `pt` rectangular padding is off). It is traced at the
+    batch size of the run and checked on another batch size: a trace that
+    reproduces the model there takes any batch (`model.batch` is None),
+    otherwise partial batches must be padded to `model.batch`, see
+    `fixed_batch`. A ReID trace that does not take any batch is not cached.
+
+    Parameters
+    ----------
+    path : str
+        The cache directory, created if needed.
+
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def file(self, weights, shape, device, half=False):
+        """The cache file of the trace of `weights` for input `shape` on `device`."""
+        name = f'{Path(weights).stem}_{"x".join(str(int(x)) for x in shape)}_{device.type}{"_fp16" if half else ""}'
+        return self.path / f'{name}.torchscript'
+
+    @staticmethod
+    def fresh(f, weights):
+        return f.is_file() and (not Path(weights).is_file() or f.stat().st_mtime >= Path(weights).stat().st_mtime)
+
+    def detector(self, weights, device, imgsz, half=False, dnn=False, batch=1):
+        """Load YOLOv5 from its cached trace for `batch` images, tracing it into the cache first if needed."""
+        f = self.file(weights, (batch, 3, *imgsz), device, half)
+        if self.fresh(f, weights):
+            model = DetectMultiBackend(f, device=device, data=None, fp16=half)
+            model.batch = self.config(f).get('batch', batch)
+            return model
+        model = DetectMultiBackend(weights, device=device, dnn=dnn, data=None, fp16=half)
+        if model.pt:
+            im = torch.zeros(batch, 3, *check_img_size(imgsz, s=model.stride)).to(device)
+            im = im.half() if model.fp16 else im.float()
+            ts = torch.jit.trace(model.model, im, strict=False)
+            dynamic = _dynamic(ts, model.model, im)
+            # the metadata DetectMultiBackend reads back from a TorchScript file, and the batch size it requires
+            config = dict(shape=list(im.shape), stride=int(model.stride), names=model.names, batch=None if dynamic else batch)
+            ts.save(str(f), _extra_files={'config.txt': json.dumps(config)})
+            LOGGER.info(f'Cached the TorchScript trace of {weights} as {f} ({"any" if dynamic else batch} images per batch)')
+        return model
+
+    @staticmethod
+    def config(f):
+        """Read the metadata saved with a detector trace, without loading it."""
+        with zipfile.ZipFile(f) as z:
+            name = next((n for n in z.namelist() if n.endswith('extra/config.txt')), None)
+            return json.loads(z.read(name)) if name is not None else {}
+
+    def reid(self, weights, device):
+        """Load the ReID model from its cached trace, tracing it into the cache first if needed."""
+        f = self.file(weights, (1, 3, 256, 128), device)
+        if self.fresh(f, weights):
+            return StrongSORT.load_extractor(f, device)
+        extractor = StrongSORT.load_extractor(weights, device)
+        model = getattr(extractor, 'model', None)
+        if isinstance(model, torch.nn.Module):  # torchreid FeatureExtractor
+            model.eval()
+            im = torch.zeros(1, 3, 256, 128, device=next(model.parameters()).device)
+            with torch.no_grad():
+                ts = torch.jit.trace(model, im)
+            if _dynamic(ts, model, im):  # the tracker extracts all the crops of a frame in one batch
+                ts.save(str(f))
+                LOGGER.info(f'Cached the TorchScript trace of {weights} as {f}')
+            else:
+                LOGGER.warning(f'The TorchScript trace of {weights} has a fixed batch size, not cached')
+        return extractor
+
+
+def _dynamic(ts, model, im, tol=1E-2):
+    """Whether the trace `ts` of `model` made on `im` reproduces the model on another batch size."""
+    x = torch.rand(1 if len(im) > 1 else 2, *im.shape[1:], device=im.device, dtype=im.dtype)
+    with torch.no_grad():
+        try:
+            y, y_ts = model(x), ts(x)
+        except RuntimeError:
+            return False
+    y, y_ts = (y[0], y_ts[0]) if isinstance(y, (list, tuple)) else (y, y_ts)
+    return y.shape == y_ts.shape and bool(torch.allclose(y.float(), y_ts.float(), rtol=tol, atol=tol))
+
+
+def fixed_batch(model, batch_size):
+    """The number of images `model` must be fed at once, None if it takes any batch.
+
+    PyTorch models and traces checked for any batch size take any; other
+    exported models are assumed to have been exported for `batch_size`.
+    """
+    if model.pt:
+        return None
+    return getattr(model, 'batch', batch_size)
+
+
+def load_models(yolo_weights, strong_sort_weights, device, imgsz, half=False, dnn=False, cache=None, timer=None,
+                batch=1):
+    """
+    Load YOLOv5 and the ReID model concurrently, from the TorchScript cache if `cache` is set.
+
+    `batch` is the number of images per detector forward the trace is made
+    for. Returns the `DetectMultiBackend` and the ReID extractor.
+    """
+    cache = ModelCache(cache) if cache else None
+    timer = timer or StartupTimer()
+    single = not isinstance(yolo_weights, list) or len(yolo_weights) == 1  # an ensemble is never cached
+    if isinstance(yolo_weights, list) and single:
+        yolo_weights = yolo_weights[0]
+
+    def detector():
+        with timer.time('detector'):
+            if cache is not None and single:
+                return cache.detector(yolo_weights, device, imgsz, half, dnn, batch)
+            return DetectMultiBackend(yolo_weights, device=device, dnn=dnn, data=None, fp16=half)
+
+    def reid():
+        with timer.time('ReID'):
+            if cache is not None:
+                return cache.reid(strong_sort_weights, device)
+            return StrongSORT.load_extractor(strong_sort_weights, device)
+
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix='load') as pool:
+        model, extractor = pool.submit(detector), pool.submit(reid)
+        return model.result(), extractor.result()
@@ -0,0 +1,81 @@
+import threading
+
+
+class DetectionStride(object):
+    """
+    Decides on which frames of a stream the detector runs.
+
+    With a fixed stride the detector runs on every `stride`-th frame and the
+    tracks are coasted on their Kalman predictions in between. In adaptive
+    mode the stride starts at 1 and grows by one after `patience` quiet
+    detector runs, up to `stride`; it is halved as soon as a run reports
+    unmatched detections (new or lost objects) or a track faster than
+    `max_speed`. `step` and `update` may be called from different threads
+    (the detect and track stages of a threaded pipeline).
+
+    Parameters
+    ----------
+    stride : int
+        The fixed stride, or the maximum stride in adaptive mode.
+    adaptive : bool
+        Adapt the stride to the motion in the scene.
+    max_speed : float
+        Track speed, in box heights per frame, above which the stride shrinks.
+    max_unmatched : int
+        Number of unmatched detections per run above which the stride shrinks.
+    patience : int
+        Number of consecutive quiet detector runs before the stride grows.
+
+    Attributes
+    ----------
+    current : int
+        The current stride.
+    frames : int
+        Number of frames seen.
+    detections : int
+        Number of frames the detector ran on.
+
+    """
+
+    def __init__(self, stride=1, adaptive=False, max_speed=0.05, max_unmatched=0, patience=3):
+        self.stride = max(int(stride), 1)
+        self.adaptive = adaptive
+        self.max_speed = max_speed
+        self.max_unmatched = max_unmatched
+        self.patience = patience
+        self.current = 1 if adaptive else self.stride
+        self.frames = 0
+        self.detections = 0
+        self._since = 0
+        self._quiet = 0
+        self._lock = threading.Lock()
+
+    def step(self):
+        """Advance one frame; returns True if the detector must run on it."""
+        with self._lock:
+            self.frames += 1
+            if self._since == 0 or self._since >= self.current:
+                self._since = 1
+                self.detections += 1
+                return True
+            self._since += 1
+            return False
+
+    def update(self, speeds, unmatched):
+        """Report the track speeds and the number of unmatched detections of a detector run."""
+        if not self.adaptive:
+            return
+        with self._lock:
+            if unmatched > self.max_unmatched or (len(speeds) and max(speeds) > self.max_speed):
+                self.current = max(self.current // 2, 1)
+                self._quiet = 0
+                return
+            self._quiet += 1
+            if self._quiet >= self.patience:
+                self.current = min(self.current + 1, self.stride)
+                self._quiet = 0
+
+    @property
+    def ratio(self):
+        """Fraction of the frames the detector ran on."""
+        return self.detections / self.frames if self.frames else 0.
@@ -0,0 +1,160 @@
+import math
+
+import numpy as np
+import torch
+
+
+class ZoneTiler(object):
+    """
+    Covers the zones of a camera with detector-sized tiles.
+
+    The bounding rectangles of the zones are grown by `margin` (vehicles
+    touching a zone stick out of it) and overlapping rectangles are merged.
+    Each rectangle is then covered by the fewest tiles of the detector input
+    size that overlap by at least `overlap` pixels. Tiles are cut from the
+    full resolution frame, so small vehicles are not downscaled with the rest
+    of the frame, and everything far from the zones is never inferred.
+
+    Parameters
+    ----------
+    zones : violation.zones.ZoneSet
+        The zones to cover.
+    frame_shape : tuple
+        `(height, width, ...)` of the frames.
+    tile_size : Tuple[int, int]
+        `(height, width)` of the tiles, i.e. the detector input size.
+    margin : int
+        Pixels added around the zones.
+    overlap : int
+        Minimum overlap of adjacent tiles.
+
+    Attributes
+    ----------
+    tiles : ndarray
+        Tx4 array of the tiles `(x0, y0, x1, y1)` (exclusive) in the frame.
+
+    """
+
+    def __init__(self, zones, frame_shape, tile_size=(640, 640), margin=128, overlap=128):
+        self.frame_h, self.frame_w = frame_shape[:2]
+        self.tile_h, self.tile_w = tile_size
+        self.margin = margin
+        self.overlap = overlap
+
+        rects = []
+        for zone in zones:
+            x0, y0, x1, y1 = zone.mask.rect
+            if x1 < x0 or y1 < y0:  # outside the frame
+                continue
+            rects.append([max(x0 - margin, 0), max(y0 - margin, 0),
+                          min(x1 + 1 + margin, self.frame_w), min(y1 + 1 + margin, self.frame_h)])
+        tiles = []
+        for x0, y0, x1, y1 in self._merge(rects):
+            for tx in self._spans(x0, x1, self.tile_w, self.frame_w):
+                for ty in self._spans(y0, y1, self.tile_h, self.frame_h):
+                    tiles.append((tx, ty, min(tx + self.tile_w, self.frame_w), min(ty + self.tile_h, self.frame_h)))
+        self.tiles = np.array(tiles, dtype=np.int64).reshape(-1, 4)
+
+    def __len__(self):
+        return len(self.tiles)
+
+    @property
+    def coverage(self):
+        """Fraction of the frame pixels covered by tiles (counting overlaps twice)."""
+        w = self.tiles[:, 2] - self.tiles[:, 0]
+        h = self.tiles[:, 3] - self.tiles[:, 1]
+        return float((w * h).sum()) / (self.frame_w * self.frame_h)
+
+    def crop(self, im0):
+        """Cut the tiles from a BGR frame into a Tx3xHxW RGB array for the detector."""
+        out = np.full((len(self.tiles), self.tile_h, self.tile_w, 3), 114, dtype=np.uint8)
+        for k, (x0, y0, x1, y1) in enumerate(self.tiles):
+            out[k, :y1 - y0, :x1 - x0] = im0[y0:y1, x0:x1]
+        return np.ascontiguousarray(out[..., ::-1].transpose(0, 3, 1, 2))  # BGR to RGB, BHWC to BCHW
+
+    def merge(self, preds, iou_thres=0.5):
+        """Map the per-tile detections to the frame and merge the duplicates at the tile seams.
+
+        Parameters
+        ----------
+        preds : List[torch.Tensor]
+            One Nx6 `(x1, y1, x2, y2, conf, cls)` tensor per tile, in tile
+            coordinates, after NMS.
+        iou_thres : float
+            Two detections of the same class from different tiles are merged
+            into their union box when their intersection covers this fraction
+            of the smaller one (a vehicle cut by a seam is detected whole in
+            one tile and truncated in the other).
+
+        Returns
+        -------
+        torch.Tensor
+            Mx6 detections in frame coordinates, clipped to the frame.
+
+        """
+        dets, tile_idx = [], []
+        for k, det in enumerate(preds):
+            if det is None or not len(det):
+                continue
+            det = det.detach().cpu().float().numpy().copy()
+            det[:, [0, 2]] += self.tiles[k, 0]
+            det[:, [1, 3]] += self.tiles[k, 1]
+            dets.append(det)
+            tile_idx.append(np.full(len(det), k))
+        device = preds[0].device if len(preds) else 'cpu'
+        if not dets:
+            return torch.zeros((0, 6), device=device)
+        dets, tile_idx = np.concatenate(dets), np.concatenate(tile_idx)
+        dets[:, [0, 2]] = dets[:, [0, 2]].clip(0, self.frame_w)  # boxes reaching into the padding of edge tiles
+        dets[:, [1, 3]] = dets[:, [1, 3]].clip(0, self.frame_h)
+
+        kept, kept_tiles = [], []
+        for n in np.argsort(-dets[:, 4]):
+            box = dets[n]
+            if kept:
+                k = np.asarray(kept)
+                inter_w = np.minimum(k[:, 2], box[2]) - np.maximum(k[:, 0], box[0])
+                inter_h = np.minimum(k[:, 3], box[3]) - np.maximum(k[:, 1], box[1])
+                inter = np.clip(inter_w, 0, None) * np.clip(inter_h, 0, None)
+                area = (box[2] - box[0]) * (box[3] - box[1])
+                areas = (k[:, 2] - k[:, 0]) * (k[:, 3] - k[:, 1])
+                ios = inter / np.maximum(np.minimum(areas, area), 1E-9)
+                dup = (ios > iou_thres) & (k[:, 5] == box[5]) & (np.asarray(kept_tiles) != tile_idx[n])
+                if dup.any():
+                    m = int(np.flatnonzero(dup)[0])
+                    kept[m][:4] = [min(kept[m][0], box[0]), min(kept[m][1], box[1]),
+                                   max(kept[m][2], box[2]), max(kept[m][3], box[3])]
+                    continue
+            kept.append(box.copy())
+            kept_tiles.append(tile_idx[n])
+        return torch.from_numpy(np.stack(kept)).to(device)
+
+    def _spans(self, lo, hi, size, limit):
+        """Start offsets of the fewest tiles of `size` covering `[lo, hi)` within `[0, limit)`."""
+        if size >= limit:
+            return [0]
+        length = hi - lo
+        if length <= size:
+            start = (lo + hi) // 2 - size // 2  # center a single tile on the range
+            return [min(max(start, 0), limit - size)]
+        n = math.ceil((length - size) / max(size - self.overlap, 1)) + 1
+        return [min(lo + round(k * (length - size) / (n - 1)), limit - size) for k in range(n)]
+
+    @staticmethod
+    def _merge(rects):
+        """Merge overlapping rectangles until none overlap."""
+        rects = [list(r) for r in rects]
+        merged = True
+        while merged:
+            merged = False
+            for a in range(len(rects)):
+                for b in range(a + 1, len(rects)):
+                    ra, rb = rects[a], rects[b]
+                    if ra[0] < rb[2] and rb[0] < ra[2] and ra[1] < rb[3] and rb[1] < ra[3]:
+                        rects[a] = [min(ra[0], rb[0]), min(ra[1], rb[1]), max(ra[2], rb[2]), max(ra[3], rb[3])]
+                        del rects[b]
+                        merged = True
+                        break
+                if merged:
+                    break
+        return rects
@@ -0,0 +1,175 @@
+"""
+Export a torchreid ReID model (OSNet by default) to ONNX, optionally quantized to int8, and check its parity.
+
+The exported model runs with onnxruntime on CPU-only hosts and is picked by
+`StrongSORT` from its `.onnx` suffix. Quantization is dynamic by default;
+with --calib it is static, calibrated on a directory of vehicle/person crops.
+The parity check runs the same crops through the fp32 PyTorch model and every
+exported model and reports the cosine drift `1 - cos(a, b)` of their
+embeddings, on identical input tensors (the model) and end to end from the
+crops (the model and its preprocessing).
+
+    $ python reid_export.py --weights strong_sort/deep/checkpoint/osnet_x0_25_msmt17.pth --int8 --crops crops/
+    $ python track.py --strong-sort-weights strong_sort/deep/checkpoint/osnet_x0_25_msmt17_int8.onnx
+
+Requires: pip install onnx onnxruntime
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+import torch
+
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[0]  # yolov5 strongsort root directory
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))  # add ROOT to PATH
+
+from strong_sort.deep.onnx_extractor import ONNXExtractor
+from strong_sort.deep.reid_model_factory import get_model_name
+from torchreid.utils import FeatureExtractor
+
+IMG_FORMATS = ('.bmp', '.jpeg', '.jpg', '.png', '.tif', '.tiff', '.webp')
+
+
+def load_crops(path=None, n=64, seed=0):
+    """Load the crops of a directory, or make `n` random ones of varied sizes."""
+    if path:
+        files = sorted(f for f in Path(path).rglob('*') if f.suffix.lower() in IMG_FORMATS)
+        if not files:
+            raise FileNotFoundError(f'No image found in {path}')
+        return [im for im in (cv2.imread(str(f)) for f in files[:n]) if im is not None]
+    rng = np.random.default_rng(seed)
+    crops = []
+    for _ in range(n):
+        h, w = rng.integers(32, 320), rng.integers(32, 320)
+        low = rng.integers(0, 256, (max(h // 8, 1), max(w // 8, 1), 3)).astype(np.uint8)
+        crops.append(cv2.resize(low, (int(w), int(h)), interpolation=cv2.INTER_CUBIC))  # smooth, unlike white noise
+    return crops
+
+
+class CalibrationReader(object):
+    """Feeds preprocessed crops to onnxruntime's static quantization, one batch at a time."""
+
+    def __init__(self, extractor, crops, input_name, batch_size=16):
+        self.batches = iter([{input_name: extractor.preprocess(crops[i:i + batch_size])}
+                             for i in range(0, len(crops), batch_size)])
+
+    def get_next(self):
+        return next(self.batches, None)
+
+
+def export_onnx(model, f, imgsz, opset, dynamic):
+    model.eval()
+    im = torch.zeros(1, 3, *imgsz)
+    torch.onnx.export(model, im, str(f), opset_version=opset, do_constant_folding=True, input_names=['images'],
+                      output_names=['features'],
+                      dynamic_axes={'images': {0: 'batch'}, 'features': {0: 'batch'}} if dynamic else None)
+    import onnx
+    onnx.checker.check_model(onnx.load(str(f)))
+    return f
+
+
+def quantize_onnx(f, fq, calib_crops=None, imgsz=(256, 128)):
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_dynamic, quantize_static
+    if calib_crops:
+        extractor = ONNXExtractor(f, image_size=imgsz)
+        reader = CalibrationReader(extractor, calib_crops, extractor.input_name)
+        quantize_static(str(f), str(fq), reader, quant_format=QuantFormat.QDQ, activation_type=QuantType.QUInt8,
+                        weight_type=QuantType.QInt8)
+    else:
+        quantize_dynamic(str(f), str(fq), weight_type=QuantType.QUInt8)
+    return fq
+
+
+def cosine_drift(a, b):
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return 1 - (a * b).sum(1)
+
+
+def parity(reference, models, crops, imgsz):
+    """Cosine drift of every exported model against the fp32 PyTorch one, and their latency per crop."""
+    with torch.no_grad():
+        t = time.perf_counter()
+        ref_e2e = reference(crops).cpu().numpy()
+        t_ref = (time.perf_counter() - t) / len(crops)
+    results = {}
+    for f in models:
+        extractor = ONNXExtractor(f, image_size=imgsz)
+        x = extractor.preprocess(crops)
+        with torch.no_grad():
+            ref = reference.model(torch.from_numpy(x).to(next(reference.model.parameters()).device)).cpu().numpy()
+        model = cosine_drift(ref, extractor.session.run(None, {extractor.input_name: x})[0])
+        t = time.perf_counter()
+        out = extractor(crops).numpy()
+        dt = (time.perf_counter() - t) / len(crops)
+        e2e = cosine_drift(ref_e2e, out)
+        results[Path(f).name] = dict(model_mean=model.mean(), model_max=model.max(), e2e_mean=e2e.mean(),
+                                     e2e_max=e2e.max(), ms=dt * 1E3)
+    return results, t_ref * 1E3
+
+
+def run(
+        weights=ROOT / 'strong_sort/deep/checkpoint/osnet_x0_25_msmt17.pth',  # torchreid model path
+        imgsz=(256, 128),  # model input (height, width)
+        opset=12,  # ONNX opset version
+        dynamic=True,  # dynamic batch axis
+        int8=False,  # also export an int8 quantized model
+        calib=None,  # directory of crops for static int8 calibration, dynamic quantization if None
+        crops=None,  # directory of crops for the parity check, random crops if None
+        nr_crops=64,  # number of crops for the parity check
+        max_drift=0.02,  # largest acceptable mean cosine drift end to end
+):
+    weights = Path(weights)
+    if not weights.is_file():
+        raise FileNotFoundError(f'{weights} does not exist')
+    model_name = get_model_name(weights)
+    reference = FeatureExtractor(model_name=model_name, model_path=str(weights), image_size=imgsz, device='cpu')
+
+    t = time.perf_counter()
+    f = export_onnx(reference.model, weights.with_suffix('.onnx'), imgsz, opset, dynamic)
+    print(f'ONNX: export success, saved as {f} ({f.stat().st_size / 1E6:.1f} MB, {time.perf_counter() - t:.1f}s)')
+    exported = [f]
+    if int8:
+        t = time.perf_counter()
+        fq = quantize_onnx(f, f.with_name(f'{f.stem}_int8.onnx'), load_crops(calib, 256) if calib else None, imgsz)
+        print(f'ONNX int8 ({"static" if calib else "dynamic"}): saved as {fq} ({fq.stat().st_size / 1E6:.1f} MB, '
+              f'{time.perf_counter() - t:.1f}s)')
+        exported.append(fq)
+
+    samples = load_crops(crops, nr_crops)
+    results, ms = parity(reference, exported, samples, imgsz)
+    print(f'\nParity on {len(samples)} {"crops" if crops else "random crops"} against {weights.name} (fp32, {ms:.2f} ms/crop)')
+    print(f'{"model":>36} {"drift mean":>11} {"drift max":>10} {"e2e mean":>9} {"e2e max":>9} {"ms/crop":>8}')
+    ok = True
+    for name, r in results.items():
+        print(f'{name:>36} {r["model_mean"]:>11.2e} {r["model_max"]:>10.2e} {r["e2e_mean"]:>9.2e} '
+              f'{r["e2e_max"]:>9.2e} {r["ms"]:>8.2f}')
+        ok &= r['e2e_mean'] <= max_drift
+    if not ok:
+        print(f'WARNING: mean cosine drift above {max_drift}, calibrate on real crops (--calib) or use the fp32 model')
+    return exported, results
+
+
+def parse_opt():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--weights', type=str, default=ROOT / 'strong_sort/deep/checkpoint/osnet_x0_25_msmt17.pth',
+                        help='torchreid model path')
+    parser.add_argument('--imgsz', nargs=2, type=int, default=[256, 128], help='model input h w')
+    parser.add_argument('--opset', type=int, default=12, help='ONNX opset version')
+    parser.add_argument('--static-batch', dest='dynamic', action='store_false', help='export with a batch size of 1')
+    parser.add_argument('--int8', action='store_true', help='also export an int8 quantized model')
+    parser.add_argument('--calib', type=str, default=None, help='directory of crops for static int8 calibration')
+    parser.add_argument('--crops', type=str, default=None, help='directory of crops for the parity check')
+    parser.add_argument('--nr-crops', type=int, default=64, help='number of crops for the parity check')
+    parser.add_argument('--max-drift', type=float, default=0.02, help='largest acceptable mean cosine drift')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    opt = parse_opt()
+    run(**vars(opt))
@@ -0,0 +1,129 @@
+"""
+Replay saved tracks through the violation logic without running any model.
+
+Tracks are the files written by `parking_violation.py --save-txt` (or any
+MOT-style track file). The zones, dwell limits and check parameters can be
+changed freely, which makes tuning a matter of seconds instead of a full
+detection and tracking rerun.
+
+    $ python replay.py --source runs/track/exp/tracks/video.txt --fps 25
+"""
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+
+import yaml
+
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[0]  # yolov5 strongsort root directory
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))  # add ROOT to PATH
+
+from violation.clock import StreamClock
+from violation.evidence import EvidenceWriter
+from violation.replay import load_tracks, replay, split_sources
+from violation.zones import load_zones
+
+logging.basicConfig(format='%(message)s', level=logging.INFO)
+LOGGER = logging.getLogger('replay')
+
+
+def increment_path(path, exist_ok=False):
+    # runs/replay/exp -> runs/replay/exp2, runs/replay/exp3, ...
+    path, n = Path(path), 2
+    if not exist_ok:
+        base = path
+        while path.exists():
+            path, n = Path(f'{base}{n}'), n + 1
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def load_names(data):
+    try:
+        with open(data, 'r') as f:
+            names = yaml.safe_load(f)['names']
+        return names if isinstance(names, dict) else dict(enumerate(names))
+    except (OSError, KeyError, TypeError):
+        return {}
+
+
+def run(
+        source,  # track file(s) or directory of track files
+        fps=25.,  # frame rate of the recordings
+        frame_size=(1920, 1080),  # frame width, height
+        config_zones=ROOT / 'strong_sort/configs/zones.yaml',  # no-parking zones
+        data=ROOT / 'yolov5/data/coco128.yaml',  # class names
+        class_id=2,  # class of tracks saved without one
+        dwell=None,  # dwell limit for all zones (seconds), None for the configured ones
+        immobile_tolerance=50,  # maximum box displacement between two checks of a stationary track
+        inset=25,  # bottom edge inset (pixels)
+        check_interval=1.,  # seconds between two checks
+        max_track_states=1024,  # maximum number of tracks with violation state per source
+        max_age=30,  # MAX_AGE of the tracker, frames after which an absent track is released
+        project=ROOT / 'runs/replay',  # save results to project/name
+        name='exp',  # save results to project/name
+        exist_ok=False,  # existing project/name ok, do not increment
+        nosave=False,  # do not write the report
+):
+    sources = [Path(s) for s in ([source] if isinstance(source, (str, Path)) else source)]
+    files = sorted(f for s in sources for f in (s.glob('*.txt') if s.is_dir() else [s]))
+    names = load_names(data)
+    width, height = frame_size
+    zones = load_zones(config_zones, (height, width))
+    evidence = None if nosave else EvidenceWriter(increment_path(Path(project) / name, exist_ok), logger=LOGGER)
+    clock = StreamClock(fps)
+
+    t0, n_rows, n_events = time.perf_counter(), 0, 0
+    for file in files:
+        tracks = load_tracks(file)
+        n_rows += len(tracks)
+        for src, rows in split_sources(tracks).items():
+            events = replay(rows, zones, fps, class_id=class_id, max_age=max_age, capacity=max_track_states,
+                            check_interval=check_interval, immobile_tolerance=immobile_tolerance,
+                            inset=inset, dwell=dwell)
+            for t, e in events:
+                label = f"{names.get(e.class_id, f'class{e.class_id}_')}{e.track_id}"
+                LOGGER.info(f'{file.name}:{src} {clock.strftime(t)} {label} 于{clock.strftime(e.start)} 违停 '
+                            f'{e.dwell:.2f} 秒 ({e.zone_id})')
+                if evidence is not None:
+                    evidence.submit((clock.strftime(e.start), label, e.zone_id))
+            n_events += len(events)
+    elapsed = time.perf_counter() - t0
+    if evidence is not None:
+        evidence.close()
+        LOGGER.info(f'Report saved to {evidence.save_dir}')
+    LOGGER.info(f'{n_events} violations from {n_rows} track rows in {len(files)} files, {elapsed:.2f}s')
+
+
+def parse_opt():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--source', nargs='+', type=str, required=True, help='track file(s) or directories written by --save-txt')
+    parser.add_argument('--fps', type=float, default=25., help='frame rate of the recordings')
+    parser.add_argument('--frame-size', nargs=2, type=int, default=[1920, 1080], help='frame width, height')
+    parser.add_argument('--config-zones', type=str, default='strong_sort/configs/zones.yaml', help='no-parking zones (YAML/JSON)')
+    parser.add_argument('--data', type=str, default=ROOT / 'yolov5/data/coco128.yaml', help='dataset.yaml with the class names')
+    parser.add_argument('--class-id', type=int, default=2, help='class of tracks saved without one')
+    parser.add_argument('--dwell', type=float, default=None, help='dwell limit for all zones (seconds)')
+    parser.add_argument('--immobile-tolerance', type=float, default=50, help='maximum box displacement between two checks of a stationary track')
+    parser.add_argument('--inset', type=int, default=25, help='bottom edge inset (pixels)')
+    parser.add_argument('--check-interval', type=float, default=1., help='seconds between two checks')
+    parser.add_argument('--max-track-states', type=int, default=1024, help='maximum number of tracks with violation state per source')
+    parser.add_argument('--max-age', type=int, default=30, help='MAX_AGE of the tracker, frames after which an absent track is released')
+    parser.add_argument('--project', default=ROOT / 'runs/replay', help='save results to project/name')
+    parser.add_argument('--name', default='exp', help='save results to project/name')
+    parser.add_argument('--exist-ok', action='store_true', help='existing project/name ok, do not increment')
+    parser.add_argument('--nosave', action='store_true', help='do not write the report')
+    opt = parser.parse_args()
+    return opt
+
+
+def main(opt):
+    run(**vars(opt))
+
+
+if __name__ == "__main__":
+    opt = parse_opt()
+    main(opt)
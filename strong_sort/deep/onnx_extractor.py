@@ -0,0 +1,70 @@
+import numpy as np
+import torch
+
+from .transforms import resize_crops
+
+
+class ONNXExtractor(object):
+    """
+    ReID feature extractor running an ONNX export of a torchreid model.
+
+    A drop-in replacement of torchreid's `FeatureExtractor` for CPU-only
+    hosts: it is called with a list of image crops and returns their
+    embeddings as an NxD `torch.Tensor`. The crops are resized (PIL bilinear
+    resize) and normalized the way torchreid does (channels are used as
+    given), so the parity with the PyTorch model only measures the export and
+    quantization error, stacked into one batch and run through onnxruntime
+    in a single call. Models exported by `reid_export.py`, including the int8
+    ones, have a dynamic batch axis.
+
+    Parameters
+    ----------
+    model_path : str
+        The `.onnx` model.
+    device : str
+        'cpu' or a cuda device; cuda runs on onnxruntime's CUDA provider when
+        it is available.
+    image_size : Tuple[int, int]
+        `(height, width)` of the model input.
+    pixel_mean : Sequence[float]
+        Per-channel mean of the normalization.
+    pixel_std : Sequence[float]
+        Per-channel standard deviation of the normalization.
+    threads : int
+        Number of intra-op threads, 0 for the onnxruntime default.
+
+    """
+
+    def __init__(self, model_path, device='cpu', image_size=(256, 128), pixel_mean=(0.485, 0.456, 0.406),
+                 pixel_std=(0.229, 0.224, 0.225), threads=0):
+        import onnxruntime  # optional dependency, only needed for ONNX models
+
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        providers = ['CPUExecutionProvider']
+        if 'cuda' in str(device) and 'CUDAExecutionProvider' in onnxruntime.get_available_providers():
+            providers.insert(0, 'CUDAExecutionProvider')
+        self.session = onnxruntime.InferenceSession(str(model_path), options, providers=providers)
+        self.input_name = self.session.get_inputs()[0].name
+        self.image_size = image_size
+        self.mean = np.asarray(pixel_mean, dtype=np.float32) * 255
+        self.std = np.asarray(pixel_std, dtype=np.float32) * 255
+
+    def preprocess(self, crops):
+        """Resize and normalize the crops into one Nx3xHxW float32 batch."""
+        batch = resize_crops(crops, self.image_size).astype(np.float32)
+        batch -= self.mean
+        batch /= self.std
+        return np.ascontiguousarray(batch.transpose(0, 3, 1, 2))
+
+    def forward(self, batch):
+        """Run the model on a preprocessed Nx3xHxW batch (ndarray or CPU tensor)."""
+        if isinstance(batch, torch.Tensor):
+            batch = batch.numpy()
+        return torch.from_numpy(self.session.run(None, {self.input_name: np.ascontiguousarray(batch, np.float32)})[0])
+
+    def __call__(self, crops):
+        if not len(crops):
+            return torch.zeros((0, self.session.get_outputs()[0].shape[-1]))
+        return self.forward(self.preprocess(crops))
@@ -0,0 +1,87 @@
+import warnings
+
+import numpy as np
+import torch
+from torchvision.ops import roi_align
+
+from .onnx_extractor import ONNXExtractor
+
+
+class ROIExtractor(object):
+    """
+    Batched crop, resize and normalization of the detections of a frame for the ReID model.
+
+    torchreid's `FeatureExtractor` converts, resizes and normalizes every crop
+    separately in Python, which costs more than the OSNet forward pass with
+    tens of objects on a CPU. Here the region of the frame covering all the
+    boxes is converted to a tensor once, `roi_align` samples every box into
+    one fixed-size batch (averaging `ceil(box / output)` samples per output
+    pixel, close to the antialiased resize of PIL), the batch is normalized
+    and the model runs once. Normalizing after the resampling is equivalent,
+    both are linear. Channels are used as given, as torchreid does.
+
+    Parameters
+    ----------
+    model : Callable
+        Maps a normalized Nx3xHxW float tensor to the NxD embeddings.
+    device : str
+        Device of the model.
+    image_size : Tuple[int, int]
+        `(height, width)` of the model input.
+    pixel_mean : Sequence[float]
+        Per-channel mean of the normalization.
+    pixel_std : Sequence[float]
+        Per-channel standard deviation of the normalization.
+
+    """
+
+    def __init__(self, model, device='cpu', image_size=(256, 128), pixel_mean=(0.485, 0.456, 0.406),
+                 pixel_std=(0.229, 0.224, 0.225)):
+        self.model = model
+        self.device = torch.device(device)
+        self.image_size = tuple(image_size)
+        self.mean = torch.tensor(pixel_mean, device=self.device).view(1, 3, 1, 1) * 255
+        self.std = torch.tensor(pixel_std, device=self.device).view(1, 3, 1, 1) * 255
+
+    @classmethod
+    def wrap(cls, extractor):
+        """Build from a torchreid `FeatureExtractor` or an `ONNXExtractor`, None for any other extractor."""
+        if isinstance(extractor, ONNXExtractor):
+            return cls(extractor.forward, 'cpu', extractor.image_size, extractor.mean / 255, extractor.std / 255)
+        model = getattr(extractor, 'model', None)
+        if isinstance(model, torch.nn.Module):
+            return cls(model, getattr(extractor, 'device', next(model.parameters()).device))
+        return None
+
+    def crops(self, ori_img, bbox_xyxy):
+        """
+        Sample the boxes of a frame into a normalized Nx3xHxW batch.
+
+        Parameters
+        ----------
+        ori_img : ndarray
+            The HxWx3 uint8 frame, possibly read-only.
+        bbox_xyxy : ndarray
+            The Nx4 integer `(x1, y1, x2, y2)` boxes, `ori_img[y1:y2, x1:x2]`
+            being the crop of a box.
+
+        """
+        boxes = np.asarray(bbox_xyxy, dtype=np.float32).reshape(-1, 4)
+        x0, y0 = boxes[:, :2].min(0).astype(int)
+        x1, y1 = boxes[:, 2:].max(0).astype(int)
+        region = ori_img[y0:y1, x0:x1]
+        with warnings.catch_warnings():  # the frame may be a read-only pooled buffer, it is never written
+            warnings.simplefilter('ignore', UserWarning)
+            region = torch.from_numpy(np.ascontiguousarray(region))
+        region = region.to(self.device).permute(2, 0, 1)[None].float()
+        boxes -= (x0, y0, x0, y0)
+        rois = torch.cat((torch.zeros(len(boxes), 1), torch.from_numpy(boxes)), 1).to(self.device)
+        # aligned: a box covers the pixels [x1, x2), like the slice of the crop
+        batch = roi_align(region, rois, self.image_size, spatial_scale=1., sampling_ratio=-1, aligned=True)
+        return (batch - self.mean) / self.std
+
+    def __call__(self, ori_img, bbox_xyxy):
+        if not len(bbox_xyxy):
+            return np.array([])
+        with torch.no_grad():
+            return self.model(self.crops(ori_img, bbox_xyxy))
@@ -0,0 +1,50 @@
+import torch
+
+from .transforms import resize_crops
+
+
+class TorchScriptExtractor(object):
+    """
+    ReID feature extractor running a TorchScript trace of a torchreid model.
+
+    Loading a trace takes a fraction of the time torchreid needs to import
+    and build the model from its checkpoint, which matters on restarts. It is
+    called with a list of image crops and returns their embeddings as an NxD
+    `torch.Tensor`, like torchreid's `FeatureExtractor`. The crops go through
+    the same preprocessing as in `FeatureExtractor` (PIL bilinear resize, then
+    normalization), so the embeddings match those of the traced model, and
+    run in one batch.
+
+    Parameters
+    ----------
+    model_path : str
+        The `.torchscript` trace.
+    device : str
+        Device to run the model on.
+    image_size : Tuple[int, int]
+        `(height, width)` of the model input.
+    pixel_mean : Sequence[float]
+        Per-channel mean of the normalization.
+    pixel_std : Sequence[float]
+        Per-channel standard deviation of the normalization.
+
+    """
+
+    def __init__(self, model_path, device='cpu', image_size=(256, 128), pixel_mean=(0.485, 0.456, 0.406),
+                 pixel_std=(0.229, 0.224, 0.225)):
+        self.device = torch.device(device)
+        self.model = torch.jit.load(str(model_path), map_location=self.device).eval()
+        self.image_size = image_size
+        self.mean = torch.tensor(pixel_mean, device=self.device).view(1, 3, 1, 1) * 255
+        self.std = torch.tensor(pixel_std, device=self.device).view(1, 3, 1, 1) * 255
+
+    def preprocess(self, crops):
+        """Resize and normalize the crops into one Nx3xHxW float tensor."""
+        batch = torch.from_numpy(resize_crops(crops, self.image_size)).to(self.device).permute(0, 3, 1, 2).float()
+        return (batch - self.mean) / self.std
+
+    def __call__(self, crops):
+        if not len(crops):
+            return torch.zeros((0,))
+        with torch.no_grad():
+            return self.model(self.preprocess(crops))
@@ -0,0 +1,132 @@
+import threading
+import time
+
+import numpy as np
+import torch
+
+from .roi_extractor import ROIExtractor
+
+
+class SharedExtractor(object):
+    """
+    One ReID extractor shared by the StrongSORT instances of all streams.
+
+    The model is loaded once whatever the number of streams. The calls of
+    the trackers of a frame round are merged into one forward pass: a call
+    waits until `parties` calls are pending, or `wait` seconds after it was
+    made, then the calling thread that closes the round runs the model on
+    all the pending crops at once and hands every caller its rows. Calls
+    made while a forward pass is running form the next round. With
+    `parties=1` (trackers called one after the other on the same thread)
+    every call runs at once.
+
+    Both crop paths are batched: lists of crops (`__call__`), concatenated
+    for the wrapped extractor, and the ROI-align path (`roi`), whose crops
+    are sampled and normalized on the calling thread and concatenated for
+    the model.
+
+    Parameters
+    ----------
+    extractor : Callable
+        Maps a list of crops to their NxD embeddings, e.g. a torchreid
+        `FeatureExtractor` or an `ONNXExtractor`.
+    parties : int
+        Number of trackers calling concurrently, e.g. the number of streams
+        tracked on their own thread.
+    wait : float
+        Maximum time in seconds a call waits for the other trackers.
+
+    Attributes
+    ----------
+    forwards : int
+        Number of forward passes run.
+    calls : int
+        Number of calls served.
+
+    """
+
+    def __init__(self, extractor, parties=1, wait=0.005):
+        self.extractor = extractor
+        self.parties = max(int(parties), 1)
+        self.wait = wait
+        self.roi_extractor = ROIExtractor.wrap(extractor)  # None for extractors without a torch or ONNX model
+        self.forwards = 0
+        self.calls = 0
+        self._pending = []
+        self._running = False
+        self._cond = threading.Condition()
+
+    @property
+    def calls_per_forward(self):
+        return self.calls / self.forwards if self.forwards else 0.
+
+    @property
+    def roi(self):
+        """The ROI-align path, `roi(ori_img, bbox_xyxy)`, None if the model does not support it."""
+        return self._roi if self.roi_extractor is not None else None
+
+    def __call__(self, crops):
+        return self._submit('crops', list(crops))
+
+    def _roi(self, ori_img, bbox_xyxy):
+        if not len(bbox_xyxy):
+            return np.array([])
+        return self._submit('batch', self.roi_extractor.crops(ori_img, bbox_xyxy))
+
+    def _submit(self, kind, batch):
+        request = _Request(kind, batch)
+        deadline = time.monotonic() + self.wait
+        with self._cond:
+            self._pending.append(request)
+            while not request.done:
+                if not self._running and (len(self._pending) >= self.parties or time.monotonic() >= deadline):
+                    self._run()
+                    continue
+                self._cond.wait(None if self._running else max(deadline - time.monotonic(), 0))
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _run(self):
+        """Run the pending requests in one forward pass per kind; called with the lock held."""
+        pending, self._pending = self._pending, []
+        self._running = True
+        self._cond.release()
+        try:
+            for kind in ('crops', 'batch'):
+                requests = [r for r in pending if r.kind == kind]
+                if requests:
+                    self._forward(kind, requests)
+        finally:
+            self._cond.acquire()
+            self._running = False
+            self._cond.notify_all()
+
+    def _forward(self, kind, requests):
+        try:
+            if kind == 'crops':
+                features = self.extractor([crop for r in requests for crop in r.batch])
+            else:
+                with torch.no_grad():
+                    features = self.roi_extractor.model(torch.cat([r.batch for r in requests]))
+            start = 0
+            for r in requests:
+                r.result = features[start:start + len(r.batch)]
+                start += len(r.batch)
+        except Exception as e:
+            for r in requests:
+                r.error = e
+        self.forwards += 1
+        self.calls += len(requests)
+        for r in requests:
+            r.done = True
+
+
+class _Request(object):
+
+    def __init__(self, kind, batch):
+        self.kind = kind
+        self.batch = batch
+        self.result = None
+        self.error = None
+        self.done = False
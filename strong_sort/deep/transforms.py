@@ -0,0 +1,28 @@
+import numpy as np
+from PIL import Image
+
+
+def resize_crops(crops, image_size):
+    """
+    Resize image crops to the ReID model input the way torchreid does.
+
+    torchreid's transforms resize PIL images with torchvision's `Resize`,
+    which is PIL's bilinear resize: antialiased when downscaling, unlike
+    `cv2.resize`. Large crops resized another way give visibly different
+    embeddings.
+
+    Parameters
+    ----------
+    crops : Sequence[ndarray]
+        HxWx3 uint8 crops, channels as given.
+    image_size : Tuple[int, int]
+        `(height, width)` of the model input.
+
+    Returns
+    -------
+    ndarray
+        The Nx`height`x`width`x3 uint8 batch.
+
+    """
+    h, w = image_size
+    return np.stack([np.asarray(Image.fromarray(crop).resize((w, h), Image.BILINEAR)) for crop in crops])
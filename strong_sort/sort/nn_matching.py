@@ -3,7 +3,21 @@ import numpy as np
 import sys
 import torch
 sys.path.append('strong_sort/deep/reid')
-from torchreid.metrics.distance import compute_distance_matrix
+
+
+def compute_distance_matrix(x, y, metric='euclidean'):
+    """Same as `torchreid.metrics.distance.compute_distance_matrix`, without
+    importing torchreid (slow to import, and only its model zoo is needed to
+    build the ReID model).
+    """
+    if metric == 'cosine':
+        x = torch.nn.functional.normalize(x, p=2, dim=1)
+        y = torch.nn.functional.normalize(y, p=2, dim=1)
+        return 1 - torch.mm(x, y.t())
+    m, n = x.size(0), y.size(0)
+    distmat = torch.pow(x, 2).sum(dim=1, keepdim=True).expand(m, n) + \
+        torch.pow(y, 2).sum(dim=1, keepdim=True).expand(n, m).t()
+    return distmat.addmm_(x, y.t(), beta=1, alpha=-2)
 
 
 def _pdist(a, b):
@@ -260,23 +260,36 @@ class Track:
         self.age += 1
         self.time_since_update += 1
 
+    def coast(self):
+        """Propagate the state distribution over a frame the detector skipped.
+
+        Unlike `predict`, the frame does not count as a missed measurement:
+        `age` and `time_since_update` are left unchanged, so the track is
+        associated at the next detector frame as if the skipped frames did not
+        exist, but with its state advanced to the current time step.
+
+        """
+        self.mean, self.covariance = self.kf.predict(self.mean, self.covariance)
+
     def update(self, detection, class_id, conf):
         """Perform Kalman filter measurement update step and update the feature
         cache.
         Parameters
         ----------
         detection : Detection
-            The associated detection.
+            The associated detection. The feature cache is left unchanged if
+            its `feature` is None.
         """
         self.conf = conf
         self.class_id = class_id.int()
         self.mean, self.covariance = self.kf.update(self.mean, self.covariance, detection.to_xyah(), detection.confidence)
 
-        feature = detection.feature / np.linalg.norm(detection.feature)
+        if detection.feature is not None:  # None when associated by motion only, the appearance is kept
+            feature = detection.feature / np.linalg.norm(detection.feature)
 
-        smooth_feat = self.ema_alpha * self.features[-1] + (1 - self.ema_alpha) * feature
-        smooth_feat /= np.linalg.norm(smooth_feat)
-        self.features = [smooth_feat]
+            smooth_feat = self.ema_alpha * self.features[-1] + (1 - self.ema_alpha) * feature
+            smooth_feat /= np.linalg.norm(smooth_feat)
+            self.features = [smooth_feat]
 
         self.hits += 1
         self.time_since_update = 0
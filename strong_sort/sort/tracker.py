@@ -1,5 +1,6 @@
 # vim: expandtab:ts=4:sw=4
 from __future__ import absolute_import
+import time
 import numpy as np
 from . import kalman_filter
 from . import linear_assignment
@@ -20,6 +21,10 @@ class Tracker:
         Number of consecutive detections before the track is confirmed. The
         track state is set to `Deleted` if a miss occurs within the first
         `n_init` frames.
+    lazy_refresh : int
+        With lazy appearance (see `update`), number of consecutive updates a
+        track matched by motion only keeps its appearance before a feature is
+        extracted for its detection anyway. 0 never forces the extraction.
     Attributes
     ----------
     metric : nn_matching.NearestNeighborDistanceMetric
@@ -32,10 +37,19 @@ class Tracker:
         A Kalman filter to filter target trajectories in image space.
     tracks : List[Track]
         The list of active tracks at the current time step.
+    deleted_tracks : List[int]
+        IDs of the tracks removed at the last `update` or `increment_ages`.
+    unmatched_detections : int
+        Number of detections not associated to an existing track at the last
+        `update`.
+    timings : Dict[str, float]
+        Seconds spent in the last `update` on the association ('association')
+        and on the Kalman measurement updates ('kalman').
     """
     GATING_THRESHOLD = np.sqrt(kalman_filter.chi2inv95[4])
 
-    def __init__(self, metric, max_iou_distance=0.9, max_age=30, n_init=3, _lambda=0, ema_alpha=0.9, mc_lambda=0.995):
+    def __init__(self, metric, max_iou_distance=0.9, max_age=30, n_init=3, _lambda=0, ema_alpha=0.9, mc_lambda=0.995,
+                 lazy_refresh=30):
         self.metric = metric
         self.max_iou_distance = max_iou_distance
         self.max_age = max_age
@@ -43,9 +57,14 @@ class Tracker:
         self._lambda = _lambda
         self.ema_alpha = ema_alpha
         self.mc_lambda = mc_lambda
+        self.lazy_refresh = lazy_refresh
 
         self.kf = kalman_filter.KalmanFilter()
         self.tracks = []
+        self.deleted_tracks = []
+        self.unmatched_detections = 0
+        self.timings = {}
+        self.motion_age = {}  # track id -> consecutive updates matched by motion only
         self._next_id = 1
 
     def predict(self):
@@ -56,37 +75,69 @@ class Tracker:
         for track in self.tracks:
             track.predict(self.kf)
 
+    def coast(self):
+        """Propagate all tracks over a frame on which the detector did not run."""
+        for track in self.tracks:
+            track.coast()
+
+    def hold(self):
+        """Age all tracks by a frame on which the scene did not change.
+
+        Nothing is predicted and no measurement counts as missed, the tracks
+        keep their state until the next frame that is tracked.
+        """
+        for track in self.tracks:
+            track.age += 1
+
+    def speeds(self):
+        """Speed of the confirmed tracks, in box heights per frame."""
+        return [np.hypot(*t.mean[4:6]) / max(t.mean[3], 1.) for t in self.tracks if t.is_confirmed()]
+
     def increment_ages(self):
         for track in self.tracks:
             track.increment_age()
             track.mark_missed()
+        self._remove_deleted()
 
     def camera_update(self, previous_img, current_img):
         for track in self.tracks:
             track.camera_update(previous_img, current_img)
 
-    def update(self, detections, classes, confidences):
+    def update(self, detections, classes, confidences, extract=None):
         """Perform measurement update and track management.
 
         Parameters
         ----------
         detections : List[deep_sort.detection.Detection]
             A list of detections at the current time step.
+        extract : Optional[Callable[[List[int]], ndarray]]
+            Lazy appearance: the detections may come without feature. A
+            confirmed track updated on the previous frame and a detection that
+            are each other's only candidate inside the motion gate, with
+            enough overlap, are matched without appearance; `extract` is then
+            called once with the indices of all the other detections still
+            without feature, and of the motion matches of tracks that went
+            `lazy_refresh` updates without appearance, and returns their
+            features.
 
         """
         # Run matching cascade.
+        t0 = time.perf_counter()
         matches, unmatched_tracks, unmatched_detections = \
-            self._match(detections)
+            self._match(detections, extract)
+        t1 = time.perf_counter()
 
         # Update track set.
         for track_idx, detection_idx in matches:
             self.tracks[track_idx].update(
                 detections[detection_idx], classes[detection_idx], confidences[detection_idx])
+        self.timings = {'association': t1 - t0, 'kalman': time.perf_counter() - t1}
         for track_idx in unmatched_tracks:
             self.tracks[track_idx].mark_missed()
         for detection_idx in unmatched_detections:
             self._initiate_track(detections[detection_idx], classes[detection_idx].item(), confidences[detection_idx].item())
-        self.tracks = [t for t in self.tracks if not t.is_deleted()]
+        self.unmatched_detections = len(unmatched_detections)
+        self._remove_deleted()
 
         # Update distance metric.
         active_targets = [t.track_id for t in self.tracks if t.is_confirmed()]
@@ -132,7 +183,31 @@ class Tracker:
         # Return Matrix
         return cost_matrix
 
-    def _match(self, detections):
+    def _match_unambiguous(self, detections, track_indices):
+        """Match the tracks and detections that are each other's only candidate inside the motion gate.
+
+        Returns the matches and the remaining track and detection indices.
+        """
+        detection_indices = list(range(len(detections)))
+        if not track_indices or not detections:
+            return [], track_indices, detection_indices
+        measurements = np.asarray([d.to_xyah() for d in detections])
+        gated = np.array([
+            self.tracks[i].kf.gating_distance(self.tracks[i].mean, self.tracks[i].covariance, measurements) <=
+            kalman_filter.chi2inv95[4] for i in track_indices])
+        rows, cols = gated.sum(1), gated.sum(0)
+        matches = []
+        for row, col in zip(*np.nonzero(gated)):
+            track = self.tracks[track_indices[row]]
+            if rows[row] != 1 or cols[col] != 1 or track.time_since_update != 1:
+                continue
+            if 1. - iou_matching.iou(track.to_tlwh(), detections[col].tlwh[None])[0] <= self.max_iou_distance:
+                matches.append((track_indices[row], int(col)))
+        matched_tracks, matched_detections = {k for k, _ in matches}, {d for _, d in matches}
+        return (matches, [k for k in track_indices if k not in matched_tracks],
+                [d for d in detection_indices if d not in matched_detections])
+
+    def _match(self, detections, extract=None):
 
         def gated_metric(tracks, dets, track_indices, detection_indices):
             features = np.array([dets[i].feature for i in detection_indices])
@@ -148,11 +223,24 @@ class Tracker:
         unconfirmed_tracks = [
             i for i, t in enumerate(self.tracks) if not t.is_confirmed()]
 
+        # Associate unambiguous pairs by motion only, then compute the features the remaining associations need.
+        matches_m, detection_indices = [], None
+        if extract is not None:
+            matches_m, confirmed_tracks, detection_indices = self._match_unambiguous(detections, confirmed_tracks)
+            stale = [d for k, d in matches_m
+                     if self.lazy_refresh and self.motion_age.get(self.tracks[k].track_id, 0) >= self.lazy_refresh]
+            missing = [i for i in detection_indices + stale if detections[i].feature is None]
+            if missing:
+                for i, feature in zip(missing, extract(missing)):
+                    detections[i].feature = np.asarray(feature, dtype=np.float32)
+            self.motion_age = {self.tracks[k].track_id: self.motion_age.get(self.tracks[k].track_id, 0) + 1
+                               for k, d in matches_m if detections[d].feature is None}
+
         # Associate confirmed tracks using appearance features.
         matches_a, unmatched_tracks_a, unmatched_detections = \
             linear_assignment.matching_cascade(
                 gated_metric, self.metric.matching_threshold, self.max_age,
-                self.tracks, detections, confirmed_tracks)
+                self.tracks, detections, confirmed_tracks, detection_indices)
 
         # Associate remaining tracks together with unconfirmed tracks using IOU.
         iou_track_candidates = unconfirmed_tracks + [
@@ -166,10 +254,14 @@ class Tracker:
                 iou_matching.iou_cost, self.max_iou_distance, self.tracks,
                 detections, iou_track_candidates, unmatched_detections)
 
-        matches = matches_a + matches_b
+        matches = matches_m + matches_a + matches_b
         unmatched_tracks = list(set(unmatched_tracks_a + unmatched_tracks_b))
         return matches, unmatched_tracks, unmatched_detections
 
+    def _remove_deleted(self):
+        self.deleted_tracks = [t.track_id for t in self.tracks if t.is_deleted()]
+        self.tracks = [t for t in self.tracks if not t.is_deleted()]
+
     def _initiate_track(self, detection, class_id, conf):
         self.tracks.append(Track(
             detection.to_xyah(), self._next_id, class_id, conf, self.n_init, self.max_age, self.ema_alpha,
@@ -1,16 +1,18 @@
 import numpy as np
 import torch
 import sys
-import gdown
+import time
 from os.path import exists as file_exists, join
 
+from .sort import iou_matching
 from .sort.nn_matching import NearestNeighborDistanceMetric
 from .sort.detection import Detection
 from .sort.tracker import Tracker
 from .deep.reid_model_factory import show_downloadeable_models, get_model_url, get_model_name
-
-from torchreid.utils import FeatureExtractor
-from torchreid.utils.tools import download_url
+from .deep.onnx_extractor import ONNXExtractor
+from .deep.roi_extractor import ROIExtractor
+from .deep.shared_extractor import SharedExtractor
+from .deep.script_extractor import TorchScriptExtractor
 
 __all__ = ['StrongSORT']
 
@@ -23,12 +25,57 @@ class StrongSORT(object):
                  max_age=70, n_init=3,
                  nn_budget=100,
                  mc_lambda=0.995,
-                 ema_alpha=0.9
+                 ema_alpha=0.9,
+                 extractor=None,  # callable mapping a list of BGR crops to their embeddings, instead of the torchreid model
+                 roi_align=False,  # crop and resize all the boxes in one batch, see ROIExtractor
+                 reuse_refresh=0,  # frames a stationary track reuses its embedding before a new one is extracted, 0 to disable
+                 reuse_iou=0.9,  # IoU of the detection with the predicted box of a track to reuse its embedding
+                 reuse_speed=0.02,  # speed of a track, in box heights per frame, below which it is stationary
+                 lazy_reid=False,  # extract features only for the detections motion alone cannot associate
+                 lazy_refresh=30  # updates a track matched by motion only keeps its embedding before a new one is extracted, 0 never
                 ):
+        if extractor is None:
+            extractor = self.load_extractor(model_weights, device)
+        self.extractor = extractor
+        if not roi_align:
+            self.roi_extractor = None
+        elif isinstance(extractor, SharedExtractor):  # batched with the crops of the other streams
+            self.roi_extractor = extractor.roi
+        else:
+            self.roi_extractor = ROIExtractor.wrap(extractor)  # None for other extractors
+
+        self.max_dist = max_dist
+        metric = NearestNeighborDistanceMetric(
+            "cosine", self.max_dist, nn_budget)
+        self.tracker = Tracker(
+            metric, max_iou_distance=max_iou_distance, max_age=max_age, n_init=n_init, lazy_refresh=lazy_refresh)
+        self.timings = {}  # seconds spent in the last update on reid, kalman and association
+        self.reuse_refresh = reuse_refresh
+        self.reuse_iou = reuse_iou
+        self.reuse_speed = reuse_speed
+        self.lazy_reid = lazy_reid
+        self.feature_age = {}  # track id -> consecutive frames its embedding was reused
+        self.reused = 0  # detections that reused the embedding of their track
+        self.extracted = 0  # detections run through the ReID model
+        self.detections = 0
+
+    @staticmethod
+    def load_extractor(model_weights, device):
+        """Load the ReID model of `model_weights` (torchreid checkpoint, downloaded if missing, ONNX or TorchScript export)."""
+        if str(model_weights).endswith('.onnx'):  # exported by reid_export.py
+            if not file_exists(model_weights):
+                raise FileNotFoundError(f'{model_weights} does not exist, export it with reid_export.py first')
+            return ONNXExtractor(model_weights, device=str(device))
+        if str(model_weights).endswith('.torchscript'):  # traced into the model cache, see pipeline/startup.py
+            return TorchScriptExtractor(model_weights, device=device)
+
+        from torchreid.utils import FeatureExtractor  # imported on demand, torchreid takes seconds to import
+
         model_name = get_model_name(model_weights)
         model_url = get_model_url(model_weights)
 
         if not file_exists(model_weights) and model_url is not None:
+            import gdown
             gdown.download(model_url, str(model_weights), quiet=False)
         elif file_exists(model_weights):
             pass
@@ -37,35 +84,97 @@ class StrongSORT(object):
             show_downloadeable_models()
             exit()
 
-        self.extractor = FeatureExtractor(
+        return FeatureExtractor(
             # get rid of dataset information DeepSort model name
             model_name=model_name,
             model_path=model_weights,
             device=str(device)
         )
 
-        self.max_dist = max_dist
-        metric = NearestNeighborDistanceMetric(
-            "cosine", self.max_dist, nn_budget)
-        self.tracker = Tracker(
-            metric, max_iou_distance=max_iou_distance, max_age=max_age, n_init=n_init)
-
     def update(self, bbox_xywh, confidences, classes, ori_img):
         self.height, self.width = ori_img.shape[:2]
-        # generate detections
-        features = self._get_features(bbox_xywh, ori_img)
+        t0 = time.perf_counter()
+        self.tracker.predict()
+        t1 = time.perf_counter()
+        # generate detections, stationary tracks lend their embedding to the detection on their predicted box
         bbox_tlwh = self._xywh_to_tlwh(bbox_xywh)
+        reuse = self._reusable(bbox_tlwh)
+        features = [None] * len(bbox_tlwh)
+        for k, track in reuse.items():
+            features[k] = torch.from_numpy(track.features[-1])
+        extract = [k for k in range(len(bbox_tlwh)) if k not in reuse]
+        if extract and not self.lazy_reid:
+            for k, feature in zip(extract, self._get_features(bbox_xywh[extract], ori_img)):
+                features[k] = feature
+            self.extracted += len(extract)
+        self.feature_age = {t.track_id: self.feature_age.get(t.track_id, 0) + 1 for t in reuse.values()}
+        self.reused += len(reuse)
+        self.detections += len(bbox_tlwh)
+        t2 = time.perf_counter()
         detections = [Detection(bbox_tlwh[i], conf, features[i]) for i, conf in enumerate(
             confidences)]
 
-        # run on non-maximum supression
-        boxes = np.array([d.tlwh for d in detections])
-        scores = np.array([d.confidence for d in detections])
+        # update tracker, the lazy features are extracted in one batch during the association
+        t_lazy = [0.]
+
+        def extract_lazy(indices):
+            t = time.perf_counter()
+            features = self._get_features(bbox_xywh[indices], ori_img).cpu().numpy()
+            self.extracted += len(indices)
+            t_lazy[0] += time.perf_counter() - t
+            return features
+
+        self.tracker.update(detections, classes, confidences, extract_lazy if self.lazy_reid else None)
+        self.timings = {'reid': t2 - t1 + t_lazy[0], 'kalman': t1 - t0 + self.tracker.timings['kalman'],
+                        'association': self.tracker.timings['association'] - t_lazy[0]}
+        return self._outputs()
+
+    @property
+    def reuse_rate(self):
+        """Fraction of the detections that reused the embedding of their track instead of running the ReID model."""
+        return self.reused / self.detections if self.detections else 0.
+
+    @property
+    def reid_rate(self):
+        """Fraction of the detections run through the ReID model."""
+        return self.extracted / self.detections if self.detections else 0.
+
+    def _reusable(self, bbox_tlwh):
+        """Map the index of a detection to the track whose embedding it can reuse.
+
+        A confirmed track, updated on the previous frame, stationary and whose
+        embedding was reused for less than `reuse_refresh` frames lends it to
+        the detection overlapping its predicted box by more than `reuse_iou`,
+        unless another track claims the same detection.
+        """
+        if not self.reuse_refresh or not len(bbox_tlwh):
+            return {}
+        boxes = np.asarray(bbox_tlwh, dtype=float)
+        claims = {}
+        for track in self.tracker.tracks:
+            if not track.is_confirmed() or track.time_since_update != 1 or not track.features:
+                continue
+            if self.feature_age.get(track.track_id, 0) >= self.reuse_refresh:
+                continue  # refresh the embedding
+            if np.hypot(*track.mean[4:6]) / max(track.mean[3], 1.) > self.reuse_speed:
+                continue
+            ious = iou_matching.iou(track.to_tlwh(), boxes)
+            k = int(np.argmax(ious))
+            if ious[k] > self.reuse_iou:  # a lower overlap is a significant change of the box
+                claims.setdefault(k, []).append(track)
+        return {k: tracks[0] for k, tracks in claims.items() if len(tracks) == 1}
+
+    def coast(self, ori_img):
+        """Advance the tracks on a frame the detector skipped and report their predicted boxes."""
+        self.height, self.width = ori_img.shape[:2]
+        self.tracker.coast()
+        return self._outputs()
 
-        # update tracker
-        self.tracker.predict()
-        self.tracker.update(detections, classes, confidences)
+    def hold(self):
+        """Keep the tracks unchanged over a frame the motion gate skipped."""
+        self.tracker.hold()
 
+    def _outputs(self):
         # output bbox identities
         outputs = []
         for track in self.tracker.tracks:
@@ -132,6 +241,8 @@ class StrongSORT(object):
         return t, l, w, h
 
     def _get_features(self, bbox_xywh, ori_img):
+        if self.roi_extractor is not None:
+            return self.roi_extractor(ori_img, [self._xywh_to_xyxy(box) for box in bbox_xywh])
         im_crops = []
         for box in bbox_xywh:
             x1, y1, x2, y2 = self._xywh_to_xyxy(box)
@@ -0,0 +1,162 @@
+"""
+Grid search of the violation parameters on replayed tracks.
+
+Every combination of dwell limit, immobile tolerance and bottom edge inset is
+replayed over the saved tracks on a process pool and scored against a ground
+truth list of violations. The grid is given on the command line or as a YAML
+file with `DWELL`, `IMMOBILE_TOLERANCE` and `INSET` lists. The ground truth is
+a CSV file with one `sequence,track_id[,start[,source]]` row per violation,
+where `sequence` is the track file name without extension, `start` the stream
+time (seconds) the vehicle stopped (may be left empty) and `source` the source
+column of the track in files holding several sources (0 by default); track IDs
+are only unique within a source.
+
+    $ python sweep.py --source runs/track/exp/tracks --gt violations.csv --fps 25 \
+                      --dwell 30 60 120 --immobile-tolerance 30 50 80 --inset 15 25 35
+"""
+import argparse
+import csv
+import itertools
+import sys
+import time
+from multiprocessing import Pool
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[0]  # yolov5 strongsort root directory
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))  # add ROOT to PATH
+
+from replay import LOGGER, increment_path
+from violation.replay import load_tracks, replay, split_sources
+from violation.zones import load_zones
+
+FIELDS = ['dwell', 'immobile_tolerance', 'inset', 'events', 'tp', 'fp', 'fn',
+          'precision', 'recall', 'f1', 'time_to_alert']
+
+_worker = {}
+
+
+def load_gt(path):
+    gt = {}
+    with open(path, 'r') as f:
+        for row in csv.reader(line for line in f if line.strip() and not line.startswith('#')):
+            start = float(row[2]) if len(row) > 2 and row[2].strip() else None
+            source = int(float(row[3])) if len(row) > 3 and row[3].strip() else 0
+            gt[(row[0].strip(), source, int(float(row[1])))] = start
+    return gt
+
+
+def _init_worker(files, config_zones, frame_shape, fps, check_interval, max_track_states, max_age):
+    _worker['sequences'] = [(f.stem, split_sources(load_tracks(f))) for f in files]
+    _worker['zones'] = load_zones(config_zones, frame_shape)
+    _worker['kwargs'] = dict(fps=fps, check_interval=check_interval, capacity=max_track_states, max_age=max_age)
+
+
+def _replay_all(params):
+    dwell, immobile_tolerance, inset = params
+    alerts = {}
+    for seq, sources in _worker['sequences']:
+        for src, rows in sources.items():
+            for t, e in replay(rows, _worker['zones'], dwell=dwell, immobile_tolerance=immobile_tolerance,
+                               inset=inset, **_worker['kwargs']):
+                alerts.setdefault((seq, src, e.track_id), (t, e.start))
+    return params, alerts
+
+
+def score(alerts, gt):
+    tp = [k for k in alerts if k in gt]
+    delays = [alerts[k][0] - (gt[k] if gt[k] is not None else alerts[k][1]) for k in tp]
+    precision = len(tp) / len(alerts) if alerts else 0.
+    recall = len(tp) / len(gt) if gt else 0.
+    return dict(events=len(alerts), tp=len(tp), fp=len(alerts) - len(tp), fn=len(gt) - len(tp),
+                precision=precision, recall=recall,
+                f1=2 * precision * recall / (precision + recall) if precision + recall else 0.,
+                time_to_alert=float(np.mean(delays)) if delays else float('nan'))
+
+
+def run(
+        source,  # track file(s) or directory of track files
+        gt,  # ground truth violations (CSV)
+        grid=None,  # YAML file with the parameter grid, overrides the lists below
+        dwell=(5.,),  # dwell limits (seconds)
+        immobile_tolerance=(50.,),  # maximum box displacements between two checks
+        inset=(25,),  # bottom edge insets (pixels)
+        fps=25.,  # frame rate of the recordings
+        frame_size=(1920, 1080),  # frame width, height
+        config_zones=ROOT / 'strong_sort/configs/zones.yaml',  # no-parking zones
+        check_interval=1.,  # seconds between two checks
+        max_track_states=1024,  # maximum number of tracks with violation state per source
+        max_age=30,  # MAX_AGE of the tracker, frames after which an absent track is released
+        workers=None,  # number of processes, None for all cores
+        project=ROOT / 'runs/sweep',  # save results to project/name
+        name='exp',  # save results to project/name
+        exist_ok=False,  # existing project/name ok, do not increment
+):
+    if grid is not None:
+        with open(grid, 'r') as f:
+            g = yaml.safe_load(f) or {}
+        dwell = g.get('DWELL', dwell)
+        immobile_tolerance = g.get('IMMOBILE_TOLERANCE', immobile_tolerance)
+        inset = g.get('INSET', inset)
+    sources = [Path(s) for s in ([source] if isinstance(source, (str, Path)) else source)]
+    files = sorted(f for s in sources for f in (s.glob('*.txt') if s.is_dir() else [s]))
+    truth = load_gt(gt)
+    combos = [(float(d), float(m), int(i)) for d, m, i in itertools.product(dwell, immobile_tolerance, inset)]
+    width, height = frame_size
+
+    t0 = time.perf_counter()
+    init = (files, config_zones, (height, width), fps, check_interval, max_track_states, max_age)
+    with Pool(workers, initializer=_init_worker, initargs=init) as pool:
+        results = []
+        for (d, m, i), alerts in pool.imap_unordered(_replay_all, combos):
+            results.append(dict(dwell=d, immobile_tolerance=m, inset=i, **score(alerts, truth)))
+    results.sort(key=lambda r: (-r['precision'], -r['recall'],
+                                r['time_to_alert'] if r['time_to_alert'] == r['time_to_alert'] else float('inf')))
+
+    save_dir = increment_path(Path(project) / name, exist_ok)
+    with open(save_dir / 'sweep.csv', 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(results)
+    LOGGER.info(f'{len(combos)} settings over {len(files)} track files in {time.perf_counter() - t0:.2f}s')
+    for r in results[:5]:
+        tta = f"{r['time_to_alert']:.1f}s" if r['time_to_alert'] == r['time_to_alert'] else 'n/a'  # NaN without true positive
+        LOGGER.info(f"dwell {r['dwell']:g}s, tolerance {r['immobile_tolerance']:g}px, inset {r['inset']}px: "
+                    f"P {r['precision']:.3f} R {r['recall']:.3f} time-to-alert {tta}")
+    LOGGER.info(f"Results saved to {save_dir / 'sweep.csv'}")
+    return results
+
+
+def parse_opt():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--source', nargs='+', type=str, required=True, help='track file(s) or directories written by --save-txt')
+    parser.add_argument('--gt', type=str, required=True, help='ground truth violations, sequence,track_id[,start[,source]] per line')
+    parser.add_argument('--grid', type=str, default=None, help='YAML file with DWELL, IMMOBILE_TOLERANCE and INSET lists')
+    parser.add_argument('--dwell', nargs='+', type=float, default=[5.], help='dwell limits (seconds)')
+    parser.add_argument('--immobile-tolerance', nargs='+', type=float, default=[50.], help='maximum box displacements between two checks')
+    parser.add_argument('--inset', nargs='+', type=int, default=[25], help='bottom edge insets (pixels)')
+    parser.add_argument('--fps', type=float, default=25., help='frame rate of the recordings')
+    parser.add_argument('--frame-size', nargs=2, type=int, default=[1920, 1080], help='frame width, height')
+    parser.add_argument('--config-zones', type=str, default='strong_sort/configs/zones.yaml', help='no-parking zones (YAML/JSON)')
+    parser.add_argument('--check-interval', type=float, default=1., help='seconds between two checks')
+    parser.add_argument('--max-track-states', type=int, default=1024, help='maximum number of tracks with violation state per source')
+    parser.add_argument('--max-age', type=int, default=30, help='MAX_AGE of the tracker, frames after which an absent track is released')
+    parser.add_argument('--workers', type=int, default=None, help='number of processes, all cores by default')
+    parser.add_argument('--project', default=ROOT / 'runs/sweep', help='save results to project/name')
+    parser.add_argument('--name', default='exp', help='save results to project/name')
+    parser.add_argument('--exist-ok', action='store_true', help='existing project/name ok, do not increment')
+    opt = parser.parse_args()
+    return opt
+
+
+def main(opt):
+    run(**vars(opt))
+
+
+if __name__ == "__main__":
+    opt = parse_opt()
+    main(opt)
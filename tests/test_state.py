@@ -0,0 +1,35 @@
+import numpy as np
+
+from violation.state import TrackStateStore
+
+
+def test_slots_of_the_current_frame_are_not_evicted():
+    st = TrackStateStore(capacity=3)
+    slots = [st.slot(track_id, 2, t=0.) for track_id in range(5)]  # one frame with more tracks than slots
+    assert slots[3:] == [None, None]
+    assert st.skips == 2 and st.evictions == 0
+    assert sorted(slots[:3]) == [0, 1, 2]
+    assert [st.get(track_id) for track_id in range(3)] == slots[:3]
+
+
+def test_least_recently_seen_track_is_evicted():
+    st = TrackStateStore(capacity=3)
+    for t, track_ids in enumerate([(0, 1, 2), (1, 2), (2, 3)]):
+        for track_id in track_ids:
+            st.slot(track_id, 2, float(t))
+    assert 0 not in st and all(track_id in st for track_id in (1, 2, 3))
+    assert st.evictions == 1 and st.skips == 0
+    assert np.all(st.track_ids >= 0)
+
+
+def test_detector_with_more_tracks_than_capacity():
+    from violation.detector import ViolationDetector
+    from violation.zones import Zone, ZoneSet
+
+    zones = ZoneSet([Zone(0, [(0, 0), (1000, 0), (1000, 1000), (0, 1000)], dwell=2.)], (1000, 1000))
+    detector = ViolationDetector(zones, capacity=3, check_interval=1., inset=0)
+    outputs = np.array([(100 * k, 100, 100 * k + 50, 200, k + 1, 2, 0.9) for k in range(5)])  # 5 parked cars
+    events = [e for t in range(5) for e in detector.update(outputs, float(t))]
+    assert len(events) == 3  # the held tracks are reported, the others are skipped instead of evicting them
+    assert {e.track_id for e in events} == {1, 2, 3}
+    assert detector.state.evictions == 0 and detector.state.skips == 2 * 5
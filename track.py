@@ -9,6 +9,8 @@ os.environ["VECLIB_MAXIMUM_THREADS"] = "1"
 os.environ["NUMEXPR_NUM_THREADS"] = "1"
 
 import sys
+import time
+STARTUP = time.perf_counter()  # the startup breakdown includes the imports
 import numpy as np
 from pathlib import Path
 import torch
@@ -29,12 +31,20 @@ ROOT = Path(os.path.relpath(ROOT, Path.cwd()))  # relative
 import logging
 from yolov5.models.common import DetectMultiBackend
 from yolov5.utils.dataloaders import VID_FORMATS, LoadImages, LoadStreams
+from yolov5.utils.augmentations import letterbox
 from yolov5.utils.general import (LOGGER, check_img_size, non_max_suppression, scale_coords, check_requirements, cv2,
                                   check_imshow, xyxy2xywh, increment_path, strip_optimizer, colorstr, print_args, check_file)
 from yolov5.utils.torch_utils import select_device, time_sync
 from yolov5.utils.plots import Annotator, colors, save_one_box
 from strong_sort.utils.parser import get_config
 from strong_sort.strong_sort import StrongSORT
+from strong_sort.deep.shared_extractor import SharedExtractor
+from pipeline.stages import Pipeline, Stage
+from pipeline.batching import BatchAssembler, LatencyMeter
+from pipeline.stride import DetectionStride
+from pipeline.frames import CopyCounter, FramePool, LoadPooledVideo
+from pipeline.metrics import Metrics
+from pipeline.startup import StartupTimer, fixed_batch, load_models
 
 # remove duplicated stream handler to avoid duplicated logging
 logging.getLogger().removeHandler(logging.getLogger().handlers[0])
@@ -70,6 +80,19 @@ def run(
         hide_class=False,  # hide IDs
         half=False,  # use FP16 half-precision inference
         dnn=False,  # use OpenCV DNN for ONNX inference
+        pipeline=False,  # run decoding, detection and tracking on worker threads
+        queue_size=4,  # capacity of the queues between pipeline stages
+        queue_policy='block',  # full queue on live sources: block or drop-oldest
+        batch_size=0,  # frames per detector forward, 0 for one frame per source
+        batch_wait=0.01,  # maximum time in seconds a frame waits for its batch to fill (with --pipeline)
+        det_stride=1,  # run the detector every det_stride frames, coast the tracks in between
+        adaptive_stride=False,  # adapt the stride to the motion in the scene, up to det_stride
+        frame_pool=False,  # decode video files into a ring of preallocated frame buffers
+        metrics=None,  # file the stage latencies, queue depths and drops are exported to (*.json or Prometheus text)
+        metrics_interval=10.,  # seconds between metrics exports
+        model=None,  # loaded DetectMultiBackend shared between runs, instead of loading yolo_weights
+        extractor=None,  # ReID feature extractor shared between runs, instead of loading strong_sort_weights
+        model_cache=None,  # directory of TorchScript traces of the models, loaded instead of the weights (built on the first run)
 ):
 
     source = str(source)
@@ -91,28 +114,49 @@ def run(
     save_dir = increment_path(Path(project) / exp_name, exist_ok=exist_ok)  # increment run
     (save_dir / 'tracks' if save_txt else save_dir).mkdir(parents=True, exist_ok=True)  # make dir
 
-    # Load model
-    device = select_device(device)
-    model = DetectMultiBackend(yolo_weights, device=device, dnn=dnn, data=None, fp16=half)
+    # Load models, YOLOv5 and the ReID model concurrently
+    reid = None
+    if model is None:
+        startup = StartupTimer(STARTUP)
+        startup.mark('imports')
+        device = select_device(device)
+        streams = len(Path(source).read_text().rsplit()) if webcam and Path(source).is_file() else 1  # opened by LoadStreams
+        model, reid = load_models(yolo_weights, strong_sort_weights, device, imgsz, half, dnn, cache=model_cache, timer=startup,
+                                  batch=batch_size or streams)  # the batch size a cached trace is made for
+        startup.mark('models')
+    else:
+        startup = StartupTimer()  # models shared between runs, only this run's own startup is timed
+        device = model.device
     stride, names, pt = model.stride, model.names, model.pt
     imgsz = check_img_size(imgsz, s=stride)  # check image size
 
     # Dataloader
+    copies = CopyCounter()  # frames are shared read-only between stages, only the stages that draw copy them
     if webcam:
         show_vid = check_imshow()
         cudnn.benchmark = True  # set True to speed up constant image size inference
         dataset = LoadStreams(source, img_size=imgsz, stride=stride, auto=pt)
         nr_sources = len(dataset)
+    elif frame_pool and is_file:  # decode into preallocated buffers, enough for every frame the queues can hold
+        pool_size = 3 * (batch_size or 1) + (3 * queue_size + 2 if pipeline else 0) + 4
+        dataset = LoadPooledVideo(source, pool_size, counter=copies)
+        nr_sources = 1
     else:
+        if frame_pool:
+            LOGGER.warning('--frame-pool only applies to video files')
         dataset = LoadImages(source, img_size=imgsz, stride=stride, auto=pt)
         nr_sources = 1
     vid_path, vid_writer, txt_path = [None] * nr_sources, [None] * nr_sources, [None] * nr_sources
+    startup.mark('source')
 
     # initialize StrongSORT
     cfg = get_config()
-    cfg.merge_from_file(opt.config_strongsort)
+    cfg.merge_from_file(config_strongsort)
 
-    # Create as many strong sort instances as there are video sources
+    # Create as many strong sort instances as there are video sources, sharing one ReID model and forward pass
+    if extractor is None:
+        extractor = SharedExtractor(reid if reid is not None else StrongSORT.load_extractor(strong_sort_weights, device),
+                                    parties=nr_sources if pipeline else 1)
     strongsort_list = []
     for i in range(nr_sources):
         strongsort_list.append(
@@ -126,146 +170,246 @@ def run(
                 nn_budget=cfg.STRONGSORT.NN_BUDGET,
                 mc_lambda=cfg.STRONGSORT.MC_LAMBDA,
                 ema_alpha=cfg.STRONGSORT.EMA_ALPHA,
-
+                roi_align=cfg.STRONGSORT.ROI_ALIGN,
+                reuse_refresh=cfg.STRONGSORT.REUSE_REFRESH,
+                reuse_iou=cfg.STRONGSORT.REUSE_IOU,
+                reuse_speed=cfg.STRONGSORT.REUSE_SPEED,
+                lazy_reid=cfg.STRONGSORT.LAZY_REID,
+                lazy_refresh=cfg.STRONGSORT.LAZY_REFRESH,
+                extractor=extractor,
             )
         )
     outputs = [None] * nr_sources
+    startup.mark('StrongSORT')
 
     # Run tracking
-    model.warmup(imgsz=(1 if pt else nr_sources, 3, *imgsz))  # warmup
+    batch_size = batch_size or (nr_sources if webcam else 1)  # frames per detector forward
+    fixed = fixed_batch(model, batch_size)  # None if the model takes partial batches
+    model.warmup(imgsz=(batch_size, 3, *imgsz))  # warmup
+    startup.mark('warmup')
     dt, seen = [0.0, 0.0, 0.0, 0.0], 0
     curr_frames, prev_frames = [None] * nr_sources, [None] * nr_sources
-    for frame_idx, (path, im, im0s, vid_cap, s) in enumerate(dataset):
-        t1 = time_sync()
-        im = torch.from_numpy(im).to(device)
-        im = im.half() if half else im.float()  # uint8 to fp16/32
-        im /= 255.0  # 0 - 255 to 0.0 - 1.0
-        if len(im.shape) == 3:
-            im = im[None]  # expand for batch dim
-        t2 = time_sync()
-        dt[0] += t2 - t1
-
-        # Inference
-        visualize = increment_path(save_dir / Path(path[0]).stem, mkdir=True) if visualize else False
-        pred = model(im, augment=augment, visualize=visualize)
-        t3 = time_sync()
-        dt[1] += t3 - t2
-
-        # Apply NMS
-        pred = non_max_suppression(pred, conf_thres, iou_thres, classes, agnostic_nms, max_det=max_det)
-        dt[2] += time_sync() - t3
-
-        # Process detections
-        for i, det in enumerate(pred):  # detections per image
-            seen += 1
+    # run the detector every det_stride frames of a source and coast its tracks on Kalman predictions in between
+    strides = [DetectionStride(det_stride, adaptive=adaptive_stride) for _ in range(nr_sources)]
+    # latency distribution of every stage and source, queue depths and drops, exported every metrics_interval seconds
+    stats = Metrics(metrics, interval=metrics_interval, prefix='track')
+
+    def read():  # split the dataloader batches into one frame per source
+        for frame_idx, (t_decode, (path, im, im0s, vid_cap, s)) in enumerate(Metrics.timed(dataset)):
+            t_capture = time.monotonic()
+            for i in range(nr_sources):
+                stats.observe('decode', i, t_decode)
             if webcam:  # nr_sources >= 1
-                p, im0, _ = path[i], im0s[i].copy(), dataset.count
-                p = Path(p)  # to Path
-                s += f'{i}: '
-                txt_file_name = p.name
-                save_path = str(save_dir / p.name)  # im.jpg, vid.mp4, ...
+                for i in range(nr_sources):
+                    yield i, frame_idx, Path(path[i]), im[i], FramePool.view(im0s[i]), vid_cap, s + f'{i}: ', t_capture
             else:
-                p, im0, _ = path, im0s.copy(), getattr(dataset, 'frame', 0)
-                p = Path(p)  # to Path
-                # video file
-                if source.endswith(VID_FORMATS):
-                    txt_file_name = p.stem
-                    save_path = str(save_dir / p.name)  # im.jpg, vid.mp4, ...
-                # folder with imgs
-                else:
-                    txt_file_name = p.parent.name  # get folder name containing current img
-                    save_path = str(save_dir / p.parent.name)  # im.jpg, vid.mp4, ...
-            curr_frames[i] = im0
-
-            txt_path = str(save_dir / 'tracks' / txt_file_name)  # im.txt
-            s += '%gx%g ' % im.shape[2:]  # print string
-            imc = im0.copy() if save_crop else im0  # for save_crop
-
-            annotator = Annotator(im0, line_width=2, pil=not ascii)
-            if cfg.STRONGSORT.ECC:  # camera motion compensation
-                strongsort_list[i].tracker.camera_update(prev_frames[i], curr_frames[i])
-
-            if det is not None and len(det):
-                # Rescale boxes from img_size to im0 size
-                det[:, :4] = scale_coords(im.shape[2:], det[:, :4], im0.shape).round()
-
-                # Print results
-                for c in det[:, -1].unique():
-                    n = (det[:, -1] == c).sum()  # detections per class
-                    s += f"{n} {names[int(c)]}{'s' * (n > 1)}, "  # add to string
-
-                xywhs = xyxy2xywh(det[:, 0:4])
-                confs = det[:, 4]
-                clss = det[:, 5]
-
-                # pass detections to strongsort
-                t4 = time_sync()
-                outputs[i] = strongsort_list[i].update(xywhs.cpu(), confs.cpu(), clss.cpu(), im0)
-                t5 = time_sync()
-                dt[3] += t5 - t4
-
-                # draw boxes for visualization
-                if len(outputs[i]) > 0:
-                    for j, (output, conf) in enumerate(zip(outputs[i], confs)):
-    
-                        bboxes = output[0:4]
-                        id = output[4]
-                        cls = output[5]
-
-                        if save_txt:
-                            # to MOT format
-                            bbox_left = output[0]
-                            bbox_top = output[1]
-                            bbox_w = output[2] - output[0]
-                            bbox_h = output[3] - output[1]
-                            # Write MOT compliant results to file
-                            with open(txt_path + '.txt', 'a') as f:
-                                f.write(('%g ' * 10 + '\n') % (frame_idx + 1, id, bbox_left,  # MOT format
-                                                               bbox_top, bbox_w, bbox_h, -1, -1, -1, i))
-
-                        if save_vid or save_crop or show_vid:  # Add bbox to image
-                            c = int(cls)  # integer class
-                            id = int(id)  # integer id
-                            label = None if hide_labels else (f'{id} {names[c]}' if hide_conf else \
-                                (f'{id} {conf:.2f}' if hide_class else f'{id} {names[c]} {conf:.2f}'))
-                            annotator.box_label(bboxes, label, color=colors(c, True))
-                            if save_crop:
-                                txt_file_name = txt_file_name if (isinstance(path, list) and len(path) > 1) else ''
-                                save_one_box(bboxes, imc, file=save_dir / 'crops' / txt_file_name / names[c] / f'{id}' / f'{p.stem}.jpg', BGR=True)
-
-                LOGGER.info(f'{s}Done. YOLO:({t3 - t2:.3f}s), StrongSORT:({t5 - t4:.3f}s)')
-
+                yield 0, frame_idx, Path(path), im, FramePool.view(im0s), vid_cap, s, t_capture
+
+    def letterboxed(frame):  # the frame pool only decodes, letterbox the frames that are inferred
+        if frame[3] is not None:
+            return frame[3]
+        return np.ascontiguousarray(letterbox(frame[4], imgsz, stride=stride, auto=pt)[0].transpose((2, 0, 1))[::-1])
+
+    def detect(batch):  # decide which frames are inferred, pre-process, one batched inference and NMS, split into one item per source
+        # the stride decides here rather than in read(), so without --pipeline the decision and the feedback of the
+        # tracker (strides[i].update) run on the same thread, in frame order
+        batch = [(*frame, strides[frame[0]].step()) for frame in batch]
+        run = [frame for frame in batch if frame[-1]]  # frames skipped by the detection stride are not inferred
+        pred, t_yolo = [], 0.
+        if len(run):
+            t1 = time_sync()
+            if len(run) == 1:  # no batch copy for a single frame
+                im = letterboxed(run[0])[None]
+            else:
+                im = np.stack([letterboxed(frame) for frame in run])
+                copies.add(im.nbytes)
+            if fixed is not None and len(run) < fixed:  # models exported for a fixed batch size
+                im = np.concatenate((im, np.zeros((fixed - len(run), *im.shape[1:]), dtype=im.dtype)))
+            im = torch.from_numpy(im).to(device)
+            im = im.half() if half else im.float()  # uint8 to fp16/32
+            im /= 255.0  # 0 - 255 to 0.0 - 1.0
+            t2 = time_sync()
+            dt[0] += t2 - t1
+
+            # Inference
+            visualize_path = increment_path(save_dir / run[0][2].stem, mkdir=True) if visualize else False
+            pred = model(im, augment=augment, visualize=visualize_path)
+            t3 = time_sync()
+            dt[1] += t3 - t2
+            t_yolo = t3 - t2
+
+            # Apply NMS
+            pred = non_max_suppression(pred, conf_thres, iou_thres, classes, agnostic_nms, max_det=max_det)
+            t4 = time_sync()
+            dt[2] += t4 - t3
+            for frame in run:  # the batch timings count for every frame of the batch
+                stats.observe('preprocess', frame[0], t2 - t1)
+                stats.observe('inference', frame[0], t3 - t2)
+                stats.observe('nms', frame[0], t4 - t3)
+
+        frames, pred = [], iter(pred)
+        for i, frame_idx, p, _, im0, vid_cap, s, t_capture, detected in batch:
+            det = None  # skipped by the detector
+            if detected:
+                det = next(pred)  # detections per image
+                s += '%gx%g ' % im.shape[2:]  # print string
+                if len(det):
+                    # Rescale boxes from img_size to im0 size
+                    det[:, :4] = scale_coords(im.shape[2:], det[:, :4], im0.shape).round()
+            frames.append((frame_idx, i, p, im0, det, vid_cap, s, t_yolo, t_capture))
+        return frames
+
+    def track(item):  # StrongSORT update, MOT results and drawing for one source
+        frame_idx, i, p, im0, det, vid_cap, s, t_yolo, t_capture = item
+        if webcam:  # nr_sources >= 1
+            txt_file_name = p.name
+            save_path = str(save_dir / p.name)  # im.jpg, vid.mp4, ...
+        else:
+            # video file
+            if source.endswith(VID_FORMATS):
+                txt_file_name = p.stem
+                save_path = str(save_dir / p.name)  # im.jpg, vid.mp4, ...
+            # folder with imgs
             else:
-                strongsort_list[i].increment_ages()
-                LOGGER.info('No detections')
-
-            # Stream results
-            im0 = annotator.result()
-            if show_vid:
-                cv2.imshow(str(p), im0)
-                cv2.waitKey(1)  # 1 millisecond
-
-            # Save results (image with detections)
-            if save_vid:
-                if vid_path[i] != save_path:  # new video
-                    vid_path[i] = save_path
-                    if isinstance(vid_writer[i], cv2.VideoWriter):
-                        vid_writer[i].release()  # release previous video writer
-                    if vid_cap:  # video
-                        fps = vid_cap.get(cv2.CAP_PROP_FPS)
-                        w = int(vid_cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-                        h = int(vid_cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-                    else:  # stream
-                        fps, w, h = 30, im0.shape[1], im0.shape[0]
-                    save_path = str(Path(save_path).with_suffix('.mp4'))  # force *.mp4 suffix on results videos
-                    vid_writer[i] = cv2.VideoWriter(save_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (w, h))
-                vid_writer[i].write(im0)
-
-            prev_frames[i] = curr_frames[i]
+                txt_file_name = p.parent.name  # get folder name containing current img
+                save_path = str(save_dir / p.parent.name)  # im.jpg, vid.mp4, ...
+        curr_frames[i] = im0
+
+        txt_path = str(save_dir / 'tracks' / txt_file_name)  # im.txt
+        draw = save_vid or show_vid
+        annotator = Annotator(copies.copy(im0) if draw else im0, line_width=2, pil=not ascii)  # im0 is read-only
+        if cfg.STRONGSORT.ECC:  # camera motion compensation
+            strongsort_list[i].tracker.camera_update(prev_frames[i], curr_frames[i])
+
+        t_track = 0.
+        if det is None:  # no detector run on this frame: advance the tracks and report their predicted boxes
+            outputs[i] = strongsort_list[i].coast(im0)
+            LOGGER.info(f'{s}Coasting {len(outputs[i])} tracks')
+        elif len(det):
+            # Print results
+            for c in det[:, -1].unique():
+                n = (det[:, -1] == c).sum()  # detections per class
+                s += f"{n} {names[int(c)]}{'s' * (n > 1)}, "  # add to string
+
+            xywhs = xyxy2xywh(det[:, 0:4])
+            confs = det[:, 4]
+            clss = det[:, 5]
+
+            # pass detections to strongsort
+            t4 = time_sync()
+            outputs[i] = strongsort_list[i].update(xywhs.cpu(), confs.cpu(), clss.cpu(), im0)
+            t5 = time_sync()
+            t_track = t5 - t4
+            for stage, seconds in strongsort_list[i].timings.items():  # reid, kalman and association
+                stats.observe(stage, i, seconds)
+            strides[i].update(strongsort_list[i].tracker.speeds(), strongsort_list[i].tracker.unmatched_detections)
+            LOGGER.info(f'{s}Done. YOLO:({t_yolo:.3f}s), StrongSORT:({t_track:.3f}s)')
+        else:
+            strongsort_list[i].increment_ages()
+            outputs[i] = []
+            strides[i].update([], 0)
+            LOGGER.info('No detections')
+
+        # draw boxes for visualization
+        t_render = time.perf_counter()
+        for j, output in enumerate(outputs[i]):
+
+            bboxes = output[0:4]
+            id = output[4]
+            cls = output[5]
+            conf = output[6]
+
+            if save_txt:
+                # to MOT format
+                bbox_left = output[0]
+                bbox_top = output[1]
+                bbox_w = output[2] - output[0]
+                bbox_h = output[3] - output[1]
+                # Write MOT compliant results to file
+                with open(txt_path + '.txt', 'a') as f:
+                    f.write(('%g ' * 10 + '\n') % (frame_idx + 1, id, bbox_left,  # MOT format
+                                                   bbox_top, bbox_w, bbox_h, -1, -1, -1, i))
+
+            if draw or save_crop:  # Add bbox to image
+                c = int(cls)  # integer class
+                id = int(id)  # integer id
+                if draw:
+                    label = None if hide_labels else (f'{id} {names[c]}' if hide_conf else \
+                        (f'{id} {conf:.2f}' if hide_class else f'{id} {names[c]} {conf:.2f}'))
+                    annotator.box_label(bboxes, label, color=colors(c, True))
+                if save_crop:  # crops come from the undrawn frame
+                    txt_file_name = txt_file_name if nr_sources > 1 else ''
+                    save_one_box(bboxes, im0, file=save_dir / 'crops' / txt_file_name / names[c] / f'{id}' / f'{p.stem}.jpg', BGR=True)
+
+        stats.observe('render', i, time.perf_counter() - t_render)  # drawing, MOT results and crops
+        if isinstance(dataset, LoadPooledVideo) and prev_frames[i] is not None:  # last read by this frame's ECC
+            dataset.pool.release(prev_frames[i])  # the decoder can reuse its buffer, only drawn copies are read later
+        prev_frames[i] = curr_frames[i]
+        return i, p, annotator.result(), save_path, vid_cap, t_track, t_capture
+
+    # Frames of all sources are batched for one detector forward, the detections go to the tracker of each source.
+    # Decoding (dataloader), detection and tracking overlap on worker threads with --pipeline, one tracking
+    # worker per source keeps the frames of every source in order; results are shown and saved on this thread
+    assembler = BatchAssembler(batch_size, max_wait=batch_wait, unique=webcam,  # frames of a pooled video share one shape
+                               group=None if isinstance(dataset, LoadPooledVideo) else lambda frame: frame[3].shape,
+                               threaded=pipeline)  # the serial path reads the source on this thread
+    latency = LatencyMeter(nr_sources)
+    pipe = Pipeline(assembler(read()), [Stage('detect', detect, split=True),
+                                        Stage('track', track, workers=nr_sources, key=lambda item: item[1])],
+                    maxsize=queue_size, policy=queue_policy if webcam else 'block', threaded=pipeline)
+    for i, p, im0, save_path, vid_cap, t_track, t_capture in pipe:
+        seen += 1
+        dt[3] += t_track
+        t_write = time.perf_counter()
+        if seen == 1 and reid is not None:  # the startup of a process, not of a run sharing loaded models
+            startup.mark('first frame')
+            LOGGER.info(startup.summary())
+
+        # Stream results
+        if show_vid:
+            cv2.imshow(str(p), im0)
+            cv2.waitKey(1)  # 1 millisecond
+
+        # Save results (image with detections)
+        if save_vid:
+            if vid_path[i] != save_path:  # new video
+                vid_path[i] = save_path
+                if isinstance(vid_writer[i], cv2.VideoWriter):
+                    vid_writer[i].release()  # release previous video writer
+                if vid_cap:  # video
+                    fps = vid_cap.get(cv2.CAP_PROP_FPS)
+                    w = int(vid_cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+                    h = int(vid_cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+                else:  # stream
+                    fps, w, h = 30, im0.shape[1], im0.shape[0]
+                save_path = str(Path(save_path).with_suffix('.mp4'))  # force *.mp4 suffix on results videos
+                vid_writer[i] = cv2.VideoWriter(save_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (w, h))
+            vid_writer[i].write(im0)
+        if show_vid or save_vid:
+            stats.observe('write', i, time.perf_counter() - t_write)
+        latency.update(i, t_capture)
+        stats.observe('latency', i, time.monotonic() - t_capture)  # end to end, from the dataloader to the output
+        for stage, depth in pipe.depths().items():
+            stats.gauge('queue_depth', depth, stage=stage)
+        stats.gauge('dropped_frames', pipe.dropped)
+        stats.maybe_export()
+    if pipe.dropped:
+        LOGGER.warning(f'{pipe.dropped} frames dropped by the {pipe.policy} queue policy')
+    stats.export()
 
     # Print results
     t = tuple(x / seen * 1E3 for x in dt)  # speeds per image
     LOGGER.info(f'Speed: %.1fms pre-process, %.1fms inference, %.1fms NMS, %.1fms strong sort update per image at shape {(1, 3, *imgsz)}' % t)
+    LOGGER.info(f'Batch size {batch_size} (mean {assembler.mean_batch_size:.1f}): {latency.summary()}')
+    LOGGER.info(f'Stage latency {stats.summary()}' + (f', exported to {metrics}' if metrics else ''))
+    LOGGER.info(f'Frame copies: {copies.per_frame(seen) / 1E6:.2f}MB per frame' +
+                (f', {dataset.pool.waits} waits for a free frame buffer' if isinstance(dataset, LoadPooledVideo) else ''))
+    if cfg.STRONGSORT.REUSE_REFRESH or cfg.STRONGSORT.LAZY_REID:
+        LOGGER.info('ReID model ran on ' + ', '.join(f'source {i}: {ss.reid_rate:.0%} ({ss.reuse_rate:.0%} reused)' for i, ss in enumerate(strongsort_list)) + ' of the detections')
+    if isinstance(extractor, SharedExtractor) and extractor.forwards:
+        LOGGER.info(f'ReID forward passes: {extractor.forwards}, {extractor.calls_per_forward:.1f} tracker calls per pass')
+    if det_stride > 1:
+        LOGGER.info('Detector ran on ' + ', '.join(f'source {i}: {st.ratio:.0%}' for i, st in enumerate(strides)) + ' of the frames')
     if save_txt or save_vid:
         s = f"\n{len(list(save_dir.glob('tracks/*.txt')))} tracks saved to {save_dir / 'tracks'}" if save_txt else ''
         LOGGER.info(f"Results saved to {colorstr('bold', save_dir)}{s}")
@@ -305,6 +449,17 @@ def parse_opt():
     parser.add_argument('--hide-class', default=False, action='store_true', help='hide IDs')
     parser.add_argument('--half', action='store_true', help='use FP16 half-precision inference')
     parser.add_argument('--dnn', action='store_true', help='use OpenCV DNN for ONNX inference')
+    parser.add_argument('--pipeline', action='store_true', help='run decoding, detection and tracking on worker threads')
+    parser.add_argument('--queue-size', type=int, default=4, help='capacity of the queues between pipeline stages')
+    parser.add_argument('--queue-policy', default='block', choices=Pipeline.POLICIES, help='full queue on live sources')
+    parser.add_argument('--batch-size', type=int, default=0, help='frames per detector forward, 0 for one frame per source')
+    parser.add_argument('--batch-wait', type=float, default=0.01, help='maximum time in seconds a frame waits for its batch, with --pipeline')
+    parser.add_argument('--det-stride', type=int, default=1, help='run the detector every N frames, coast the tracks in between')
+    parser.add_argument('--adaptive-stride', action='store_true', help='adapt the stride to the motion in the scene, up to --det-stride')
+    parser.add_argument('--frame-pool', action='store_true', help='decode video files into a ring of preallocated frame buffers')
+    parser.add_argument('--metrics', type=str, default=None, help='export stage latencies, queue depths and drops to this *.json or Prometheus text file')
+    parser.add_argument('--metrics-interval', type=float, default=10., help='seconds between metrics exports')
+    parser.add_argument('--model-cache', type=str, default=None, help='load the models from TorchScript traces in this directory, traced on the first run')
     opt = parser.parse_args()
     opt.imgsz *= 2 if len(opt.imgsz) == 1 else 1  # expand
     print_args(vars(opt))
@@ -312,7 +467,9 @@ def parse_opt():
 
 
 def main(opt):
-    check_requirements(requirements=ROOT / 'requirements.txt', exclude=('tensorboard', 'thop'))
+    weights = opt.yolo_weights if isinstance(opt.yolo_weights, list) else [opt.yolo_weights]
+    if not all(Path(w).is_file() for w in [*weights, opt.strong_sort_weights]):  # the check only matters before a download
+        check_requirements(requirements=ROOT / 'requirements.txt', exclude=('tensorboard', 'thop'))
     run(**vars(opt))
 
 
@@ -0,0 +1,9 @@
+from .zones import ZoneMask, Zone, ZoneSet, load_zones
+from .clock import StreamClock, Ticker
+from .state import TrackStateStore
+from .detector import ViolationDetector, ViolationEvent
+from .render import ViolationRenderer
+
+
+__all__ = ['ZoneMask', 'Zone', 'ZoneSet', 'load_zones', 'StreamClock', 'Ticker', 'TrackStateStore',
+           'ViolationDetector', 'ViolationEvent', 'ViolationRenderer']
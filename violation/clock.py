@@ -0,0 +1,86 @@
+import math
+import time
+from datetime import datetime
+
+import cv2
+
+
+class StreamClock(object):
+    """
+    Timestamps of frames in seconds of stream time.
+
+    Recorded video is timed by the container presentation timestamp when the
+    capture backend reports one and by `frame_idx / fps` otherwise, so dwell
+    times do not depend on how fast the video is processed. Live sources are
+    timed by a monotonic clock started at their first frame.
+
+    Parameters
+    ----------
+    fps : float
+        Nominal frame rate of the source, may be fractional (e.g. 29.97).
+    live : bool
+        True for webcams and network streams.
+
+    """
+
+    def __init__(self, fps, live=False):
+        self.fps = float(fps) if fps and fps > 0 else 30.
+        self.live = live
+        self._t0 = None
+        self._wall0 = None
+
+    def __call__(self, frame_idx, vid_cap=None):
+        """Get the timestamp (seconds) of a frame.
+
+        Parameters
+        ----------
+        frame_idx : int
+            Zero based index of the frame in the stream.
+        vid_cap : Optional[cv2.VideoCapture]
+            The capture the frame was read from, if any.
+
+        """
+        if self.live:
+            now = time.monotonic()
+            if self._t0 is None:
+                self._t0, self._wall0 = now, time.time()
+            return now - self._t0
+        if vid_cap is not None:
+            msec = vid_cap.get(cv2.CAP_PROP_POS_MSEC)
+            if msec and msec > 0:
+                return msec / 1E3
+        return frame_idx / self.fps
+
+    def strftime(self, t):
+        """Format a timestamp for reports: wall time for live sources, offset into the recording otherwise."""
+        if self.live and self._wall0 is not None:
+            return datetime.fromtimestamp(self._wall0 + t).strftime('%Y-%m-%d %H:%M:%S')
+        m, s = divmod(t, 60)
+        h, m = divmod(int(m), 60)
+        return f'{h:02d}:{m:02d}:{s:05.2f}'
+
+
+class Ticker(object):
+    """
+    Fires on the first frame of every `interval` seconds of stream time.
+
+    Unlike `frame_idx % fps == 0` this also works for fractional frame rates
+    and for sources that drop frames.
+
+    Attributes
+    ----------
+    count : int
+        Index of the last fired tick, -1 before the first one.
+
+    """
+
+    def __init__(self, interval=1.):
+        self.interval = interval
+        self.count = -1
+
+    def __call__(self, t):
+        tick = math.floor(t / self.interval + 1E-6)
+        if tick > self.count:
+            self.count = tick
+            return True
+        return False
@@ -0,0 +1,138 @@
+from collections import namedtuple
+
+import numpy as np
+
+from .clock import Ticker
+from .state import TrackStateStore
+
+
+ViolationEvent = namedtuple('ViolationEvent', ['track_id', 'class_id', 'zone_id', 'start', 'dwell', 'box'])
+ViolationEvent.__doc__ = """A vehicle that stood still in a zone for longer than its dwell limit.
+
+`start` is the stream time (seconds) the vehicle stopped, `dwell` the number
+of seconds it had been standing when reported and `box` its `(x1, y1, x2, y2)`
+box at that moment.
+"""
+
+
+class ViolationDetector(object):
+    """
+    Turns the tracks of one stream into illegal parking events.
+
+    Once every `check_interval` seconds of stream time the bottom edge of
+    every track is tested against the zones. A track whose box moved by at
+    most `immobile_tolerance` pixels (sum over the four coordinates) since its
+    previous check is stationary; when it has been stationary for longer than
+    the dwell limit of its zone it is reported once. Streams processed at less
+    than one frame per interval skip checks, so the previous check of a track
+    may be up to `max_gap` checks back.
+
+    Parameters
+    ----------
+    zones : violation.zones.ZoneSet
+        The zones of the stream.
+    capacity : int
+        Maximum number of tracks with state, see `TrackStateStore`.
+    check_interval : float
+        Seconds of stream time between two checks.
+    immobile_tolerance : float
+        Maximum box displacement between two checks of a stationary track.
+    inset : int
+        Number of pixels the box bottom edge is shrunk by on each side.
+    dwell : Optional[float]
+        Dwell limit for all zones, overriding the configured ones.
+    max_gap : int
+        Maximum number of check intervals between two checks of a track that
+        are compared for motion.
+
+    Attributes
+    ----------
+    state : TrackStateStore
+        Per track state.
+    dwelling : List[(int, int, float, float)]
+        `(track_id, class_id, start, dwell)` of the stationary tracks not yet
+        reported, as of the last check.
+    in_zone : int
+        Number of tracks inside a zone at the last check.
+    out_zone : int
+        Number of other tracks at the last check.
+
+    """
+
+    def __init__(self, zones, capacity=1024, check_interval=1., immobile_tolerance=50, inset=25, dwell=None,
+                 max_gap=3):
+        self.zones = zones
+        self.state = TrackStateStore(capacity)
+        self.ticker = Ticker(check_interval)
+        self.immobile_tolerance = immobile_tolerance
+        self.inset = inset
+        self.dwells = zones.dwells if dwell is None else np.full(len(zones), float(dwell))
+        self.max_gap = max_gap
+        self.dwelling = []
+        self.in_zone = 0
+        self.out_zone = 0
+
+    def update(self, outputs, t):
+        """Process the tracks of one frame.
+
+        Parameters
+        ----------
+        outputs : ndarray
+            The `StrongSORT.update()` output, an Nx7 array of
+            `(x1, y1, x2, y2, track_id, class_id, conf)` rows.
+        t : float
+            Stream time of the frame in seconds.
+
+        Returns
+        -------
+        List[ViolationEvent]
+            The violations detected at this frame.
+
+        """
+        if not self.ticker(t):
+            return []
+        tick = self.ticker.count
+        outputs = np.asarray(outputs, dtype=np.float64).reshape(-1, 7)
+        zone_idx = self.zones.assign(outputs[:, :4], self.inset)
+        rows = np.flatnonzero(zone_idx >= 0)
+        self.in_zone, self.out_zone = len(rows), len(outputs) - len(rows)
+        self.dwelling = []
+        if not len(rows):
+            return []
+
+        st = self.state
+        slots = [st.slot(tid, cid, t) for tid, cid in outputs[rows, 4:6]]
+        rows = rows[[s is not None for s in slots]]  # tracks beyond the capacity are not checked this time
+        slots = np.array([s for s in slots if s is not None], dtype=np.int64)
+        boxes = outputs[rows, :4]
+        has_prev = (st.box_ticks[slots] >= 0) & (tick - st.box_ticks[slots] <= self.max_gap)
+        still = has_prev & (np.abs(boxes - st.boxes[slots]).sum(axis=1) <= self.immobile_tolerance)
+        st.stationary_since[slots[has_prev & ~still]] = np.nan  # moved, restart the timer
+        starting = still & np.isnan(st.stationary_since[slots])
+        st.stationary_since[slots[starting]] = t
+        st.boxes[slots], st.box_ticks[slots] = boxes, tick
+
+        pending = still & ~st.violated[slots]
+        dwell = t - st.stationary_since[slots]
+        fired = pending & (dwell > self.dwells[zone_idx[rows]])
+        st.violated[slots[fired]] = True
+        st.dwell[slots[fired]] = dwell[fired]
+
+        self.dwelling = [(int(st.track_ids[s]), int(st.class_ids[s]), float(st.stationary_since[s]), float(d))
+                         for s, d in zip(slots[pending], dwell[pending])]
+        return [ViolationEvent(int(st.track_ids[s]), int(st.class_ids[s]), self.zones[z].zone_id,
+                               float(st.stationary_since[s]), float(d), b.copy())
+                for s, z, d, b in zip(slots[fired], zone_idx[rows][fired], dwell[fired], boxes[fired])]
+
+    def release(self, track_ids):
+        """Drop the state of tracks deleted by the tracker."""
+        self.state.release(track_ids)
+
+    def violations(self):
+        """Get `(track_id, class_id, dwell)` of the reported tracks still alive."""
+        return self.state.violations()
+
+    @property
+    def activity(self):
+        """Tracks inside a zone count fully, the others a quarter."""
+        return self.in_zone + 0.25 * self.out_zone
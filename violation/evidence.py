@@ -0,0 +1,151 @@
+import atexit
+import logging
+import queue
+import threading
+from pathlib import Path
+
+import cv2
+import xlwt
+
+
+class EvidenceWriter(object):
+    """
+    Writes violation evidence on a worker thread.
+
+    The frame loop only enqueues a report row and, optionally, the image crop
+    of the vehicle; JPEG encoding, the `details.xls` report and the log
+    records are handled by the worker. The report is saved whenever the queue
+    runs empty and when the writer is closed. Pending evidence is flushed on
+    `close()`, which is also registered to run at interpreter exit.
+
+    Parameters
+    ----------
+    save_dir : str | Path
+        Directory the report and the crops are written to.
+    maxsize : int
+        Maximum number of pending events.
+    policy : str
+        What to do when the queue is full: 'block' waits for the worker,
+        'drop-newest' discards the new event and 'drop-oldest' discards the
+        oldest pending one.
+    logger : Optional[logging.Logger]
+        Logger for the violation records.
+
+    Attributes
+    ----------
+    written : int
+        Number of events written.
+    dropped : int
+        Number of events discarded by the backpressure policy.
+
+    """
+
+    POLICIES = ('block', 'drop-newest', 'drop-oldest')
+
+    def __init__(self, save_dir, maxsize=64, policy='block', logger=None):
+        if policy not in self.POLICIES:
+            raise ValueError(f'Invalid backpressure policy {policy}; must be one of {self.POLICIES}')
+        self.save_dir = Path(save_dir)
+        self.policy = policy
+        self.logger = logger or logging.getLogger(__name__)
+        self.written = 0
+        self.dropped = 0
+
+        self._workbook = xlwt.Workbook()
+        self._sheet = self._workbook.add_sheet("Sheet1")
+        self._style = xlwt.easyxf('font: bold 1')
+        self._rows = 0
+
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._closed = False
+        self._stop = threading.Event()  # a flag rather than a queued sentinel, which drop-oldest could discard
+        self._thread = threading.Thread(target=self._run, name='evidence-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, row, name=None, crop=None):
+        """Enqueue one violation.
+
+        Parameters
+        ----------
+        row : Sequence[str]
+            Cells of the report row.
+        name : Optional[str]
+            File stem of the crop.
+        crop : Optional[ndarray]
+            BGR image of the vehicle. It must not be modified afterwards, pass
+            a copy if the frame buffer is reused.
+
+        Returns
+        -------
+        bool
+            False if the event was dropped, or the writer is closed.
+
+        """
+        if self._closed:
+            return False
+        item = (tuple(str(c) for c in row), name, crop)
+        if self.policy == 'block':
+            self._queue.put(item)
+            return True
+        with self._lock:
+            while True:
+                try:
+                    self._queue.put_nowait(item)
+                    return True
+                except queue.Full:
+                    self.dropped += 1
+                    if self.policy == 'drop-newest':
+                        return False
+                    try:
+                        self._queue.get_nowait()
+                        self._queue.task_done()
+                    except queue.Empty:
+                        pass
+
+    def close(self):
+        """Flush all pending evidence and stop the worker."""
+        if self._closed:
+            return
+        self._closed = True
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        dirty = False
+        while True:
+            try:
+                item = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                if self._stop.is_set():  # closed and flushed
+                    break
+                continue
+            try:
+                self._write(*item)
+                dirty = True
+            except Exception as e:
+                self.logger.warning(f'Failed to write violation evidence {item[0]}: {e}')
+            finally:
+                self._queue.task_done()
+            if dirty and self._queue.empty():
+                dirty = not self._save()
+        if dirty:
+            self._save()
+
+    def _write(self, row, name, crop):
+        for col, cell in enumerate(row):
+            self._sheet.write(self._rows, col, cell, self._style)
+        self._rows += 1
+        if name is not None and crop is not None and crop.size:
+            cv2.imwrite(str(self.save_dir / f'{name}.jpg'), crop)
+        self.written += 1
+        self.logger.info('Violation: ' + ' '.join(row))
+
+    def _save(self):
+        try:
+            self._workbook.save(str(self.save_dir / 'details.xls'))
+            return True
+        except Exception as e:
+            self.logger.warning(f'Failed to save violation report: {e}')
+            return False
@@ -0,0 +1,121 @@
+import cv2
+import numpy as np
+
+
+class ViolationRenderer(object):
+    """
+    Draws zones, track boxes and the violation banner onto frames.
+
+    The zone layer is composed once: only the bounding rectangle of all zones
+    is blended per frame, with a precomputed colour layer and mask. The banner
+    listing the reported vehicles is rendered into a small image that is only
+    rebuilt when the set of violations changes and is pasted otherwise.
+
+    Parameters
+    ----------
+    zones : violation.zones.ZoneSet
+        The zones to draw.
+    frame_shape : tuple
+        `(height, width, ...)` of the frames.
+    color : tuple
+        BGR colour of the zones and the banner text.
+    alpha : float
+        Opacity of the zone layer.
+    line_width : int
+        Thickness of the boxes.
+
+    """
+
+    def __init__(self, zones, frame_shape, color=(0, 0, 255), alpha=0.4, line_width=2):
+        self.alpha = alpha
+        self.color = color
+        self.line_width = line_width
+        self.font_scale = line_width / 3
+        self.font_thickness = max(line_width - 1, 1)
+
+        h, w = frame_shape[:2]
+        layer = np.zeros((h, w), dtype=np.uint8)
+        zones.paint(layer, 1)
+        ys, xs = np.nonzero(layer)
+        if len(ys):
+            self._rect = (xs.min(), ys.min(), xs.max() + 1, ys.max() + 1)
+            x0, y0, x1, y1 = self._rect
+            self._mask = layer[y0:y1, x0:x1].astype(bool)
+            self._layer = np.empty((y1 - y0, x1 - x0, 3), dtype=np.uint8)
+            self._layer[:] = color
+        else:
+            self._rect = None
+
+        self._banner_key = None
+        self._banner = None
+
+    def draw(self, im, bboxes, labels=None, colors=None, violations=()):
+        """Draw onto `im` in place.
+
+        Parameters
+        ----------
+        im : ndarray
+            BGR frame.
+        bboxes : array_like
+            An Nx4 (or wider) array of boxes `(x1, y1, x2, y2)`.
+        labels : Optional[List[str]]
+            Label per box, None for no labels.
+        colors : Optional[List[tuple]]
+            BGR colour per box.
+        violations : Sequence[str]
+            Text lines of the banner, one per reported vehicle.
+
+        Returns
+        -------
+        ndarray
+            The frame.
+
+        """
+        self._draw_zones(im)
+        self._draw_boxes(im, bboxes, labels, colors)
+        self._draw_banner(im, tuple(violations))
+        return im
+
+    def _draw_zones(self, im):
+        if self._rect is None:
+            return
+        x0, y0, x1, y1 = self._rect
+        roi = im[y0:y1, x0:x1]
+        blended = cv2.addWeighted(roi, 1 - self.alpha, self._layer, self.alpha, 0)
+        roi[self._mask] = blended[self._mask]
+
+    def _draw_boxes(self, im, bboxes, labels, colors):
+        if not len(bboxes):
+            return
+        boxes = np.asarray(bboxes)[:, :4].astype(np.int64)
+        colors = colors or [(255, 0, 0)] * len(boxes)
+        for k, (x1, y1, x2, y2) in enumerate(boxes.tolist()):
+            cv2.rectangle(im, (x1, y1), (x2, y2), colors[k], thickness=self.line_width, lineType=cv2.LINE_AA)
+            if labels and labels[k]:
+                (w, h), _ = cv2.getTextSize(labels[k], 0, self.font_scale, self.font_thickness)
+                outside = y1 - h - 3 >= 0
+                y_text = y1 - 2 if outside else y1 + h + 2
+                cv2.rectangle(im, (x1, y_text - h - 1), (x1 + w, y_text + 1), colors[k], -1, cv2.LINE_AA)
+                cv2.putText(im, labels[k], (x1, y_text), 0, self.font_scale, (255, 255, 255),
+                            thickness=self.font_thickness, lineType=cv2.LINE_AA)
+
+    def _draw_banner(self, im, lines):
+        if not lines:
+            return
+        if lines != self._banner_key:
+            self._banner_key = lines
+            self._banner = self._render_banner(lines, im.shape[1])
+        bh, bw = self._banner.shape[:2]
+        bh, bw = min(bh, im.shape[0] - 15), min(bw, im.shape[1] - 15)
+        im[15:15 + bh, 15:15 + bw] = self._banner[:bh, :bw]
+
+    def _render_banner(self, lines, max_width):
+        scale, thickness = self.font_scale * 1.5, self.font_thickness + 1
+        sizes = [cv2.getTextSize(line, 0, scale, thickness)[0] for line in lines]
+        line_h = max(h for _, h in sizes) + 10
+        width = min(max(w for w, _ in sizes) + 10, max_width)
+        banner = np.zeros((line_h * len(lines) + 5, width, 3), dtype=np.uint8)
+        for k, line in enumerate(lines):
+            cv2.putText(banner, line, (5, (k + 1) * line_h), 0, scale, self.color,
+                        thickness=thickness, lineType=cv2.LINE_AA)
+        return banner
@@ -0,0 +1,100 @@
+import io
+
+import numpy as np
+
+from .detector import ViolationDetector
+
+
+def load_tracks(path):
+    """Load a track file written with `--save-txt`.
+
+    Every row is `frame id left top width height conf class -1 source`, with
+    1-based frame numbers. Plain MOT files (comma or space separated, 6 to 9
+    columns) are accepted too: the class and the columns after it default to
+    -1 and the source to 0.
+
+    Returns
+    -------
+    ndarray
+        An Nx10 float array of the rows.
+
+    """
+    with open(path, 'r') as f:
+        text = f.read().replace(',', ' ')
+    if not text.strip():
+        return np.zeros((0, 10))
+    rows = np.loadtxt(io.StringIO(text), dtype=np.float64, ndmin=2)
+    if rows.shape[1] < 6:
+        raise ValueError(f'{path} has {rows.shape[1]} columns, expected at least frame id left top width height')
+    tracks = np.full((len(rows), 10), -1.)
+    tracks[:, 9] = 0  # single source
+    n = min(rows.shape[1], 10)
+    tracks[:, :n] = rows[:, :n]
+    return tracks
+
+
+def split_sources(tracks):
+    """Split the rows of a track file by their source column."""
+    sources = tracks[:, 9].astype(np.int64)
+    return {int(s): tracks[sources == s] for s in np.unique(sources)}
+
+
+def replay(tracks, zones, fps, class_id=-1, max_age=30, **kwargs):
+    """Run the violation logic over saved tracks of one source.
+
+    The detector is fed every frame from the first one on, like the live
+    loop, with the stream time `(frame - 1) / fps`. As the tracker deletes a
+    track after `max_age` missed frames, the state of a track is released
+    once it has been absent for more than `max_age` frames.
+
+    Parameters
+    ----------
+    tracks : ndarray
+        Rows of `load_tracks` belonging to one source.
+    zones : violation.zones.ZoneSet
+        The zones of the source.
+    fps : float
+        Frame rate of the recording.
+    class_id : int
+        Class of the tracks saved without one.
+    max_age : int
+        The `MAX_AGE` of the tracker the tracks were saved with.
+    **kwargs
+        Passed on to `ViolationDetector`.
+
+    Returns
+    -------
+    List[(float, ViolationEvent)]
+        The stream time each event fired at and the event.
+
+    """
+    detector = ViolationDetector(zones, **kwargs)
+    if not len(tracks):
+        return []
+    tracks = tracks[np.argsort(tracks[:, 0], kind='stable')]
+    frames = tracks[:, 0].astype(np.int64)
+    outputs = np.empty((len(tracks), 7))
+    outputs[:, :2] = tracks[:, 2:4]
+    outputs[:, 2:4] = tracks[:, 2:4] + tracks[:, 4:6]
+    outputs[:, 4] = tracks[:, 1]
+    outputs[:, 5] = np.where(tracks[:, 7] >= 0, tracks[:, 7], class_id)
+    outputs[:, 6] = tracks[:, 6]
+
+    # frame number each track is deleted at: max_age + 1 frames after its last row, or before a longer gap
+    order = np.lexsort((frames, tracks[:, 1]))
+    ids, last = tracks[order, 1], frames[order]
+    ends = (ids[1:] != ids[:-1]) | (last[1:] - last[:-1] > max_age + 1)
+    ends = np.append(ends, True)
+    deleted = {}
+    for track_id, f in zip(ids[ends], last[ends] + max_age + 1):
+        deleted.setdefault(int(f), []).append(int(track_id))
+
+    bounds = np.searchsorted(frames, np.arange(1, frames[-1] + 2))
+    events = []
+    for f in range(frames[-1]):
+        t = f / fps
+        if f + 1 in deleted:
+            detector.release(deleted[f + 1])
+        for e in detector.update(outputs[bounds[f]:bounds[f + 1]], t):
+            events.append((t, e))
+    return events
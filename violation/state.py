@@ -0,0 +1,129 @@
+import numpy as np
+
+
+class TrackStateStore(object):
+    """
+    Fixed-size violation state of the tracks of one stream.
+
+    Every track occupies one slot of preallocated arrays, addressed by its
+    integer track ID. Slots are released when the tracker deletes the track;
+    if the store is full anyway the least recently seen track is evicted, so
+    memory stays bounded on streams of any length. Tracks looked up at the
+    current time are never evicted: with more tracks in a frame than slots,
+    the extra tracks get no slot for that frame.
+
+    Parameters
+    ----------
+    capacity : int
+        Maximum number of tracks held at the same time.
+
+    Attributes
+    ----------
+    track_ids : ndarray
+        Track ID per slot, -1 for free slots.
+    class_ids : ndarray
+        Class ID per slot.
+    boxes : ndarray
+        Box `(x1, y1, x2, y2)` of the track at the last zone check.
+    box_ticks : ndarray
+        Check tick the box was recorded at, -1 if none.
+    stationary_since : ndarray
+        Stream time the track stopped moving, NaN while it moves.
+    violated : ndarray
+        True once the track has been reported.
+    dwell : ndarray
+        Dwell time (seconds) at the moment the track was reported.
+    last_seen : ndarray
+        Stream time the track was last looked up.
+    evictions : int
+        Number of tracks dropped because the store was full.
+    skips : int
+        Number of lookups left without a slot because every slot was in use
+        at that time.
+    releases : int
+        Number of tracks removed after the tracker deleted them.
+
+    """
+
+    def __init__(self, capacity=1024):
+        self.capacity = capacity
+        self.track_ids = np.full(capacity, -1, dtype=np.int64)
+        self.class_ids = np.zeros(capacity, dtype=np.int64)
+        self.boxes = np.zeros((capacity, 4), dtype=np.float32)
+        self.box_ticks = np.full(capacity, -1, dtype=np.int64)
+        self.stationary_since = np.full(capacity, np.nan)
+        self.violated = np.zeros(capacity, dtype=bool)
+        self.dwell = np.zeros(capacity)
+        self.last_seen = np.full(capacity, -np.inf)
+        self.evictions = 0
+        self.skips = 0
+        self.releases = 0
+        self._slots = {}
+        self._free = list(range(capacity - 1, -1, -1))
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, track_id):
+        return int(track_id) in self._slots
+
+    def get(self, track_id):
+        """Get the slot of a track, None if it is not stored."""
+        return self._slots.get(int(track_id))
+
+    def slot(self, track_id, class_id, t):
+        """Get the slot of a track, allocating a fresh one if needed.
+
+        Returns None, and counts a skip, when the track has no slot and all
+        slots were looked up at `t`.
+
+        Parameters
+        ----------
+        track_id : int
+            The track ID.
+        class_id : int
+            The class of the track.
+        t : float
+            Current stream time.
+
+        """
+        track_id = int(track_id)
+        idx = self._slots.get(track_id)
+        if idx is None:
+            if not self._free:
+                stale = np.flatnonzero((self.track_ids >= 0) & (self.last_seen < t))
+                if not len(stale):  # every slot already holds a track of this frame
+                    self.skips += 1
+                    return None
+                self._remove(stale[np.argmin(self.last_seen[stale])])
+                self.evictions += 1
+            idx = self._free.pop()
+            self._slots[track_id] = idx
+            self.track_ids[idx] = track_id
+            self.box_ticks[idx] = -1
+            self.stationary_since[idx] = np.nan
+            self.violated[idx] = False
+            self.dwell[idx] = 0.
+        self.class_ids[idx] = int(class_id)
+        self.last_seen[idx] = t
+        return idx
+
+    def release(self, track_ids):
+        """Remove the state of tracks deleted by the tracker."""
+        for track_id in track_ids:
+            idx = self._slots.get(int(track_id))
+            if idx is not None:
+                self._remove(idx)
+                self.releases += 1
+
+    def violations(self):
+        """Get `(track_id, class_id, dwell)` of every stored reported track."""
+        idx = np.flatnonzero(self.violated & (self.track_ids >= 0))
+        return [(int(self.track_ids[k]), int(self.class_ids[k]), float(self.dwell[k])) for k in idx]
+
+    def _remove(self, idx):
+        del self._slots[int(self.track_ids[idx])]
+        self.track_ids[idx] = -1
+        self.violated[idx] = False
+        self.last_seen[idx] = -np.inf
+        self._free.append(idx)
@@ -0,0 +1,309 @@
+import cv2
+import yaml
+import numpy as np
+
+
+def bottom_edges(bboxes, inset=25):
+    """Get the bottom edge pixel runs of boxes.
+
+    Parameters
+    ----------
+    bboxes : array_like
+        An Nx4 (or wider) array of boxes in format `(x1, y1, x2, y2)`.
+    inset : int
+        Number of pixels the edge is shrunk by on each side.
+
+    Returns
+    -------
+    (ndarray, ndarray, ndarray)
+        First column, last column (inclusive) and row of each edge. Coordinates
+        are truncated like `int()` does.
+
+    """
+    coords = np.trunc(np.asarray(bboxes, dtype=np.float64)[:, :4]).astype(np.int64)
+    a, b = coords[:, 0] + inset, coords[:, 2] - inset
+    return np.minimum(a, b), np.maximum(a, b), coords[:, 3]
+
+
+def _ranges(counts):
+    """Concatenation of `arange(n)` for every `n` in `counts`."""
+    ends = np.cumsum(counts)
+    return np.arange(ends[-1] if len(ends) else 0) - np.repeat(ends - counts, counts)
+
+
+class ZoneMask(object):
+    """
+    Rasterised membership test for a single polygonal parking zone.
+
+    The polygon is filled once (with the same `cv2.fillPoly` rasterisation the
+    overlay uses) into a mask cropped to its bounding rectangle, and a per-row
+    prefix sum of that mask is kept. Whether a horizontal pixel run touches
+    the zone is then answered with two lookups, so all boxes of a frame are
+    tested with one vectorised call.
+
+    Parameters
+    ----------
+    pts : array_like
+        An Nx2 array of polygon vertices `(x, y)` in image coordinates.
+    frame_shape : Optional[tuple]
+        `(height, width, ...)` of the frames. Parts of the polygon outside the
+        frame are ignored.
+
+    Attributes
+    ----------
+    pts : ndarray
+        The polygon vertices as int32.
+    rect : tuple
+        `(x0, y0, x1, y1)` inclusive bounding rectangle of the zone, clipped
+        to the frame.
+    mask : ndarray
+        Boolean mask of the zone inside `rect`.
+
+    """
+
+    def __init__(self, pts, frame_shape=None):
+        self.pts = np.int32(pts).reshape(-1, 2)
+        x0, y0 = self.pts.min(axis=0)
+        x1, y1 = self.pts.max(axis=0)
+        canvas = None
+        if frame_shape is not None:
+            h, w = frame_shape[:2]
+            if x0 < 0 or y0 < 0 or x1 >= w or y1 >= h:
+                # cv2 clips edges against the image border, so a polygon that
+                # leaves the frame must be filled on a frame-sized canvas
+                canvas = np.zeros((h, w), dtype=np.uint8)
+                cv2.fillPoly(canvas, [self.pts], 1)
+                x0, y0 = max(x0, 0), max(y0, 0)
+                x1, y1 = min(x1, w - 1), min(y1, h - 1)
+                canvas = canvas[y0:y1 + 1, x0:x1 + 1]
+        if canvas is None:
+            canvas = np.zeros((y1 - y0 + 1, x1 - x0 + 1), dtype=np.uint8)
+            cv2.fillPoly(canvas, [self.pts - (x0, y0)], 1)
+
+        self.rect = (int(x0), int(y0), int(x1), int(y1))
+        self.mask = canvas.astype(bool)
+        self._row_cumsum = np.zeros((canvas.shape[0], canvas.shape[1] + 1), dtype=np.int32)
+        np.cumsum(canvas, axis=1, out=self._row_cumsum[:, 1:])
+
+    def touches(self, bboxes, inset=25):
+        """Test which boxes have their bottom edge inside the zone.
+
+        The bottom edge of a box is the pixel run on row `int(y2)` between
+        `int(x1) + inset` and `int(x2) - inset` (both inclusive).
+
+        Parameters
+        ----------
+        bboxes : array_like
+            An Nx4 (or wider) array of boxes in format `(x1, y1, x2, y2)`.
+        inset : int
+            Number of pixels the edge is shrunk by on each side.
+
+        Returns
+        -------
+        ndarray
+            A boolean array of length N.
+
+        """
+        out = np.zeros(len(bboxes), dtype=bool)
+        if not len(bboxes) or not self.mask.size:
+            return out
+        lo, hi, row = bottom_edges(bboxes, inset)
+        x0, y0, x1, _ = self.rect
+        lo = np.maximum(lo, x0) - x0
+        hi = np.minimum(hi, x1) - x0
+        row = row - y0
+        valid = (lo <= hi) & (row >= 0) & (row < self.mask.shape[0])
+        row, lo, hi = row[valid], lo[valid], hi[valid]
+        out[valid] = self._row_cumsum[row, hi + 1] > self._row_cumsum[row, lo]
+        return out
+
+    def paint(self, img, color):
+        """Fill the zone pixels of `img` with `color` in place."""
+        x0, y0, x1, y1 = self.rect
+        img[y0:y1 + 1, x0:x1 + 1][self.mask] = color
+        return img
+
+
+class Zone(object):
+    """
+    A no-parking zone.
+
+    Parameters
+    ----------
+    zone_id : str
+        Unique zone identifier used in reports.
+    pts : array_like
+        An Nx2 array of polygon vertices `(x, y)`.
+    dwell : float
+        Number of seconds a vehicle may stand still in the zone before it is
+        reported.
+    frame_shape : Optional[tuple]
+        `(height, width, ...)` of the frames.
+
+    """
+
+    def __init__(self, zone_id, pts, dwell=5., frame_shape=None):
+        self.zone_id = str(zone_id)
+        self.dwell = float(dwell)
+        self.mask = ZoneMask(pts, frame_shape)
+
+    @property
+    def pts(self):
+        return self.mask.pts
+
+
+class ZoneSet(object):
+    """
+    A set of zones with a uniform grid index over the frame.
+
+    Every grid cell lists the zones having at least one pixel inside it, so a
+    box edge is only tested against the zones of the cells it crosses and the
+    cost per frame depends on the number of tracks, not on the number of
+    zones. The prefix sums of all zone masks are packed into one flat array so
+    the exact test of all candidate (box, zone) pairs is a single vectorised
+    gather.
+
+    Parameters
+    ----------
+    zones : List[Zone]
+        The zones.
+    frame_shape : tuple
+        `(height, width, ...)` of the frames.
+    cell_size : int
+        Side of the grid cells in pixels.
+
+    """
+
+    def __init__(self, zones, frame_shape, cell_size=64):
+        self.zones = list(zones)
+        self.height, self.width = frame_shape[:2]
+        self.cell_size = cell_size
+        self._grid_cols = -(-self.width // cell_size)
+        grid_rows = -(-self.height // cell_size)
+
+        # per zone geometry and packed prefix sums
+        self._rects = np.array([z.mask.rect for z in self.zones], dtype=np.int64).reshape(-1, 4)
+        self._strides = self._rects[:, 2] - self._rects[:, 0] + 2
+        tables = [z.mask._row_cumsum.ravel() for z in self.zones]
+        sizes = np.array([len(t) for t in tables], dtype=np.int64)
+        self._offsets = np.cumsum(sizes) - sizes
+        self._table = np.concatenate(tables) if tables else np.zeros(0, dtype=np.int32)
+        self.dwells = np.array([z.dwell for z in self.zones], dtype=np.float64)
+
+        # grid index in CSR layout: zones of cell c are _cell_zones[_cell_start[c]:_cell_start[c + 1]]
+        cells = [[] for _ in range(grid_rows * self._grid_cols)]
+        cs = cell_size
+        for k, zone in enumerate(self.zones):
+            x0, y0, x1, y1 = zone.mask.rect
+            for r in range(y0 // cs, y1 // cs + 1):
+                for c in range(x0 // cs, x1 // cs + 1):
+                    sub = zone.mask.mask[max(r * cs - y0, 0):(r + 1) * cs - y0, max(c * cs - x0, 0):(c + 1) * cs - x0]
+                    if sub.any():
+                        cells[r * self._grid_cols + c].append(k)
+        counts = np.array([len(c) for c in cells], dtype=np.int64)
+        self._cell_start = np.zeros(len(cells) + 1, dtype=np.int64)
+        np.cumsum(counts, out=self._cell_start[1:])
+        self._cell_zones = np.array([k for c in cells for k in c], dtype=np.int64)
+
+    def __len__(self):
+        return len(self.zones)
+
+    def __iter__(self):
+        return iter(self.zones)
+
+    def __getitem__(self, idx):
+        return self.zones[idx]
+
+    def query(self, bboxes, inset=25):
+        """Find all (box, zone) pairs where the box bottom edge touches the zone.
+
+        Parameters
+        ----------
+        bboxes : array_like
+            An Nx4 (or wider) array of boxes in format `(x1, y1, x2, y2)`.
+        inset : int
+            Number of pixels the edge is shrunk by on each side.
+
+        Returns
+        -------
+        (ndarray, ndarray)
+            Box indices and zone indices of the touching pairs, sorted by box.
+
+        """
+        empty = np.zeros(0, dtype=np.int64)
+        if not len(bboxes) or not len(self.zones):
+            return empty, empty
+        lo, hi, y = bottom_edges(bboxes, inset)
+        lo, hi = np.maximum(lo, 0), np.minimum(hi, self.width - 1)
+        boxes = np.flatnonzero((lo <= hi) & (y >= 0) & (y < self.height))
+        lo, hi, y = lo[boxes], hi[boxes], y[boxes]
+
+        # candidate zones from the grid cells crossed by each edge
+        c0 = lo // self.cell_size
+        n_cells = hi // self.cell_size - c0 + 1
+        cell = np.repeat((y // self.cell_size) * self._grid_cols + c0, n_cells) + _ranges(n_cells)
+        pair_edge = np.repeat(np.arange(len(boxes)), n_cells)
+        start = self._cell_start[cell]
+        n_zones = self._cell_start[cell + 1] - start
+        zone = self._cell_zones[np.repeat(start, n_zones) + _ranges(n_zones)]
+        edge = np.repeat(pair_edge, n_zones)
+        if not len(zone):
+            return empty, empty
+        key = np.unique(edge * len(self.zones) + zone)
+        edge, zone = key // len(self.zones), key % len(self.zones)
+
+        # exact test against the packed prefix sums
+        x0, y0, x1, y1 = self._rects[zone].T
+        row = y[edge] - y0
+        a = np.maximum(lo[edge], x0) - x0
+        b = np.minimum(hi[edge], x1) - x0
+        hit = (a <= b) & (row >= 0) & (row <= y1 - y0)
+        base = self._offsets[zone] + row * self._strides[zone]
+        hit[hit] = self._table[base[hit] + b[hit] + 1] > self._table[base[hit] + a[hit]]
+        return boxes[edge[hit]], zone[hit]
+
+    def assign(self, bboxes, inset=25):
+        """Assign every box to the touched zone with the shortest dwell limit.
+
+        Returns
+        -------
+        ndarray
+            Zone index per box, -1 for boxes outside all zones.
+
+        """
+        out = np.full(len(bboxes), -1, dtype=np.int64)
+        box, zone = self.query(bboxes, inset)
+        if len(box):
+            order = np.lexsort((self.dwells[zone], box))
+            box, zone = box[order], zone[order]
+            first = np.r_[True, box[1:] != box[:-1]]
+            out[box[first]] = zone[first]
+        return out
+
+    def paint(self, img, color):
+        """Fill the pixels of all zones of `img` with `color` in place."""
+        for zone in self.zones:
+            zone.mask.paint(img, color)
+        return img
+
+
+def load_zones(config_file, frame_shape, cell_size=64):
+    """Load the no-parking zones of a camera from a YAML or JSON file.
+
+    The file holds a `ZONES` list whose entries have an `ID`, a `DWELL` limit
+    in seconds and the polygon `POINTS`.
+
+    Returns
+    -------
+    ZoneSet
+        The indexed zones.
+
+    """
+    with open(config_file, 'r') as fo:
+        cfg = yaml.load(fo.read(), Loader=yaml.FullLoader) or {}
+    zones = [Zone(z.get('ID', k), z['POINTS'], z.get('DWELL', 5.), frame_shape)
+             for k, z in enumerate(cfg.get('ZONES') or [])]
+    ids = [z.zone_id for z in zones]
+    if len(set(ids)) != len(ids):
+        raise ValueError(f'Duplicated zone IDs in {config_file}')
+    return ZoneSet(zones, frame_shape, cell_size)